@@ -3,6 +3,10 @@ import os
 from rich.console import Console
 from rich.table import Table
 from datetime import datetime
+from case_db import CASE_DB_PATH, CaseDatabase
+from detectors import HaarDetector, non_max_suppression
+from roi import with_roi
+from phash import NearDuplicateFilter
 
 def get_file_metadata(file_path):
     """Retrieve file metadata such as creation, modification, and access times."""
@@ -12,48 +16,7 @@ def get_file_metadata(file_path):
     accessed_time = datetime.fromtimestamp(file_stats.st_atime).strftime('%Y-%m-%d %H:%M:%S')
     return created_time, modified_time, accessed_time
 
-def is_unique_face(new_face, saved_faces, threshold=0.3):
-    """Check if a detected face is unique based on position and size."""
-    x, y, w, h = new_face
-    for (sx, sy, sw, sh) in saved_faces:
-        if abs(x - sx) < w * threshold and abs(y - sy) < h * threshold and abs(w - sw) < w * threshold and abs(h - sh) < h * threshold:
-            return False
-    return True
-
-def non_max_suppression(faces, overlap_thresh=0.5):
-    """Eliminate overlapping bounding boxes."""
-    if len(faces) == 0:
-        return []
-
-    # Sort boxes by area (largest to smallest)
-    boxes = sorted(faces, key=lambda x: x[2] * x[3], reverse=True)
-    picked = []
-
-    while boxes:
-        current = boxes.pop(0)
-        picked.append(current)
-        boxes = [box for box in boxes if not is_overlapping(current, box, overlap_thresh)]
-
-    return picked
-
-def is_overlapping(box1, box2, threshold):
-    """Check if two boxes overlap."""
-    x1, y1, w1, h1 = box1
-    x2, y2, w2, h2 = box2
-
-    # Calculate the area of the intersection
-    overlap_x1 = max(x1, x2)
-    overlap_y1 = max(y1, y2)
-    overlap_x2 = min(x1 + w1, x2 + w2)
-    overlap_y2 = min(y1 + h1, y2 + h2)
-    intersection_area = max(0, overlap_x2 - overlap_x1) * max(0, overlap_y2 - overlap_y1)
-
-    area1 = w1 * h1
-    area2 = w2 * h2
-    overlap_ratio = intersection_area / min(area1, area2)
-    return overlap_ratio > threshold
-
-def extract_video_metadata_and_detect_faces(video_path, output_folder):
+def extract_video_metadata_and_detect_faces(video_path, output_folder, case_db_path=CASE_DB_PATH):
     console = Console()
 
     # Open the video file
@@ -104,16 +67,22 @@ def extract_video_metadata_and_detect_faces(video_path, output_folder):
         file.write(f"Date Accessed: {accessed_time}\n")
         file.write("\nDetected Faces:\n")
 
-    # Load Haar cascade for face detection
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    # Register the video in the case database shared by all pipelines
+    case_db = CaseDatabase(case_db_path)
+    video_id = case_db.add_video(video_path, frame_width, frame_height, fps, total_frames)
+    case_db.clear_faces(video_id)
 
-    # Initialize trackers for unique faces
+    # Load Haar cascade for face detection, restricted to the camera's ROI when one is defined
+    detector = with_roi(HaarDetector(min_neighbors=8), video_path)
+
+    # Initialize perceptual-hash index for unique faces
     frame_count = 0
     saved_count = 0
-    saved_faces = []  # Store unique detected faces
+    duplicate_filter = NearDuplicateFilter()
     face_table = Table(title="Detected Faces", style="bold cyan")
     face_table.add_column("Face ID", style="bold magenta")
     face_table.add_column("Position (x, y, w, h)", style="bold green")
+    face_table.add_column("dHash", style="bold green")
 
     # Process each frame for face detection
     cv2.namedWindow(f'Face Detection - {video_name}', cv2.WINDOW_NORMAL)
@@ -128,23 +97,25 @@ def extract_video_metadata_and_detect_faces(video_path, output_folder):
         gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
         # Detect faces
-        faces = face_cascade.detectMultiScale(gray_frame, scaleFactor=1.1, minNeighbors=8, minSize=(50, 50))
+        faces = detector.detect(frame, gray_frame)
         faces = non_max_suppression(faces)
 
-        # Save only unique faces
+        # Save only faces that are not near-duplicates of an already saved crop
         for (x, y, w, h) in faces:
-            if is_unique_face((x, y, w, h), saved_faces):
-                saved_faces.append((x, y, w, h))
-                face = frame[y:y+h, x:x+w]
-                face_path = os.path.join(output_folder, f"{video_name}_face_{saved_count:04d}.jpg")
+            face = frame[y:y+h, x:x+w]
+            face_path = os.path.join(output_folder, f"{video_name}_face_{saved_count:04d}.jpg")
+            face_hash, duplicate_of = duplicate_filter.check(face, face_path)
+            if duplicate_of is None:
                 cv2.imwrite(face_path, face)
                 saved_count += 1
 
                 # Save face details in metadata file
                 with open(metadata_file, "a") as file:
-                    file.write(f"Face {saved_count}: Position (x={x}, y={y}, w={w}, h={h})\n")
+                    file.write(f"Face {saved_count}: Position (x={x}, y={y}, w={w}, h={h}), dHash={face_hash:016x}\n")
 
-                face_table.add_row(str(saved_count), f"({x}, {y}, {w}, {h})")
+                face_table.add_row(str(saved_count), f"({x}, {y}, {w}, {h})", f"{face_hash:016x}")
+                timestamp = (frame_count - 1) / fps if fps > 0 else 0
+                case_db.add_face(video_id, frame_count - 1, timestamp, (x, y, w, h), face_path, face_hash)
 
         # Draw rectangles around detected faces
         for (x, y, w, h) in faces:
@@ -160,6 +131,7 @@ def extract_video_metadata_and_detect_faces(video_path, output_folder):
 
     # Cleanup
     cap.release()
+    case_db.close()
     cv2.destroyAllWindows()
 
     # Display face detection results
@@ -3,7 +3,9 @@ from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
 import cv2
 import os
+import threading
 from datetime import datetime
+from events import FaceEventStream
 
 
 class NUCESVideoTriage:
@@ -21,6 +23,8 @@ class NUCESVideoTriage:
         self.metadata = None
         self.face_images = []
         self.face_index = 0
+        self.faces_thread = None
+        self.face_stream = None
 
         self.init_menu()
         self.init_welcome_animation()
@@ -134,8 +138,15 @@ class NUCESVideoTriage:
     def upload_video(self):
         file_path = filedialog.askopenfilename(filetypes=[("Video Files", "*.mp4;*.avi;*.mov")])
         if file_path:
+            if self.face_stream is not None:
+                # A previous video's extraction would otherwise keep running alongside the new one
+                self.face_stream.stop()
             self.video_path = file_path
-            self.extract_metadata_and_faces()
+            # Only the metadata is read up front; faces are extracted when they are asked for
+            self.metadata = self.extract_metadata(self.video_path)
+            self.face_images = []
+            self.faces_thread = None
+            self.face_stream = FaceEventStream()
             self.init_video_screen()
             self.play_video()
 
@@ -231,29 +242,60 @@ class NUCESVideoTriage:
 
     def display_faces(self):
         self.clear_screen()
-        if self.face_images:
-            face_label = tk.Label(
-                self.root,
-                text="Detected Faces",
-                font=("Courier", 28, "bold"),
-                fg="red",
-                bg="black",
+        if self.video_path is None:
+            return
+        if self.faces_thread is None:
+            self.faces_thread = threading.Thread(
+                target=self.extract_faces, args=(self.video_path, self.face_stream), daemon=True
             )
-            face_label.place(relx=0.5, rely=0.1, anchor="center")
+            self.faces_thread.start()
 
-            image_canvas = tk.Canvas(self.root, bg="black")
-            image_canvas.place(relx=0.1, rely=0.2, relwidth=0.8, relheight=0.7)
-
-            for idx, face_path in enumerate(self.face_images[:5]):  # Display first 5 faces
-                face_image = Image.open(face_path).resize((150, 150), Image.Resampling.LANCZOS)
-                face_photo = ImageTk.PhotoImage(face_image)
-                x_pos = 100 + idx * 200
-                y_pos = 100
-                image_canvas.create_image(x_pos, y_pos, image=face_photo)
+        self.face_label = tk.Label(
+            self.root,
+            text="Detected Faces",
+            font=("Courier", 28, "bold"),
+            fg="red",
+            bg="black",
+        )
+        self.face_label.place(relx=0.5, rely=0.1, anchor="center")
 
-    def extract_metadata_and_faces(self):
-        self.metadata = self.extract_metadata(self.video_path)
-        self.face_images = self.extract_faces(self.video_path)
+        self.stop_button = tk.Button(
+            self.root,
+            text="Stop Analysis",
+            command=self.face_stream.stop,
+            font=("Courier", 12, "bold"),
+            bg="red",
+            fg="black",
+            activebackground="#8B0000",
+            relief="raised",
+            bd=3,
+        )
+        self.stop_button.place(relx=0.5, rely=0.95, anchor="center")
+
+        self.image_canvas = tk.Canvas(self.root, bg="black")
+        self.image_canvas.place(relx=0.1, rely=0.2, relwidth=0.8, relheight=0.7)
+        self.face_photos = []
+        self.show_new_faces()
+
+    def show_new_faces(self):
+        """Draw faces published since the last call (first 5 only) while extraction runs in the background."""
+        if not self.image_canvas.winfo_exists():
+            return
+        running = not self.face_stream.done
+        self.face_images.extend(event.face_path for event in self.face_stream.drain())
+        for idx in range(len(self.face_photos), min(5, len(self.face_images))):  # Display first 5 faces
+            face_image = Image.open(self.face_images[idx]).resize((150, 150), Image.Resampling.LANCZOS)
+            face_photo = ImageTk.PhotoImage(face_image)
+            self.face_photos.append(face_photo)
+            x_pos = 100 + idx * 200
+            y_pos = 100
+            self.image_canvas.create_image(x_pos, y_pos, image=face_photo)
+        status = " - stopped" if self.face_stream.stopped else " - analysing..." if running else ""
+        self.face_label.config(text=f"Detected Faces ({len(self.face_images)}){status}")
+        if running:
+            self.root.after(250, self.show_new_faces)
+        else:
+            self.stop_button.destroy()
 
     def extract_metadata(self, video_path):
         cap = cv2.VideoCapture(video_path)
@@ -270,27 +312,31 @@ class NUCESVideoTriage:
         cap.release()
         return metadata
 
-    def extract_faces(self, video_path):
+    def extract_faces(self, video_path, face_stream):
+        """Runs on a background thread, publishing each face on face_stream as soon as it is saved."""
         cap = cv2.VideoCapture(video_path)
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        face_images = []
-        frame_count = 0
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            if frame_count % 5 == 0:
-                gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = face_cascade.detectMultiScale(gray_frame, scaleFactor=1.1, minNeighbors=5, minSize=(50, 50))
-                for (x, y, w, h) in faces:
-                    face_image = frame[y:y + h, x:x + w]
-                    face_path = os.path.join(self.output_folder, f"face_{frame_count}.jpg")
-                    cv2.imwrite(face_path, face_image)
-                    face_images.append(face_path)
-            frame_count += 1
-        cap.release()
-        return face_images
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            frame_count = 0
+
+            while not face_stream.stopped:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if frame_count % 5 == 0:
+                    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    faces = face_cascade.detectMultiScale(gray_frame, scaleFactor=1.1, minNeighbors=5, minSize=(50, 50))
+                    for (x, y, w, h) in faces:
+                        face_image = frame[y:y + h, x:x + w]
+                        face_path = os.path.join(self.output_folder, f"face_{frame_count}.jpg")
+                        cv2.imwrite(face_path, face_image)
+                        face_stream.publish(face_path, frame_count, frame_count / fps if fps > 0 else 0, (x, y, w, h))
+                frame_count += 1
+        finally:
+            # The gallery waits for finish(), so it must happen even if decoding or writing fails
+            cap.release()
+            face_stream.finish()
 
     def clear_screen(self):
         for widget in self.root.winfo_children():
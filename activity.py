@@ -0,0 +1,131 @@
+import math
+import os
+
+import cv2
+import numpy as np
+
+from detectors import iou
+
+
+def activity_path(output_folder, video_path):
+    """Where the activity index of a video is saved, next to its other results."""
+    return os.path.join(output_folder, f"{os.path.splitext(os.path.basename(video_path))[0]}_activity.npz")
+
+
+class IouTracker:
+    """Assigns track ids by matching each box to the best-overlapping box of the previous analysed frame."""
+
+    def __init__(self, iou_threshold=0.3, max_gap=50):
+        self.iou_threshold = iou_threshold
+        self.max_gap = max_gap
+        self.tracks = {}  # track id -> (last frame, last box)
+        self.next_id = 0
+
+    def update(self, frame_count, boxes):
+        self.tracks = {
+            track_id: track for track_id, track in self.tracks.items() if frame_count - track[0] <= self.max_gap
+        }
+        ids = []
+        unmatched = dict(self.tracks)
+        for box in boxes:
+            scores = {track_id: iou(box, track[1]) for track_id, track in unmatched.items()}
+            best = max(scores, key=scores.get) if scores else None
+            if best is not None and scores[best] >= self.iou_threshold:
+                track_id = best
+                del unmatched[best]
+            else:
+                track_id = self.next_id
+                self.next_id += 1
+            self.tracks[track_id] = (frame_count, tuple(box))
+            ids.append(track_id)
+        return ids
+
+
+class ActivityIndex:
+    """
+    Per-second summary of a video for timeline navigation: faces on screen, motion energy and the
+    frame to seek to (the analysed frame with the most faces in that second). Track ids present in
+    each second are kept as (second, track id) pairs. All arrays are saved together in one .npz file.
+    """
+
+    def __init__(self, fps, total_frames, motion_size=(64, 36)):
+        self.fps = fps if fps and fps > 0 else 25.0
+        seconds = max(1, int(math.ceil(total_frames / self.fps)))
+        self.face_counts = np.zeros(seconds, dtype=np.uint16)
+        self.motion = np.zeros(seconds, dtype=np.float32)
+        self.seek_frames = (np.arange(seconds) * self.fps).astype(np.int64)
+        self.track_seconds = []
+        self.track_ids = []
+        self.tracker = IouTracker(max_gap=int(self.fps * 2))
+        self.motion_size = motion_size
+        self.previous_small = None
+
+    @property
+    def seconds(self):
+        return len(self.face_counts)
+
+    def second(self, frame_count):
+        return min(int(frame_count / self.fps), self.seconds - 1)
+
+    def add(self, frame_count, boxes, gray_frame=None):
+        """
+        Record the faces (and, from the grayscale frame, the motion) of one analysed frame.
+        Returns the track id of each box.
+        """
+        second = self.second(frame_count)
+        if len(boxes) > self.face_counts[second]:
+            self.face_counts[second] = len(boxes)
+            self.seek_frames[second] = frame_count
+        track_ids = self.tracker.update(frame_count, boxes)
+        for track_id in track_ids:
+            if not (self.track_seconds and self.track_seconds[-1] == second and track_id in self._current_ids()):
+                self.track_seconds.append(second)
+                self.track_ids.append(track_id)
+        if gray_frame is not None:
+            small = cv2.resize(gray_frame, self.motion_size, interpolation=cv2.INTER_AREA)
+            if self.previous_small is not None:
+                self.motion[second] = max(self.motion[second], float(cv2.absdiff(small, self.previous_small).mean()))
+            self.previous_small = small
+        return track_ids
+
+    def _current_ids(self):
+        """Track ids already recorded for the latest second."""
+        last = self.track_seconds[-1]
+        ids = set()
+        for second, track_id in zip(reversed(self.track_seconds), reversed(self.track_ids)):
+            if second != last:
+                break
+            ids.add(track_id)
+        return ids
+
+    def tracks_at(self, second):
+        seconds = np.asarray(self.track_seconds, dtype=np.int32)
+        return np.asarray(self.track_ids, dtype=np.int32)[seconds == second]
+
+    def seek_frame(self, second):
+        return int(self.seek_frames[min(max(second, 0), self.seconds - 1)])
+
+    def save(self, path):
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            fps=np.float64(self.fps),
+            face_counts=self.face_counts,
+            motion=self.motion,
+            seek_frames=self.seek_frames,
+            track_seconds=np.asarray(self.track_seconds, dtype=np.int32),
+            track_ids=np.asarray(self.track_ids, dtype=np.int32),
+        )
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            index = cls(float(data["fps"]), 0)
+            index.face_counts = data["face_counts"]
+            index.motion = data["motion"]
+            index.seek_frames = data["seek_frames"]
+            index.track_seconds = data["track_seconds"].tolist()
+            index.track_ids = data["track_ids"].tolist()
+        return index
@@ -0,0 +1,70 @@
+import threading
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class AnalysisStage:
+    """One analysis step that runs at most once, in a background thread, the first time it is requested."""
+
+    def __init__(self, name, run):
+        self.name = name
+        self.run = run
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.state != PENDING:
+                return False
+            self.state = RUNNING
+        self.thread = threading.Thread(target=self._run, name=f"analysis-{self.name}", daemon=True)
+        self.thread.start()
+        return True
+
+    def _run(self):
+        try:
+            self.result = self.run()
+            self.state = DONE
+        except Exception as error:
+            self.error = error
+            self.state = FAILED
+            print(f"Analysis stage {self.name} failed: {error}")
+
+    def wait(self, timeout=None):
+        if self.thread:
+            self.thread.join(timeout)
+        return self.result
+
+
+class LazyAnalysis:
+    """
+    The analysis stages of one video, each scheduled independently and only when its result is asked for,
+    e.g. face extraction starts when the investigator opens the faces view rather than on upload.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, run):
+        self.stages[name] = AnalysisStage(name, run)
+
+    def request(self, name):
+        """Start the stage if it has not run yet; returns its current state."""
+        stage = self.stages[name]
+        stage.start()
+        return stage.state
+
+    def state(self, name):
+        return self.stages[name].state
+
+    def result(self, name):
+        return self.stages[name].result
+
+    def wait(self, name, timeout=None):
+        return self.stages[name].wait(timeout)
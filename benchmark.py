@@ -0,0 +1,213 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from detectors import create_detector
+from metrics import Metrics
+from pipeline import FaceSink, annotate_frame, extract_faces
+
+# name, width, height, frames, faces on screen
+SCENARIOS = [
+    ("360p_short", 640, 360, 150, 2),
+    ("720p_medium", 1280, 720, 300, 3),
+    ("1080p_medium", 1920, 1080, 300, 4),
+]
+QUICK_SCENARIOS = SCENARIOS[:1]
+
+
+def synthetic_face(size, rng):
+    """Draw a simple face-like patch (skin ellipse, eyes, mouth) for when no real face images are available."""
+    patch = np.full((size, size, 3), 40, dtype=np.uint8)
+    skin = tuple(int(c) for c in rng.integers(120, 220, 3))
+    centre = (size // 2, size // 2)
+    cv2.ellipse(patch, centre, (size * 2 // 5, size // 2 - 2), 0, 0, 360, skin, -1)
+    for eye_x in (size // 3, size * 2 // 3):
+        cv2.circle(patch, (eye_x, size * 2 // 5), max(2, size // 14), (30, 30, 30), -1)
+    cv2.ellipse(patch, (size // 2, size * 7 // 10), (size // 6, size // 14), 0, 0, 180, (40, 40, 120), -1)
+    return patch
+
+
+def load_face_images(faces_dir):
+    if not faces_dir or not os.path.isdir(faces_dir):
+        return []
+    paths = sorted(glob.glob(os.path.join(faces_dir, "*")))
+    images = [cv2.imread(path) for path in paths]
+    return [image for image in images if image is not None]
+
+
+def generate_video(path, width, height, frame_total, face_total, face_images, fps=25, seed=0):
+    """
+    Write a deterministic synthetic clip with faces pasted at known, slowly moving positions,
+    plus a label file in the detector_benchmark format listing every pasted box per frame.
+    """
+    rng = np.random.default_rng(seed)
+    background = cv2.resize(
+        rng.integers(0, 255, (height // 16 + 1, width // 16 + 1, 3), dtype=np.uint8), (width, height),
+        interpolation=cv2.INTER_LINEAR,
+    )
+    size = max(60, height // 6)
+    faces = []
+    for i in range(face_total):
+        image = face_images[i % len(face_images)] if face_images else synthetic_face(size, rng)
+        faces.append({
+            "image": cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA),
+            "start": rng.uniform([0, 0], [width - size, height - size]),
+            "velocity": rng.uniform(-2.0, 2.0, 2),
+        })
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    labels = {}
+    for frame_count in range(frame_total):
+        frame = background.copy()
+        boxes = []
+        for face in faces:
+            x, y = (face["start"] + face["velocity"] * frame_count).astype(int)
+            x = int(np.clip(x, 0, width - size))
+            y = int(np.clip(y, 0, height - size))
+            frame[y:y + size, x:x + size] = face["image"]
+            boxes.append([x, y, size, size])
+        labels[str(frame_count)] = boxes
+        writer.write(frame)
+    writer.release()
+
+    with open(os.path.splitext(path)[0] + ".json", "w") as f:
+        json.dump({"frames": labels}, f)
+    return path
+
+
+def time_player(video_path, detector, metrics, max_frames=100):
+    """Time the per-frame work of the GUI player (process_video) without a display."""
+    cap = cv2.VideoCapture(video_path)
+    for _ in range(max_frames):
+        with metrics.stage("decode"):
+            ret, frame = cap.read()
+        if not ret:
+            break
+        annotate_frame(frame, detector, (800, 450), metrics)
+    cap.release()
+
+
+def clip_fingerprint(scenario, face_images):
+    """Short hash of everything a generated clip depends on, so a clip is only reused for the same inputs."""
+    digest = hashlib.sha1(repr(scenario).encode("utf-8"))
+    for image in face_images:
+        digest.update(repr(image.shape).encode("utf-8"))
+        digest.update(image.tobytes())
+    return digest.hexdigest()[:10]
+
+
+def run_scenario(scenario, videos_dir, detector_name, face_images):
+    name, width, height, frame_total, face_total = scenario
+    video_path = os.path.join(videos_dir, f"{name}_{clip_fingerprint(scenario, face_images)}.mp4")
+    if not os.path.exists(video_path):
+        generate_video(video_path, width, height, frame_total, face_total, face_images)
+
+    detector = create_detector(detector_name)
+    output_folder = tempfile.mkdtemp(prefix="triage_bench_")
+    try:
+        extraction_metrics = Metrics()
+        start = time.perf_counter()
+        face_paths = extract_faces(
+            video_path, FaceSink(output_folder), detector,
+            snapshot_folder=os.path.join(output_folder, "snapshots"), nms_threshold=0.5, metrics=extraction_metrics,
+        )
+        extraction_time = time.perf_counter() - start
+
+        player_metrics = Metrics()
+        start = time.perf_counter()
+        time_player(video_path, detector, player_metrics)
+        player_time = time.perf_counter() - start
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+
+    return {
+        "scenario": name,
+        "resolution": f"{width}x{height}",
+        "frames": frame_total,
+        "detector": detector_name,
+        "extract_faces": {
+            "wall_s": extraction_time,
+            "fps": frame_total / extraction_time,
+            "faces_saved": len(face_paths),
+            "stages": extraction_metrics.summary(),
+            "counters": extraction_metrics.snapshot()["counters"],
+        },
+        "process_video": {
+            "wall_s": player_time,
+            "fps": player_metrics.calls.get("detect", 0) / player_time if player_time else 0.0,
+            "stages": player_metrics.summary(),
+        },
+    }
+
+
+def compare_results(current, previous_path, tolerance=0.10):
+    """Print per-stage changes against a previous results file and return the list of regressions."""
+    with open(previous_path) as f:
+        previous = {result["scenario"]: result for result in json.load(f)["results"]}
+    regressions = []
+    for result in current["results"]:
+        baseline = previous.get(result["scenario"])
+        if baseline is None:
+            continue
+        for section in ("extract_faces", "process_video"):
+            stages = result[section]["stages"]
+            for stage, values in stages.items():
+                before = baseline[section]["stages"].get(stage)
+                if not before or before["mean_ms"] == 0:
+                    continue
+                change = values["mean_ms"] / before["mean_ms"] - 1
+                marker = "REGRESSION" if change > tolerance else ""
+                print(f"{result['scenario']:<14}{section:<15}{stage:<11}{before['mean_ms']:>9.3f} -> "
+                      f"{values['mean_ms']:>9.3f} ms {change:>+7.1%} {marker}")
+                if marker:
+                    regressions.append((result["scenario"], section, stage, change))
+    return regressions
+
+
+def run_benchmarks(videos_dir, output_path, detector_name="haar", faces_dir=None, quick=False, compare=None):
+    os.makedirs(videos_dir, exist_ok=True)
+    face_images = load_face_images(faces_dir)
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "face_source": faces_dir if face_images else "synthetic",
+        },
+        "results": [],
+    }
+    for scenario in QUICK_SCENARIOS if quick else SCENARIOS:
+        result = run_scenario(scenario, videos_dir, detector_name, face_images)
+        results["results"].append(result)
+        print(f"{result['scenario']:<14}extract_faces {result['extract_faces']['fps']:>7.1f} frames/s, "
+              f"process_video {result['process_video']['fps']:>6.1f} frames/s")
+
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"Results saved to {output_path}")
+    if compare:
+        compare_results(results, compare)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproducible stage-level benchmark of the triage pipeline.")
+    parser.add_argument("--videos-dir", default="benchmark_videos", help="Where synthetic clips are generated and reused")
+    parser.add_argument("--output", default="benchmark_results.json", help="Machine-readable results file")
+    parser.add_argument("--detector", default="haar", help="Detector backend to benchmark")
+    parser.add_argument("--faces-dir", default="known_faces", help="Face images to paste (synthetic faces if missing)")
+    parser.add_argument("--quick", action="store_true", help="Only run the smallest scenario")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args()
+    run_benchmarks(args.videos_dir, args.output, args.detector, args.faces_dir, args.quick, args.compare)
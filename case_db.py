@@ -0,0 +1,237 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    width INTEGER,
+    height INTEGER,
+    fps REAL,
+    total_frames INTEGER,
+    duration REAL,
+    created TEXT,
+    modified TEXT,
+    accessed TEXT,
+    analysed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS faces (
+    id INTEGER PRIMARY KEY,
+    video_id INTEGER NOT NULL REFERENCES videos(id),
+    frame INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    x INTEGER,
+    y INTEGER,
+    w INTEGER,
+    h INTEGER,
+    face_path TEXT NOT NULL,
+    phash TEXT,
+    identity INTEGER,
+    name TEXT,
+    confidence REAL,
+    run_id TEXT
+);
+CREATE INDEX IF NOT EXISTS faces_video_frame ON faces(video_id, frame);
+CREATE INDEX IF NOT EXISTS faces_timestamp ON faces(timestamp);
+CREATE INDEX IF NOT EXISTS faces_identity ON faces(identity);
+"""
+
+# Every pipeline records into this case database unless told otherwise
+CASE_DB_NAME = "case.db"
+CASE_DB_PATH = os.path.join("video_analysis_output", CASE_DB_NAME)
+
+FACE_COLUMNS = (
+    "video_id", "frame", "timestamp", "x", "y", "w", "h", "face_path", "phash", "identity", "name", "confidence",
+    "run_id",
+)
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class CaseDatabase:
+    """
+    Single SQLite store for every video and face of a case, shared by all pipelines.
+    Runs in WAL mode so the GUI and reports can read while an extraction is writing,
+    and face rows are buffered and inserted in batches inside one transaction.
+    """
+
+    def __init__(self, path, batch_size=500):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        # Case databases created before faces were tagged with the run that found them
+        if "run_id" not in {row["name"] for row in self.connection.execute("PRAGMA table_info(faces)")}:
+            self.connection.execute("ALTER TABLE faces ADD COLUMN run_id TEXT")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS faces_video_run ON faces(video_id, run_id)")
+        self.lock = threading.Lock()
+        self.batch_size = batch_size
+        self.pending_faces = []
+
+    def add_video(self, video_path, width, height, fps, total_frames):
+        """Register (or refresh) a video with its stream and file-system metadata and return its id."""
+        video_path = os.path.abspath(video_path)
+        file_stats = os.stat(video_path)
+        duration = total_frames / fps if fps > 0 else 0
+        with self.lock, self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO videos (path, width, height, fps, total_frames, duration, created, modified, accessed, analysed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    width=excluded.width, height=excluded.height, fps=excluded.fps,
+                    total_frames=excluded.total_frames, duration=excluded.duration,
+                    created=excluded.created, modified=excluded.modified,
+                    accessed=excluded.accessed, analysed_at=excluded.analysed_at
+                """,
+                (
+                    video_path, width, height, fps, total_frames, duration,
+                    _format_time(file_stats.st_ctime), _format_time(file_stats.st_mtime),
+                    _format_time(file_stats.st_atime), datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                ),
+            )
+            row = self.connection.execute("SELECT id FROM videos WHERE path = ?", (video_path,)).fetchone()
+        return row["id"]
+
+    def clear_faces(self, video_id, start_frame=0, end_frame=None, run_id=None):
+        """
+        Drop the faces of a previous analysis of this video (or of a frame range) before it is re-analysed.
+        With run_id only that run's faces are dropped, leaving other runs of the video alone.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM faces WHERE video_id = ? AND frame >= ? AND (? IS NULL OR frame < ?) "
+                "AND (? IS NULL OR run_id = ?)",
+                (video_id, start_frame, end_frame, end_frame, run_id, run_id),
+            )
+
+    def supersede_runs(self, video_id, run_id):
+        """
+        Make a finished run the video's analysis of record: drop the faces of runs of the video that started
+        before it (runs.Run ids sort by start time) and untagged faces. Faces of a run started later, possibly
+        still running, are kept, so whichever order concurrent runs finish in, the newest one wins.
+        """
+        self.flush()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM faces WHERE video_id = ? AND (run_id IS NULL OR run_id < ?)", (video_id, run_id)
+            )
+
+    def replace_faces(self, video_id, rows):
+        """Replace every face of a video with rows (tuples in FACE_COLUMNS order) in one transaction."""
+        self.flush()
+        placeholders = ", ".join("?" for _ in FACE_COLUMNS)
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM faces WHERE video_id = ?", (video_id,))
+            self.connection.executemany(
+                f"INSERT INTO faces ({', '.join(FACE_COLUMNS)}) VALUES ({placeholders})", rows
+            )
+
+    def add_face(self, video_id, frame, timestamp, box, face_path, phash=None, name=None, confidence=None,
+                 run_id=None):
+        """Queue one face row; rows are written once batch_size are pending or on flush()."""
+        x, y, w, h = (int(value) for value in box)
+        phash = f"{phash:016x}" if isinstance(phash, int) else phash
+        with self.lock:
+            self.pending_faces.append(
+                (video_id, frame, timestamp, x, y, w, h, face_path, phash, None, name, confidence, run_id)
+            )
+            full = len(self.pending_faces) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        placeholders = ", ".join("?" for _ in FACE_COLUMNS)
+        # Several extraction threads may share the database, so the buffer is swapped under the lock
+        with self.lock, self.connection:
+            rows, self.pending_faces = self.pending_faces, []
+            if rows:
+                self.connection.executemany(
+                    f"INSERT INTO faces ({', '.join(FACE_COLUMNS)}) VALUES ({placeholders})", rows
+                )
+
+    def set_identities(self, identities):
+        """Store cluster identities given as a {face row id: identity} mapping."""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "UPDATE faces SET identity = ? WHERE id = ?",
+                [(int(identity), face_id) for face_id, identity in identities.items()],
+            )
+
+    def query(self, sql, parameters=()):
+        """Run a read query under the connection lock and return the rows as dicts."""
+        with self.lock:
+            return [dict(row) for row in self.connection.execute(sql, parameters)]
+
+    def video_id(self, video_path):
+        rows = self.query("SELECT id FROM videos WHERE path = ?", (os.path.abspath(video_path),))
+        return rows[0]["id"] if rows else None
+
+    def videos(self):
+        return self.query("SELECT * FROM videos ORDER BY id")
+
+    def video_metadata(self, video_id):
+        """Metadata of a video in the same display form the GUI and reports use."""
+        rows = self.query("SELECT * FROM videos WHERE id = ?", (video_id,))
+        if not rows:
+            return {}
+        row = rows[0]
+        return {
+            "Resolution": f"{row['width']}x{row['height']}",
+            "Frame Rate": f"{row['fps']:.2f} fps",
+            "Total Frames": row["total_frames"],
+            "Duration": f"{row['duration']:.2f} seconds",
+            "Date Created": row["created"],
+            "Date Modified": row["modified"],
+            "Date Accessed": row["accessed"],
+            "Video Path": row["path"],
+        }
+
+    def faces(self, video_id=None, identity=None):
+        """Face rows ordered by video and frame, optionally filtered by video and/or identity."""
+        sql = "SELECT * FROM faces"
+        conditions, parameters = [], []
+        if video_id is not None:
+            conditions.append("video_id = ?")
+            parameters.append(video_id)
+        if identity is not None:
+            conditions.append("identity = ?")
+            parameters.append(identity)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY video_id, frame, id"
+        return self.query(sql, parameters)
+
+    def iter_faces(self, video_id, batch_size=1000):
+        """
+        Face rows of a video in frame order, fetched batch_size at a time by keyset pagination so large
+        cases are streamed in bounded memory and the lock is not held between batches.
+        """
+        last_frame, last_id = -1, -1
+        while True:
+            rows = self.query(
+                "SELECT * FROM faces WHERE video_id = ? AND (frame > ? OR (frame = ? AND id > ?)) "
+                "ORDER BY frame, id LIMIT ?",
+                (video_id, last_frame, last_frame, last_id, batch_size),
+            )
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            last_frame, last_id = rows[-1]["frame"], rows[-1]["id"]
+
+    def face_paths(self, video_id):
+        rows = self.query("SELECT face_path FROM faces WHERE video_id = ? ORDER BY frame, id", (video_id,))
+        return [row["face_path"] for row in rows]
+
+    def close(self):
+        self.flush()
+        self.connection.close()
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from runs import atomic_open
+
+ENCODINGS_FILE = "face_encodings.npy"
+CASE_CLUSTERS_FILE = "case_clusters.npz"
+
+
+def load_case_faces(metadata_paths):
+    """
+    Load the face records and 128-d encodings written by file1.extract_faces.
+    Each metadata.json is expected to have a face_encodings.npy beside it, row-aligned with its entries.
+    """
+    records = []
+    encodings = []
+    for metadata_path in metadata_paths:
+        with open(metadata_path) as f:
+            entries = json.load(f)
+        if not entries:
+            continue
+        video_encodings = np.load(os.path.join(os.path.dirname(metadata_path), ENCODINGS_FILE))
+        if len(video_encodings) != len(entries):
+            raise ValueError(f"{metadata_path} has {len(entries)} faces but {len(video_encodings)} encodings")
+        records.extend(entries)
+        encodings.append(video_encodings.astype(np.float32))
+    if not encodings:
+        return np.empty((0, 128), dtype=np.float32), records
+    return np.vstack(encodings), records
+
+
+def neighbour_graph(encodings, threshold=0.5, max_neighbours=20, block_size=512, first=0):
+    """
+    Build a sparse k-nearest-neighbour graph of faces closer than `threshold` (Euclidean distance).
+    Distances are computed block by block as |a|^2 + |b|^2 - 2ab with one matrix product per block,
+    so memory stays at block_size x N floats. Only faces from index `first` onwards are queried.
+    Returns (rows, cols, weights) arrays of directed edges, weighted by similarity.
+    """
+    count = len(encodings)
+    norms = np.einsum("ij,ij->i", encodings, encodings)
+    k = min(max_neighbours + 1, count)
+    rows, cols, weights = [], [], []
+    for start in range(first, count, block_size):
+        block = encodings[start:start + block_size]
+        distances = norms[start:start + block_size, None] + norms[None, :] - 2.0 * block @ encodings.T
+        np.maximum(distances, 0.0, out=distances)
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        nearest_distances = np.sqrt(np.take_along_axis(distances, nearest, axis=1))
+        block_rows = np.repeat(np.arange(start, start + len(block)), k).reshape(len(block), k)
+        keep = (nearest_distances < threshold) & (nearest != block_rows)
+        rows.append(block_rows[keep])
+        cols.append(nearest[keep])
+        weights.append(1.0 - nearest_distances[keep] / threshold)
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(weights)
+
+
+def chinese_whispers(count, rows, cols, weights, labels=None, iterations=30, seed=0):
+    """
+    Chinese whispers label propagation over a weighted graph.
+    Every node adopts the label with the largest summed edge weight among its neighbours;
+    updates are vectorised per iteration and applied to a random half of the nodes to avoid oscillation.
+    Passing the labels of a previous run as `labels` continues that clustering incrementally.
+    """
+    rng = np.random.default_rng(seed)
+    if labels is None:
+        labels = np.arange(count, dtype=np.int64)
+    else:
+        labels = np.asarray(labels, dtype=np.int64).copy()
+    if len(rows) == 0:
+        return labels
+
+    # Labels passed in may be any non-negative numbers, not just 0..count-1
+    span = int(labels.max()) + 1
+    for _ in range(iterations):
+        keys = rows * span + labels[cols]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=weights)
+        key_rows = unique_keys // span
+        key_labels = unique_keys % span
+        order = np.lexsort((-sums, key_rows))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = key_rows[order][1:] != key_rows[order][:-1]
+        best_rows = key_rows[order][first]
+        best_labels = key_labels[order][first]
+
+        if np.array_equal(labels[best_rows], best_labels):
+            break
+        update = rng.random(len(best_rows)) < 0.5
+        labels[best_rows[update]] = best_labels[update]
+    return labels
+
+
+def cluster_faces(encodings, threshold=0.5, max_neighbours=20, labels=None):
+    """
+    Group face encodings into identities; returns one identity number per face, largest identity first.
+    Pass the labels returned for the first len(labels) faces to add new faces to an existing clustering:
+    existing identities keep their numbers and new identities are numbered after them, largest first.
+    """
+    if len(encodings) == 0:
+        return np.empty(0, dtype=np.int64)
+    if labels is None:
+        rows, cols, weights = neighbour_graph(encodings, threshold, max_neighbours)
+    else:
+        # Incremental run: only the new faces get edges, so faces already clustered keep their
+        # identity while each new face starts alone and adopts the identity of its neighbours.
+        known = len(labels)
+        first_new = int(np.max(labels, initial=-1)) + 1
+        fresh = np.arange(known, len(encodings), dtype=np.int64) - known + first_new
+        labels = np.concatenate([np.asarray(labels, dtype=np.int64), fresh])
+        rows, cols, weights = neighbour_graph(encodings, threshold, max_neighbours, first=known)
+        raw = chinese_whispers(len(encodings), rows, cols, weights, labels)
+        new = raw >= first_new
+        if np.any(new):
+            _, inverse, sizes = np.unique(raw[new], return_inverse=True, return_counts=True)
+            rank = np.empty(len(sizes), dtype=np.int64)
+            rank[np.argsort(-sizes, kind="stable")] = np.arange(len(sizes))
+            raw[new] = rank[inverse] + first_new
+        return raw
+    raw = chinese_whispers(len(encodings), rows, cols, weights)
+    _, inverse, sizes = np.unique(raw, return_inverse=True, return_counts=True)
+    rank = np.empty(len(sizes), dtype=np.int64)
+    rank[np.argsort(-sizes, kind="stable")] = np.arange(len(sizes))
+    return rank[inverse]
+
+
+def summarise_clusters(labels, encodings, records):
+    """Summarise each identity: face count, videos, time range and the face closest to the cluster centre."""
+    summary = []
+    order = np.argsort(labels, kind="stable")
+    boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+    for identity, members in enumerate(np.split(order, boundaries) if len(labels) else []):
+        centre = encodings[members].mean(axis=0)
+        representative = members[np.argmin(np.linalg.norm(encodings[members] - centre, axis=1))]
+        member_records = [records[i] for i in members]
+        summary.append({
+            "identity": identity,
+            "faces": len(members),
+            "videos": sorted({record.get("video", "") for record in member_records}),
+            "first_frame": min(record["frame_id"] for record in member_records),
+            "last_frame": max(record["frame_id"] for record in member_records),
+            "names": sorted({record["name"] for record in member_records if record.get("name") != "Unknown"}),
+            "representative": records[representative]["face_path"],
+            "face_paths": [record["face_path"] for record in member_records],
+            "row_ids": [record.get("row_id") for record in member_records],
+        })
+    return summary
+
+
+def cluster_case(metadata_paths, output_path, threshold=0.5):
+    """Cluster every face of the given videos and write the identity summary to output_path as JSON."""
+    encodings, records = load_case_faces(metadata_paths)
+    labels = cluster_faces(encodings, threshold)
+    summary = summarise_clusters(labels, encodings, records)
+    with open(output_path, "w") as f:
+        json.dump(summary, f, indent=4)
+    print(f"{len(records)} faces grouped into {len(summary)} identities, summary saved to {output_path}")
+    return summary
+
+
+def cluster_into_case(metadata_path, state_path, threshold=0.5, live_rows=None):
+    """
+    Add one video's faces to the case-wide clustering kept at state_path and return {face row id: identity}
+    for them. Faces already in the case keep their identity numbers, so the same person gets the same number
+    in every video. Stored faces whose case database row is not in live_rows (or is being re-added) are dropped.
+    """
+    encodings, records = load_case_faces([metadata_path])
+    row_ids = np.array([record["row_id"] for record in records], dtype=np.int64)
+    known_encodings = np.empty((0, 128), dtype=np.float32)
+    known_labels = np.empty(0, dtype=np.int64)
+    known_rows = np.empty(0, dtype=np.int64)
+    if os.path.exists(state_path):
+        with np.load(state_path) as state:
+            known_encodings, known_labels, known_rows = state["encodings"], state["labels"], state["row_ids"]
+        keep = ~np.isin(known_rows, row_ids)
+        if live_rows is not None:
+            keep &= np.isin(known_rows, np.fromiter(live_rows, dtype=np.int64))
+        known_encodings, known_labels, known_rows = known_encodings[keep], known_labels[keep], known_rows[keep]
+    all_encodings = np.vstack([known_encodings, encodings])
+    labels = cluster_faces(all_encodings, threshold, labels=known_labels)
+    with atomic_open(state_path) as f:
+        np.savez(f, encodings=all_encodings, labels=labels, row_ids=np.concatenate([known_rows, row_ids]))
+    return {int(row_id): int(label) for row_id, label in zip(row_ids, labels[len(known_rows):])}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Group detected faces from one or many videos into identities.")
+    parser.add_argument("metadata", nargs="+", help="metadata.json files written by file1.py")
+    parser.add_argument("--output", default="clusters.json", help="Where to write the cluster summary")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Maximum encoding distance between neighbours")
+    args = parser.parse_args()
+    cluster_case(args.metadata, args.output, args.threshold)
@@ -0,0 +1,207 @@
+import mmap
+import os
+import shutil
+import struct
+import threading
+
+ARCHIVE_NAME = "faces.pack"
+PACK_SUFFIX = ".pack"
+INDEX_SUFFIX = ".idx"
+REF_SEPARATOR = "#"
+# offset, length, thumbnail offset, thumbnail length
+RECORD = struct.Struct("<QIQI")
+
+
+def archive_ref(archive_path, index):
+    """How a crop inside an archive is referred to wherever a face path is expected: "<archive>#<n>"."""
+    return f"{archive_path}{REF_SEPARATOR}{index}"
+
+
+def split_ref(face_path):
+    """(archive path, record number) for an archived crop, None for a plain image file."""
+    archive_path, separator, index = face_path.rpartition(REF_SEPARATOR)
+    if not separator or not index.isdigit() or not archive_path.endswith(PACK_SUFFIX):
+        return None
+    return archive_path, int(index)
+
+
+class CropArchive:
+    """
+    Append-only store of face crops: one data file of concatenated JPEGs, each optionally followed by its
+    viewer thumbnail, and an index file of fixed-size (offset, length, thumbnail offset, thumbnail length)
+    records. Crops are referred to by record number (see archive_ref), which is what the case database and
+    the gallery keep instead of a file path. Data is flushed before its index record, so readers only ever
+    see complete crops, and a torn tail left by a crash is cut off when the archive is reopened.
+    """
+
+    def __init__(self, path=ARCHIVE_NAME):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.data = open(path, "ab")
+        self.index = open(self.index_path, "ab")
+        self.count, self.size = self._recover()
+
+    def _recover(self):
+        count = os.path.getsize(self.index_path) // RECORD.size
+        self.index.truncate(count * RECORD.size)
+        size = 0
+        if count:
+            with open(self.index_path, "rb") as f:
+                f.seek((count - 1) * RECORD.size)
+                offset, length, thumb_offset, thumb_length = RECORD.unpack(f.read(RECORD.size))
+            size = max(offset + length, thumb_offset + thumb_length)
+        self.data.truncate(size)
+        return count, size
+
+    def __len__(self):
+        return self.count
+
+    def append(self, encoded, thumbnail=None):
+        """Add one encoded crop (and its encoded thumbnail); returns its reference."""
+        encoded = memoryview(encoded).cast("B")
+        thumbnail = memoryview(thumbnail or b"").cast("B")
+        with self.lock:
+            offset = self.size
+            self.data.write(encoded)
+            self.data.write(thumbnail)
+            self.data.flush()
+            self.size = offset + encoded.nbytes + thumbnail.nbytes
+            self.index.write(RECORD.pack(offset, encoded.nbytes, offset + encoded.nbytes, thumbnail.nbytes))
+            self.index.flush()
+            index = self.count
+            self.count += 1
+        return archive_ref(self.path, index)
+
+    def close(self):
+        with self.lock:
+            self.data.close()
+            self.index.close()
+
+
+class ArchiveReader:
+    """Random access to the crops of an archive through mmap. Crops appended after opening are picked up."""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.records = b""
+        self.map = None
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            self.refresh()
+            return len(self.records) // RECORD.size
+
+    def refresh(self):
+        with open(self.index_path, "rb") as f:
+            records = f.read()
+        self.records = records[:len(records) - len(records) % RECORD.size]
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if os.path.getsize(self.path):
+            with open(self.path, "rb") as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _slice(self, index, thumbnail):
+        with self.lock:
+            if (index + 1) * RECORD.size > len(self.records):
+                self.refresh()
+                if (index + 1) * RECORD.size > len(self.records):
+                    raise IndexError(f"{self.path} has no crop {index}")
+            offset, length, thumb_offset, thumb_length = RECORD.unpack_from(self.records, index * RECORD.size)
+            if thumbnail:
+                offset, length = thumb_offset, thumb_length
+            return self.map[offset:offset + length]
+
+    def read(self, index):
+        return self._slice(index, False)
+
+    def read_thumbnail(self, index):
+        """The stored viewer thumbnail, or b"" when the crop was archived without one."""
+        return self._slice(index, True)
+
+    def close(self):
+        with self.lock:
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def reader(archive_path):
+    """Shared reader per archive, so every gallery tile maps the archive once."""
+    key = os.path.abspath(archive_path)
+    with _readers_lock:
+        if key not in _readers:
+            _readers[key] = ArchiveReader(archive_path)
+        return _readers[key]
+
+
+def read_crop(face_path):
+    """Encoded bytes of a face, archived or stored as its own file."""
+    member = split_ref(face_path)
+    if member is None:
+        with open(face_path, "rb") as f:
+            return f.read()
+    archive_path, index = member
+    return reader(archive_path).read(index)
+
+
+def read_thumbnail(face_path):
+    member = split_ref(face_path)
+    if member is None:
+        return b""
+    archive_path, index = member
+    return reader(archive_path).read_thumbnail(index)
+
+
+def export_crops(faces, folder):
+    """
+    Write faces as loose JPEG files for tools that expect one file per face.
+    faces is an iterable of (face path, file name); returns the number of files written.
+    """
+    os.makedirs(folder, exist_ok=True)
+    written = 0
+    for face_path, name in faces:
+        target = os.path.join(folder, name)
+        if split_ref(face_path) is None:
+            shutil.copyfile(face_path, target)
+        else:
+            with open(target, "wb") as f:
+                f.write(read_crop(face_path))
+        written += 1
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or export a face crop archive.")
+    parser.add_argument("archive", help="Archive file, e.g. video_analysis_output/faces.pack")
+    parser.add_argument("--export", help="Write every crop to this folder as a JPEG file")
+    parser.add_argument("--case-db", help="Name exported files face_<frame>_<n>.jpg using this case.db")
+    args = parser.parse_args()
+
+    archive = ArchiveReader(args.archive)
+    print(f"{args.archive}: {len(archive)} crops, {os.path.getsize(args.archive) / 1e6:.1f} MB")
+    if args.export:
+        if args.case_db:
+            from case_db import CaseDatabase
+
+            case_db = CaseDatabase(args.case_db)
+            rows = case_db.query(
+                "SELECT frame, face_path FROM faces WHERE face_path LIKE ? ORDER BY video_id, frame, id",
+                (args.archive + REF_SEPARATOR + "%",),
+            )
+            faces = [(row["face_path"], f"face_{row['frame']}_{split_ref(row['face_path'])[1]}.jpg") for row in rows]
+            case_db.close()
+        else:
+            faces = [(archive_ref(args.archive, index), f"face_{index:06d}.jpg") for index in range(len(archive))]
+        print(f"Exported {export_crops(faces, args.export)} crops to {args.export}")
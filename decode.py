@@ -0,0 +1,171 @@
+import os
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+
+
+class OpenCVSource:
+    """
+    cv2.VideoCapture opened with an explicit backend (FFmpeg by default) and decoder settings.
+    threads=0 lets FFmpeg pick one decode thread per core; hw_acceleration asks for any available
+    hardware decoder and silently falls back to software. read() decodes into a buffer that is reused
+    for every frame, so the returned array is only valid until the next read - copy anything kept longer.
+    """
+
+    def __init__(self, video_path, threads=0, hw_acceleration=False, backend=cv2.CAP_FFMPEG):
+        params = [cv2.CAP_PROP_N_THREADS, threads]
+        if hw_acceleration:
+            params += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        self.cap = cv2.VideoCapture(video_path, backend, params)
+        if not self.cap.isOpened():
+            # Backend or parameters not supported by this OpenCV build
+            self.cap = cv2.VideoCapture(video_path)
+        self.buffer = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def grab(self):
+        return self.cap.grab()
+
+    def read(self):
+        ret, frame = self.cap.read(self.buffer)
+        if ret:
+            self.buffer = frame
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class FFmpegPipeSource:
+    """
+    Raw frames piped from a local ffmpeg process. Scaling and pixel-format conversion run inside the
+    decoder, and each frame is read straight into a preallocated buffer exposed as a NumPy view
+    without copying. Like OpenCVSource, the returned frame is overwritten by the next read().
+    """
+
+    def __init__(self, video_path, threads=0, size=None, pix_fmt="bgr24", ffmpeg="ffmpeg"):
+        if shutil.which(ffmpeg) is None:
+            raise FileNotFoundError(f"{ffmpeg} executable not found on PATH")
+        probe = cv2.VideoCapture(video_path)
+        self.properties = {
+            cv2.CAP_PROP_FPS: probe.get(cv2.CAP_PROP_FPS),
+            cv2.CAP_PROP_FRAME_COUNT: probe.get(cv2.CAP_PROP_FRAME_COUNT),
+            cv2.CAP_PROP_FRAME_WIDTH: probe.get(cv2.CAP_PROP_FRAME_WIDTH),
+            cv2.CAP_PROP_FRAME_HEIGHT: probe.get(cv2.CAP_PROP_FRAME_HEIGHT),
+        }
+        probe.release()
+        width, height = size or (int(self.properties[cv2.CAP_PROP_FRAME_WIDTH]),
+                                 int(self.properties[cv2.CAP_PROP_FRAME_HEIGHT]))
+        self.properties[cv2.CAP_PROP_FRAME_WIDTH] = width
+        self.properties[cv2.CAP_PROP_FRAME_HEIGHT] = height
+
+        channels = {"bgr24": 3, "gray": 1}[pix_fmt]
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        command = [
+            ffmpeg, "-loglevel", "error", "-nostdin", "-threads", str(threads), "-i", video_path,
+            "-vf", f"scale={width}:{height}", "-pix_fmt", pix_fmt, "-f", "rawvideo", "-",
+        ]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=0)
+        self.buffer = bytearray(width * height * channels)
+        self.view = memoryview(self.buffer)
+        self.frame = np.frombuffer(self.buffer, dtype=np.uint8).reshape(shape)
+        self.position = 0
+
+    def isOpened(self):
+        return self.process.poll() is None or self.position > 0
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.position
+        return self.properties.get(prop, 0)
+
+    def set(self, prop, value):
+        # A pipe cannot seek
+        return False
+
+    def _read_into_buffer(self):
+        filled = 0
+        while filled < len(self.buffer):
+            count = self.process.stdout.readinto(self.view[filled:])
+            if not count:
+                return False
+            filled += count
+        self.position += 1
+        return True
+
+    def grab(self):
+        return self._read_into_buffer()
+
+    def read(self):
+        if not self._read_into_buffer():
+            return False, None
+        return True, self.frame
+
+    def release(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.stdout.close()
+        self.process.wait()
+
+
+def scaled_size(width, height, target_width):
+    """Frame size for scaling to target_width with the aspect ratio kept and an even height."""
+    return target_width, int(round(height * target_width / width / 2)) * 2
+
+
+DECODERS = {
+    "opencv": OpenCVSource,
+    "ffmpeg": FFmpegPipeSource,
+}
+
+
+def open_video(video_path, decoder="opencv", **options):
+    """Open a video with one of the DECODERS; the result can be used wherever a cv2.VideoCapture was."""
+    if decoder not in DECODERS:
+        raise ValueError(f"Unknown decoder '{decoder}', choose from {', '.join(DECODERS)}")
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(video_path)
+    return DECODERS[decoder](video_path, **options)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Measure decode throughput of each decoder configuration.")
+    parser.add_argument("video", help="Video file to decode")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 0], help="Decoder thread counts (0 = auto)")
+    parser.add_argument("--width", type=int, help="Scale to this width in the ffmpeg decoder (keeps aspect)")
+    args = parser.parse_args()
+
+    configurations = [("opencv", {"threads": threads}) for threads in args.threads]
+    configurations += [("ffmpeg", {"threads": threads}) for threads in args.threads]
+    if args.width:
+        cap = cv2.VideoCapture(args.video)
+        size = scaled_size(cap.get(cv2.CAP_PROP_FRAME_WIDTH), cap.get(cv2.CAP_PROP_FRAME_HEIGHT), args.width)
+        cap.release()
+        configurations.append(("ffmpeg", {"threads": 0, "size": size}))
+
+    for decoder, options in configurations:
+        try:
+            source = open_video(args.video, decoder, **options)
+        except FileNotFoundError as error:
+            print(f"Skipping {decoder}: {error}")
+            continue
+        frames = 0
+        start = time.perf_counter()
+        while source.read()[0]:
+            frames += 1
+        elapsed = time.perf_counter() - start
+        source.release()
+        print(f"{decoder:<8}{str(options):<40}{frames:>7} frames {frames / elapsed:>8.1f} frames/s")
@@ -0,0 +1,109 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from detectors import DETECTORS, create_detector, iou
+
+
+def load_labels(video_path):
+    """
+    Load ground-truth boxes for a clip from the JSON file next to it (clip.mp4 -> clip.json):
+    {"frames": {"<frame index>": [[x, y, w, h], ...]}}. Only labelled frames are evaluated.
+    """
+    labels_path = os.path.splitext(video_path)[0] + ".json"
+    with open(labels_path) as f:
+        frames = json.load(f)["frames"]
+    return {int(frame): [tuple(box) for box in boxes] for frame, boxes in frames.items()}
+
+
+def match_boxes(detections, truths, iou_threshold=0.5):
+    """Greedily match detections to ground truth by IoU; returns (true positives, false positives, false negatives)."""
+    unmatched = list(truths)
+    true_positives = 0
+    for detection in detections:
+        scores = [iou(detection, truth) for truth in unmatched]
+        if scores and max(scores) >= iou_threshold:
+            unmatched.pop(int(np.argmax(scores)))
+            true_positives += 1
+    return true_positives, len(detections) - true_positives, len(unmatched)
+
+
+def benchmark_detector(detector, clip_paths, iou_threshold=0.5):
+    """Run one detector over every labelled frame of the clips and collect speed and accuracy figures."""
+    latencies = []
+    true_positives = false_positives = false_negatives = 0
+    for clip_path in clip_paths:
+        labels = load_labels(clip_path)
+        cap = cv2.VideoCapture(clip_path)
+        frame_count = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_count in labels:
+                start = time.perf_counter()
+                detections = detector.detect(frame)
+                latencies.append(time.perf_counter() - start)
+                tp, fp, fn = match_boxes(detections, labels[frame_count], iou_threshold)
+                true_positives += tp
+                false_positives += fp
+                false_negatives += fn
+            frame_count += 1
+        cap.release()
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "detector": detector.name,
+        "frames": len(latencies),
+        "fps": len(latencies) / latencies_ms.sum() * 1000 if len(latencies) else 0.0,
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)) if len(latencies) else 0.0,
+        "latency_p90_ms": float(np.percentile(latencies_ms, 90)) if len(latencies) else 0.0,
+        "latency_p99_ms": float(np.percentile(latencies_ms, 99)) if len(latencies) else 0.0,
+        "precision": true_positives / max(1, true_positives + false_positives),
+        "recall": true_positives / max(1, true_positives + false_negatives),
+    }
+
+
+def run_benchmark(clips_dir, detector_names, output_path=None):
+    clip_paths = sorted(
+        path for path in glob.glob(os.path.join(clips_dir, "*"))
+        if path.lower().endswith((".mp4", ".avi", ".mov")) and os.path.exists(os.path.splitext(path)[0] + ".json")
+    )
+    if not clip_paths:
+        print(f"No labelled clips found in {clips_dir}")
+        return []
+
+    results = []
+    for name in detector_names:
+        try:
+            detector = create_detector(name)
+        except (FileNotFoundError, ImportError) as error:
+            print(f"Skipping {name}: {error}")
+            continue
+        results.append(benchmark_detector(detector, clip_paths))
+
+    print(f"{'Detector':<10}{'Frames':>8}{'FPS':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'Prec.':>8}{'Recall':>8}")
+    for result in results:
+        print(
+            f"{result['detector']:<10}{result['frames']:>8}{result['fps']:>9.1f}{result['latency_p50_ms']:>9.1f}"
+            f"{result['latency_p90_ms']:>9.1f}{result['latency_p99_ms']:>9.1f}"
+            f"{result['precision']:>8.2f}{result['recall']:>8.2f}"
+        )
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=4)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare face detector backends on a labelled clip set.")
+    parser.add_argument("clips_dir", help="Folder of clips, each with a same-named .json label file")
+    parser.add_argument("--detectors", nargs="+", default=list(DETECTORS), help="Backends to benchmark")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+    run_benchmark(args.clips_dir, args.detectors, args.output)
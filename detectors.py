@@ -0,0 +1,195 @@
+import os
+
+import cv2
+import numpy as np
+
+MODELS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+
+def _model_path(path, default_name):
+    path = path or os.path.join(MODELS_FOLDER, default_name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model file not found: {path} (place {default_name} in {MODELS_FOLDER})")
+    return path
+
+
+class FaceDetector:
+    """Common detector interface: detect(frame) takes a BGR frame and returns a list of (x, y, w, h) boxes."""
+
+    name = "base"
+
+    def detect(self, frame, gray=None):
+        raise NotImplementedError
+
+
+class HaarDetector(FaceDetector):
+    """OpenCV cascade classifier; `gray` lets callers that already converted the frame skip a cvtColor."""
+
+    name = "haar"
+    default_cascade = "haarcascade_frontalface_default.xml"
+
+    def __init__(self, cascade_path=None, scale_factor=1.1, min_neighbors=5, min_size=(50, 50)):
+        if cascade_path is None:
+            cascade_path = self.default_cascade_path()
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise FileNotFoundError(f"Could not load cascade: {cascade_path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def default_cascade_path(self):
+        return cv2.data.haarcascades + self.default_cascade
+
+    def detect(self, frame, gray=None):
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = self.cascade.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors, minSize=self.min_size
+        )
+        return [tuple(int(v) for v in face) for face in faces]
+
+
+class LbpDetector(HaarDetector):
+    """LBP cascade: several times faster than Haar at a small recall cost. opencv-python does not ship it."""
+
+    name = "lbp"
+    default_cascade = "lbpcascade_frontalface_improved.xml"
+
+    def default_cascade_path(self):
+        return _model_path(None, self.default_cascade)
+
+
+class DnnDetector(FaceDetector):
+    """OpenCV DNN res10 300x300 SSD face detector (Caffe model), run on CPU."""
+
+    name = "dnn"
+
+    def __init__(self, prototxt_path=None, model_path=None, confidence=0.5, input_size=(300, 300)):
+        self.net = cv2.dnn.readNetFromCaffe(
+            _model_path(prototxt_path, "deploy.prototxt"),
+            _model_path(model_path, "res10_300x300_ssd_iter_140000.caffemodel"),
+        )
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.confidence = confidence
+        self.input_size = input_size
+
+    def detect(self, frame, gray=None):
+        height, width = frame.shape[:2]
+        blob = cv2.dnn.blobFromImage(frame, 1.0, self.input_size, (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+        detections = detections[detections[:, 2] >= self.confidence]
+        boxes = np.clip(detections[:, 3:7], 0.0, 1.0) * np.array([width, height, width, height])
+        return [
+            (int(x1), int(y1), int(x2 - x1), int(y2 - y1))
+            for x1, y1, x2, y2 in boxes
+            if x2 > x1 and y2 > y1
+        ]
+
+
+class YuNetDetector(FaceDetector):
+    """OpenCV YuNet ONNX face detector (cv2.FaceDetectorYN), run on CPU."""
+
+    name = "yunet"
+
+    def __init__(self, model_path=None, score_threshold=0.6, nms_threshold=0.3):
+        self.detector = cv2.FaceDetectorYN.create(
+            _model_path(model_path, "face_detection_yunet_2023mar.onnx"), "", (320, 320), score_threshold, nms_threshold
+        )
+        self.input_size = (320, 320)
+
+    def detect(self, frame, gray=None):
+        height, width = frame.shape[:2]
+        if self.input_size != (width, height):
+            self.input_size = (width, height)
+            self.detector.setInputSize(self.input_size)
+        _, faces = self.detector.detect(frame)
+        if faces is None:
+            return []
+        # YuNet boxes can extend past the frame edges; clip them like the DNN boxes so crops stay valid
+        corners = faces[:, :4].copy()
+        corners[:, 2:] += corners[:, :2]
+        boxes = np.clip(corners, 0, [width, height, width, height])
+        return [
+            (int(x1), int(y1), int(x2) - int(x1), int(y2) - int(y1))
+            for x1, y1, x2, y2 in boxes
+            if int(x2) > int(x1) and int(y2) > int(y1)
+        ]
+
+
+class HogDetector(FaceDetector):
+    """dlib HOG detector through face_recognition.face_locations, as used by file1.py."""
+
+    name = "hog"
+
+    def __init__(self, upsample=1):
+        import face_recognition
+
+        self.face_recognition = face_recognition
+        self.upsample = upsample
+
+    def detect(self, frame, gray=None):
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        locations = self.face_recognition.face_locations(rgb, number_of_times_to_upsample=self.upsample, model="hog")
+        return [(left, top, right - left, bottom - top) for top, right, bottom, left in locations]
+
+
+def non_max_suppression(faces, overlap_thresh=0.5):
+    """Eliminate overlapping bounding boxes."""
+    if len(faces) == 0:
+        return []
+
+    # Sort boxes by area (largest to smallest)
+    boxes = sorted(faces, key=lambda x: x[2] * x[3], reverse=True)
+    picked = []
+
+    while boxes:
+        current = boxes.pop(0)
+        picked.append(current)
+        boxes = [box for box in boxes if not is_overlapping(current, box, overlap_thresh)]
+
+    return picked
+
+
+def is_overlapping(box1, box2, threshold):
+    """Check if two boxes overlap."""
+    x1, y1, w1, h1 = box1
+    x2, y2, w2, h2 = box2
+
+    # Calculate the area of the intersection
+    overlap_x1 = max(x1, x2)
+    overlap_y1 = max(y1, y2)
+    overlap_x2 = min(x1 + w1, x2 + w2)
+    overlap_y2 = min(y1 + h1, y2 + h2)
+    intersection_area = max(0, overlap_x2 - overlap_x1) * max(0, overlap_y2 - overlap_y1)
+
+    area1 = w1 * h1
+    area2 = w2 * h2
+    overlap_ratio = intersection_area / min(area1, area2)
+    return overlap_ratio > threshold
+
+
+def iou(box1, box2):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    x1, y1, w1, h1 = box1
+    x2, y2, w2, h2 = box2
+    overlap_w = max(0, min(x1 + w1, x2 + w2) - max(x1, x2))
+    overlap_h = max(0, min(y1 + h1, y2 + h2) - max(y1, y2))
+    intersection = overlap_w * overlap_h
+    union = w1 * h1 + w2 * h2 - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+DETECTORS = {
+    detector.name: detector
+    for detector in (HaarDetector, LbpDetector, DnnDetector, YuNetDetector, HogDetector)
+}
+
+
+def create_detector(name="haar", **options):
+    """Instantiate a detector backend by name: haar, lbp, dnn, yunet or hog."""
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown detector '{name}', choose one of: {', '.join(DETECTORS)}")
+    return DETECTORS[name](**options)
@@ -0,0 +1,49 @@
+import queue
+import threading
+from collections import namedtuple
+
+FaceEvent = namedtuple("FaceEvent", ["face_path", "frame", "timestamp", "box"])
+
+
+class FaceEventStream:
+    """
+    Thread-safe hand-off of saved face crops from an extraction thread to the GUI.
+    The extractor calls publish() for each face (it matches the on_face callback of pipeline.FaceSink)
+    and finish() when done; the Tk thread drains whatever has arrived on a timer. stop() asks the
+    extractor to end early through stop_requested, which extract_faces checks once per frame.
+    """
+
+    def __init__(self):
+        self.events = queue.SimpleQueue()
+        self.stop_requested = threading.Event()
+        self.finished = threading.Event()
+        self.published = 0
+
+    def publish(self, face_path, frame, timestamp, box):
+        self.published += 1
+        self.events.put(FaceEvent(face_path, frame, timestamp, box))
+
+    def finish(self):
+        self.finished.set()
+
+    def stop(self):
+        self.stop_requested.set()
+
+    @property
+    def stopped(self):
+        return self.stop_requested.is_set()
+
+    @property
+    def done(self):
+        """True once the extractor has finished and every event has been drained."""
+        return self.finished.is_set() and self.events.empty()
+
+    def drain(self, limit=None):
+        """Events published since the last call, without blocking."""
+        drained = []
+        while limit is None or len(drained) < limit:
+            try:
+                drained.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return drained
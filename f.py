@@ -3,7 +3,9 @@ from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
 import cv2
 import os
+import threading
 from datetime import datetime
+from events import FaceEventStream
 
 
 class NUCESVideoTriage:
@@ -21,6 +23,8 @@ class NUCESVideoTriage:
         self.metadata = None
         self.face_images = []
         self.face_index = 0
+        self.face_stream = None
+        self.stop_button = None
 
         self.init_menu()
         self.init_welcome_screen()
@@ -153,7 +157,7 @@ class NUCESVideoTriage:
         file_path = filedialog.askopenfilename(filetypes=[("Video Files", "*.mp4;*.avi;*.mov")])
         if file_path:
             self.video_path = file_path
-            self.extract_metadata_and_faces()
+            self.start_analysis()
             self.init_player_screen()
             self.play_video()
 
@@ -240,6 +244,23 @@ class NUCESVideoTriage:
     def display_faces_buttons(self):
         self.clear_panel()
 
+        self.faces_status = tk.Label(self.control_section, text="", font=("Courier", 12), bg="black", fg="red")
+        self.faces_status.pack(pady=5)
+        if not self.face_stream.done:
+            self.stop_button = tk.Button(
+                self.control_section,
+                text="Stop Analysis",
+                command=self.face_stream.stop,
+                font=("Courier", 12, "bold"),
+                bg="red",
+                fg="black",
+                activebackground="#8B0000",
+                relief="raised",
+                bd=3,
+            )
+            self.stop_button.pack(pady=5)
+        self.update_faces_status()
+
         prev_face_button = tk.Button(
             self.control_section,
             text="Previous Face",
@@ -270,9 +291,34 @@ class NUCESVideoTriage:
         )
         next_face_button.pack(side="left", padx=10)
 
-    def extract_metadata_and_faces(self):
+    def start_analysis(self):
+        """Read the metadata, then extract faces in the background so the first ones can be browsed right away."""
+        if self.face_stream is not None:
+            # A previous video's extraction would otherwise keep running alongside the new one
+            self.face_stream.stop()
         self.metadata = self.extract_metadata(self.video_path)
-        self.face_images = self.extract_faces(self.video_path)
+        self.face_images = []
+        self.face_index = 0
+        self.face_stream = FaceEventStream()
+        threading.Thread(target=self.extract_faces, args=(self.video_path, self.face_stream), daemon=True).start()
+        self.collect_faces(self.face_stream)
+
+    def collect_faces(self, face_stream):
+        if face_stream is not self.face_stream:
+            return
+        self.face_images.extend(event.face_path for event in face_stream.drain())
+        if not face_stream.done:
+            self.root.after(250, self.collect_faces, face_stream)
+
+    def update_faces_status(self):
+        if not self.faces_status.winfo_exists():
+            return
+        status = " (stopped)" if self.face_stream.stopped else "" if self.face_stream.done else " (analysing...)"
+        self.faces_status.config(text=f"Faces found: {len(self.face_images)}{status}")
+        if not self.face_stream.done:
+            self.root.after(250, self.update_faces_status)
+        elif self.stop_button is not None and self.stop_button.winfo_exists():
+            self.stop_button.destroy()
 
     def extract_metadata(self, video_path):
         cap = cv2.VideoCapture(video_path)
@@ -298,29 +344,32 @@ class NUCESVideoTriage:
         cap.release()
         return metadata
 
-    def extract_faces(self, video_path):
+    def extract_faces(self, video_path, face_stream):
+        """Runs on a background thread, publishing each face on face_stream as soon as it is saved."""
         cap = cv2.VideoCapture(video_path)
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        face_images = []
-        frame_count = 0
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            if frame_count % 5 == 0:
-                gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = face_cascade.detectMultiScale(gray_frame, scaleFactor=1.1, minNeighbors=5, minSize=(50, 50))
-                for i, (x, y, w, h) in enumerate(faces):
-                    face_image = frame[y:y + h, x:x + w]
-                    face_path = os.path.join(self.output_folder, f"face_{frame_count}_{i}.jpg")
-                    cv2.imwrite(face_path, face_image)
-                    face_images.append(face_path)
-            frame_count += 1
-
-        cap.release()
-        return face_images
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            frame_count = 0
+
+            while not face_stream.stopped:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+
+                if frame_count % 5 == 0:
+                    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    faces = face_cascade.detectMultiScale(gray_frame, scaleFactor=1.1, minNeighbors=5, minSize=(50, 50))
+                    for i, (x, y, w, h) in enumerate(faces):
+                        face_image = frame[y:y + h, x:x + w]
+                        face_path = os.path.join(self.output_folder, f"face_{frame_count}_{i}.jpg")
+                        cv2.imwrite(face_path, face_image)
+                        face_stream.publish(face_path, frame_count, frame_count / fps if fps > 0 else 0, (x, y, w, h))
+                frame_count += 1
+        finally:
+            # The gallery waits for finish(), so it must happen even if decoding or writing fails
+            cap.release()
+            face_stream.finish()
 
     def prev_face(self):
         if self.face_images and self.face_index > 0:
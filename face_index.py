@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+COLUMNS = ("embeddings", "video_ids", "frames", "timestamps")
+
+
+class FaceIndex:
+    """
+    Persistent case-level index of face embeddings with pointers back to video, frame and timestamp.
+    Every processed video appends an immutable segment of column files (.npy) that are memory-mapped
+    at query time, so a query-by-face over all videos is one vectorised distance computation and
+    never touches the video files. Segments are named by creation time plus a random suffix, so
+    concurrent appenders never pick the same name, and a new segment is always renamed into place
+    before the segments it replaces are deleted: a crash can leave duplicates but never loses faces.
+    Registering a video and replacing its segments happen under a lock file shared by every instance
+    and process, and videos.json is re-read under it, so two writers never give one id to two videos.
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        self.videos_path = os.path.join(index_dir, "videos.json")
+        self.lock_path = os.path.join(index_dir, "index.lock")
+        self.videos = []
+        self.read_videos()
+        self.columns = None
+
+    def read_videos(self):
+        if os.path.exists(self.videos_path):
+            with open(self.videos_path) as f:
+                self.videos = json.load(f)
+
+    @contextmanager
+    def locked(self, timeout_s=60.0):
+        """Hold the index lock file, created exclusively, for the duration of the block."""
+        deadline = time.monotonic() + timeout_s
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{self.lock_path} is held by another writer; remove it if none is running")
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(self.lock_path)
+
+    def video_id(self, video_path):
+        """Return the id of a video, registering it on first use."""
+        with self.locked():
+            return self._register(video_path)
+
+    def _register(self, video_path):
+        # Called with the lock held; another writer may have registered videos since this instance read the list
+        self.read_videos()
+        video_path = os.path.abspath(video_path)
+        if video_path not in self.videos:
+            self.videos.append(video_path)
+            temp_path = self.videos_path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self.videos, f, indent=4)
+            os.replace(temp_path, self.videos_path)
+        return self.videos.index(video_path)
+
+    def segment_dirs(self):
+        return sorted(
+            os.path.join(self.index_dir, name)
+            for name in os.listdir(self.index_dir)
+            if name.startswith("segment_") and not name.endswith(".tmp")
+        )
+
+    def _write_segment(self, values):
+        """Write columns as a new segment under a unique name; the segment appears atomically via rename."""
+        segment_dir = os.path.join(self.index_dir, f"segment_{time.time_ns():020d}_{uuid.uuid4().hex[:8]}")
+        temp_dir = segment_dir + ".tmp"
+        os.makedirs(temp_dir)
+        for name in COLUMNS:
+            np.save(os.path.join(temp_dir, f"{name}.npy"), values[name])
+        os.replace(temp_dir, segment_dir)
+        self.columns = None
+        return segment_dir
+
+    def append(self, video_path, embeddings, frames, timestamps):
+        """
+        Add the faces of one video as a new segment. Faces indexed for the video before (a re-analysis)
+        are replaced: their segments are deleted, or rewritten without them if they hold other videos too.
+        """
+        with self.locked():
+            self._append(self._register(video_path), embeddings, frames, timestamps)
+
+    def _append(self, video_id, embeddings, frames, timestamps):
+        previous = self.segment_dirs()
+        if len(embeddings):
+            self._write_segment({
+                "embeddings": np.asarray(embeddings, dtype=np.float32).reshape(-1, 128),
+                "video_ids": np.full(len(embeddings), video_id, dtype=np.int32),
+                "frames": np.asarray(frames, dtype=np.int64),
+                "timestamps": np.asarray(timestamps, dtype=np.float32),
+            })
+        for segment_dir in previous:
+            video_ids = np.load(os.path.join(segment_dir, "video_ids.npy"))
+            others = video_ids != video_id
+            if others.all():
+                continue
+            if others.any():
+                self._write_segment({
+                    name: np.load(os.path.join(segment_dir, f"{name}.npy"))[others] for name in COLUMNS
+                })
+            shutil.rmtree(segment_dir)
+        self.columns = None
+
+    def load(self):
+        """Memory-map every segment and concatenate the columns (cached until the next append)."""
+        if self.columns is None:
+            self.read_videos()
+            segments = [
+                {name: np.load(os.path.join(segment_dir, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+                for segment_dir in self.segment_dirs()
+            ]
+            if len(segments) == 1:
+                self.columns = dict(segments[0])
+            elif segments:
+                self.columns = {name: np.concatenate([segment[name] for segment in segments]) for name in COLUMNS}
+            else:
+                self.columns = {
+                    "embeddings": np.empty((0, 128), dtype=np.float32),
+                    "video_ids": np.empty(0, dtype=np.int32),
+                    "frames": np.empty(0, dtype=np.int64),
+                    "timestamps": np.empty(0, dtype=np.float32),
+                }
+            embeddings = self.columns["embeddings"]
+            self.columns["norms"] = np.einsum("ij,ij->i", embeddings, embeddings)
+        return self.columns
+
+    def compact(self):
+        """Merge all segments into one so later loads open fewer files."""
+        with self.locked():
+            segment_dirs = self.segment_dirs()
+            if len(segment_dirs) < 2:
+                return
+            self.columns = None
+            columns = self.load()
+            self._write_segment({name: np.array(columns[name]) for name in COLUMNS})
+            # Only once the compacted segment is in place, so a crash never leaves the index without these faces
+            for segment_dir in segment_dirs:
+                shutil.rmtree(segment_dir)
+
+    def query(self, embedding, threshold=0.6, limit=100):
+        """Return matches closer than threshold as dicts with video, frame, timestamp and distance, nearest first."""
+        columns = self.load()
+        embeddings = columns["embeddings"]
+        if len(embeddings) == 0:
+            return []
+        embedding = np.asarray(embedding, dtype=np.float32)
+        squared = columns["norms"] - 2.0 * (embeddings @ embedding) + embedding @ embedding
+        distances = np.sqrt(np.maximum(squared, 0.0))
+        hits = np.flatnonzero(distances < threshold)
+        hits = hits[np.argsort(distances[hits])][:limit]
+        return [
+            {
+                "video": self.videos[columns["video_ids"][i]],
+                "frame": int(columns["frames"][i]),
+                "timestamp": float(columns["timestamps"][i]),
+                "distance": float(distances[i]),
+            }
+            for i in hits
+        ]
+
+    def where_else(self, embedding, threshold=0.6):
+        """Summarise, per video, where a face appears: number of hits, first and last timestamp, best distance."""
+        appearances = {}
+        for match in self.query(embedding, threshold, limit=None):
+            video = appearances.setdefault(match["video"], {
+                "video": match["video"],
+                "hits": 0,
+                "first_seen": match["timestamp"],
+                "last_seen": match["timestamp"],
+                "best_distance": match["distance"],
+            })
+            video["hits"] += 1
+            video["first_seen"] = min(video["first_seen"], match["timestamp"])
+            video["last_seen"] = max(video["last_seen"], match["timestamp"])
+        return sorted(appearances.values(), key=lambda video: video["best_distance"])
+
+
+def encode_query_image(image_path):
+    """Encode the first face found in an image with face_recognition."""
+    import face_recognition
+
+    image = face_recognition.load_image_file(image_path)
+    encodings = face_recognition.face_encodings(image)
+    if not encodings:
+        raise ValueError(f"No face found in {image_path}")
+    return encodings[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find every processed video in which a face appears.")
+    parser.add_argument("index_dir", help="Case face index directory")
+    parser.add_argument("image", help="Image containing the face to search for")
+    parser.add_argument("--threshold", type=float, default=0.6, help="Maximum encoding distance for a match")
+    args = parser.parse_args()
+
+    face_index = FaceIndex(args.index_dir)
+    for appearance in face_index.where_else(encode_query_image(args.image), args.threshold):
+        print(
+            f"{appearance['video']}: {appearance['hits']} hits between "
+            f"{appearance['first_seen']:.1f}s and {appearance['last_seen']:.1f}s "
+            f"(best distance {appearance['best_distance']:.2f})"
+        )
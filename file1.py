@@ -3,11 +3,23 @@ import os
 import json
 import numpy as np
 import face_recognition
-
-def extract_faces(video_path, frames_dir, face_dir, known_faces_dir, every=5, alert_threshold=0.6):
+from case_db import CASE_DB_PATH, CaseDatabase
+from detectors import HogDetector
+from roi import with_roi
+from sampling import AdaptiveSampler, FixedSampler
+from clustering import CASE_CLUSTERS_FILE, ENCODINGS_FILE, cluster_into_case
+from face_index import FaceIndex
+
+def extract_faces(video_path, frames_dir, face_dir, known_faces_dir, every=5, alert_threshold=0.6, index_dir=None,
+                  case_db_path=CASE_DB_PATH, detector=None, sampler=None):
     """
     Extract faces from video, save them, and compare with known faces.
     Enhanced with name labels, confidence scores, and metadata logging.
+    When index_dir is given, the face encodings are also appended to that case-level FaceIndex.
+    Faces are recorded in the case database at case_db_path (default: the shared case_db.CASE_DB_PATH).
+    Any detectors.FaceDetector can be passed as detector; the default is the HOG backend.
+    A <video>.roi.json next to the video limits detection to its regions of interest.
+    Frames are analysed every `every` frames unless a sampling.AdaptiveSampler is passed as sampler.
     """
     video_path = os.path.normpath(video_path)
     frames_dir = os.path.normpath(frames_dir)
@@ -25,8 +37,22 @@ def extract_faces(video_path, frames_dir, face_dir, known_faces_dir, every=5, al
 
     # Get video FPS for timestamp calculation
     fps = cap.get(cv2.CAP_PROP_FPS)
+    case_db = CaseDatabase(case_db_path)
+    video_id = case_db.add_video(
+        video_path,
+        int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        fps,
+        int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+    )
+    case_db.clear_faces(video_id)
     known_faces = load_known_faces(known_faces_dir)
+    detector = with_roi(detector or HogDetector(), video_path)
+    sampler = sampler or FixedSampler(every)
     metadata = []
+    encodings = []
+    face_frames = []
+    face_timestamps = []
     detected_faces_count = 0
     frame_count = 0
 
@@ -35,8 +61,10 @@ def extract_faces(video_path, frames_dir, face_dir, known_faces_dir, every=5, al
         if not ret:
             break
 
-        # Extract frames at intervals (every nth frame)
-        if frame_count % every == 0:
+        # Extract frames chosen by the sampler (every nth frame, or adaptively)
+        if not sampler.should_analyse(frame_count):
+            sampler.record_skip()
+        else:
             frame_path = os.path.join(frames_dir, f"frame_{frame_count:05d}.jpg")
             timestamp = frame_count / fps  # Calculate timestamp in seconds
             formatted_time = f"{int(timestamp // 60)}:{int(timestamp % 60):02d}"
@@ -49,7 +77,7 @@ def extract_faces(video_path, frames_dir, face_dir, known_faces_dir, every=5, al
                         cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
 
             # Detect faces in the frame
-            face_locations = face_recognition.face_locations(frame)
+            face_locations = [(y, x + w, y + h, x) for x, y, w, h in detector.detect(frame)]
             face_encodings = face_recognition.face_encodings(frame, face_locations)
 
             for face_location, face_encoding in zip(face_locations, face_encodings):
@@ -70,6 +98,7 @@ def extract_faces(video_path, frames_dir, face_dir, known_faces_dir, every=5, al
 
                 # Save metadata
                 metadata.append({
+                    "video": video_path,
                     "frame_id": frame_count,
                     "timestamp": formatted_time,
                     "face_id": detected_faces_count - 1,
@@ -77,6 +106,13 @@ def extract_faces(video_path, frames_dir, face_dir, known_faces_dir, every=5, al
                     "confidence": confidence,
                     "face_path": face_path
                 })
+                encodings.append(face_encoding)
+                case_db.add_face(
+                    video_id, frame_count, timestamp, (left, top, right - left, bottom - top), face_path,
+                    name=match_name if match_name else "Unknown", confidence=confidence,
+                )
+                face_frames.append(frame_count)
+                face_timestamps.append(timestamp)
 
                 # Pop-up alert
                 if match_name:
@@ -85,6 +121,7 @@ def extract_faces(video_path, frames_dir, face_dir, known_faces_dir, every=5, al
 
             # Save the frame with overlays
             cv2.imwrite(frame_path, overlay_frame)
+            sampler.record(frame_count, len(face_locations), cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
 
         frame_count += 1
 
@@ -95,15 +132,29 @@ def extract_faces(video_path, frames_dir, face_dir, known_faces_dir, every=5, al
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
+    # Record each face's case database row so identities can be stored by row rather than by file name
+    case_db.flush()
+    row_ids = case_db.query("SELECT id FROM faces WHERE video_id = ? ORDER BY id", (video_id,))
+    for entry, row in zip(metadata, row_ids):
+        entry["row_id"] = row["id"]
+
     # Write metadata to a JSON file
     metadata_path = os.path.join(frames_dir, "metadata.json")
     with open(metadata_path, "w") as f:
         json.dump(metadata, f, indent=4)
 
+    # Save encodings row-aligned with the metadata entries for identity clustering
+    encodings_path = os.path.join(frames_dir, ENCODINGS_FILE)
+    np.save(encodings_path, np.array(encodings, dtype=np.float32).reshape(-1, 128))
+    if index_dir:
+        FaceIndex(index_dir).append(video_path, encodings, face_frames, face_timestamps)
+
     print(f"Metadata saved to {metadata_path}")
 
     cap.release()
     cv2.destroyAllWindows()
+    case_db.close()
+    return metadata_path
 
 def load_known_faces(known_faces_dir):
     """
@@ -137,5 +188,21 @@ if __name__ == '__main__':
     frames_dir = "frames"  # Directory to save extracted frames
     face_dir = "faces"  # Directory to save detected faces
     known_faces_dir = "known_faces"  # Directory of known faces
+    index_dir = "case_index"  # Case-level face index shared by every processed video
+    case_db_path = CASE_DB_PATH  # Case database shared by every pipeline
+
+    cap = cv2.VideoCapture(video_path)
+    sampler = AdaptiveSampler(cap.get(cv2.CAP_PROP_FPS), int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), min_interval=5)
+    cap.release()
 
-    extract_faces(video_path, frames_dir, face_dir, known_faces_dir, every=5)
+    metadata_path = extract_faces(video_path, frames_dir, face_dir, known_faces_dir, every=5, index_dir=index_dir,
+                                  case_db_path=case_db_path, sampler=sampler)
+    if metadata_path:
+        # Identities are numbered case-wide: this video's faces join the clustering of every earlier video
+        case_db = CaseDatabase(case_db_path)
+        live_rows = [row["id"] for row in case_db.query("SELECT id FROM faces")]
+        identities = cluster_into_case(metadata_path, os.path.join(os.path.dirname(case_db_path), CASE_CLUSTERS_FILE),
+                                       live_rows=live_rows)
+        case_db.set_identities(identities)
+        case_db.close()
+        print(f"{len(identities)} faces assigned to {len(set(identities.values()))} case identities")
@@ -0,0 +1,271 @@
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+WORKER_FAILED = "worker failed"
+
+
+class FrameRing:
+    """
+    Ring of preallocated frame slots in one shared-memory block, for moving decoded frames to worker
+    processes without pickling them. The producer takes a free slot (blocking when every slot is in
+    use, which is the backpressure on decoding), fills it in place and publishes only the slot index
+    and frame metadata; a worker reads the slot as a NumPy view and hands the slot back when done.
+    """
+
+    def __init__(self, shape, dtype=np.uint8, slots=8):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=self.frame_bytes * slots)
+        self.owner = True
+        self.free = mp.Queue()
+        self.ready = mp.Queue()
+        for slot in range(slots):
+            self.free.put(slot)
+        self._views = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["shm"] = self.shm.name
+        state["owner"] = False
+        state["_views"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Worker processes share the creator's resource tracker, so attaching here does not add a second owner
+        self.shm = shared_memory.SharedMemory(name=state["shm"])
+
+    def frame(self, slot):
+        """NumPy view of a slot; no data is copied."""
+        if self._views is None:
+            self._views = [
+                np.ndarray(self.shape, self.dtype, self.shm.buf, offset=slot_index * self.frame_bytes)
+                for slot_index in range(self.slots)
+            ]
+        return self._views[slot]
+
+    def acquire(self, timeout=None):
+        """Take a free slot for writing; blocks while all slots are held by workers."""
+        return self.free.get(timeout=timeout)
+
+    def publish(self, slot, metadata):
+        self.ready.put((slot, metadata))
+
+    def put(self, frame, metadata, timeout=None):
+        """Copy a frame into a free slot and publish it. Decoders that can write in place should use acquire()."""
+        slot = self.acquire(timeout)
+        self.frame(slot)[...] = frame
+        self.publish(slot, metadata)
+        return slot
+
+    def get(self, timeout=None):
+        """Next (slot, metadata) for a worker, or None once the producer has called close()."""
+        return self.ready.get(timeout=timeout)
+
+    def release(self, slot):
+        self.free.put(slot)
+
+    def close(self, consumers=1):
+        """Tell each consumer there are no more frames."""
+        for _ in range(consumers):
+            self.ready.put(None)
+
+    def destroy(self):
+        self._views = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def detection_worker(ring, results, detector_name="haar", detector_options=None):
+    """
+    Worker process: detect faces in the frames published on the ring and report their boxes.
+    An error is reported as (WORKER_FAILED, message) before the process exits with it.
+    """
+    import cv2
+
+    from detectors import create_detector
+
+    try:
+        detector = create_detector(detector_name, **(detector_options or {}))
+        while True:
+            item = ring.get()
+            if item is None:
+                break
+            slot, frame_count = item
+            frame = ring.frame(slot)
+            faces = detector.detect(frame, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+            ring.release(slot)
+            results.put((frame_count, [tuple(int(value) for value in box) for box in faces]))
+    except Exception as error:
+        results.put((WORKER_FAILED, f"{type(error).__name__}: {error}"))
+        raise
+    results.put(None)
+
+
+def parallel_detect(video_path, detector_name="haar", workers=2, every=1, slots=None):
+    """
+    Decode a video in this process and detect faces in `workers` processes fed through a FrameRing.
+    Frames are decoded straight into the shared slots. Yields (frame_count, boxes) as results arrive,
+    which is not necessarily in frame order. Waits on the ring and the results time out periodically to
+    check the workers, so a worker that fails raises RuntimeError here instead of stalling the decoder;
+    the shared memory is released either way.
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+    ring = FrameRing(shape, slots=slots or workers * 2)
+    results = mp.Queue()
+    processes = [
+        mp.Process(target=detection_worker, args=(ring, results, detector_name), daemon=True) for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def receive(result):
+        if result is not None and result[0] == WORKER_FAILED:
+            raise RuntimeError(f"Detection worker failed: {result[1]}")
+        return result
+
+    def check_workers():
+        for process in processes:
+            if process.exitcode not in (None, 0):
+                raise RuntimeError(f"Detection worker {process.pid} exited with code {process.exitcode}")
+
+    finished = 0
+    frame_count = 0
+    try:
+        while True:
+            if frame_count % every:
+                if not cap.grab():
+                    break
+                frame_count += 1
+                continue
+            slot = None
+            while slot is None:
+                try:
+                    slot = ring.acquire(timeout=1.0)
+                except queue.Empty:
+                    check_workers()
+            ret, _ = cap.read(ring.frame(slot))
+            if not ret:
+                ring.release(slot)
+                break
+            ring.publish(slot, frame_count)
+            frame_count += 1
+            while True:
+                try:
+                    result = receive(results.get_nowait())
+                except queue.Empty:
+                    break
+                if result is None:
+                    finished += 1
+                else:
+                    yield result
+        ring.close(workers)
+        while finished < workers:
+            try:
+                result = receive(results.get(timeout=1.0))
+            except queue.Empty:
+                check_workers()
+                continue
+            if result is None:
+                finished += 1
+            else:
+                yield result
+    finally:
+        cap.release()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        ring.destroy()
+
+
+def _pickle_consumer(frames, done):
+    while True:
+        item = frames.get()
+        if item is None:
+            break
+        frame, frame_count = item
+        frame[::64, ::64].sum()
+    done.put(None)
+
+
+def _ring_consumer(ring, done):
+    while True:
+        item = ring.get()
+        if item is None:
+            break
+        slot, frame_count = item
+        ring.frame(slot)[::64, ::64].sum()
+        ring.release(slot)
+    done.put(None)
+
+
+def benchmark_transport(shape=(2160, 3840, 3), frames=200, workers=2, slots=8):
+    """
+    Frames per second moved from one producer to `workers` consumers, through a pickled mp.Queue
+    versus a FrameRing. Consumers only touch a sparse sample of each frame, so the figures are
+    dominated by the transport itself.
+    """
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, shape, dtype=np.uint8)
+    results = {}
+
+    frame_queue = mp.Queue(maxsize=slots)
+    done = mp.Queue()
+    processes = [mp.Process(target=_pickle_consumer, args=(frame_queue, done)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    start = time.perf_counter()
+    for frame_count in range(frames):
+        frame_queue.put((frame, frame_count))
+    for _ in range(workers):
+        frame_queue.put(None)
+    for _ in range(workers):
+        done.get()
+    results["pickled_queue_fps"] = frames / (time.perf_counter() - start)
+    for process in processes:
+        process.join()
+
+    ring = FrameRing(shape, frame.dtype, slots)
+    done = mp.Queue()
+    processes = [mp.Process(target=_ring_consumer, args=(ring, done)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    start = time.perf_counter()
+    for frame_count in range(frames):
+        ring.put(frame, frame_count)
+    ring.close(workers)
+    for _ in range(workers):
+        done.get()
+    results["shared_memory_fps"] = frames / (time.perf_counter() - start)
+    for process in processes:
+        process.join()
+    ring.destroy()
+
+    results["speedup"] = results["shared_memory_fps"] / results["pickled_queue_fps"]
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare shared-memory and pickled frame transport between processes.")
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    result = benchmark_transport((args.height, args.width, 3), args.frames, args.workers)
+    print(f"{args.width}x{args.height}, {args.workers} workers: pickled queue {result['pickled_queue_fps']:.1f} frames/s, "
+          f"shared memory {result['shared_memory_fps']:.1f} frames/s ({result['speedup']:.1f}x)")
@@ -0,0 +1,141 @@
+import tkinter as tk
+
+from PIL import ImageTk
+
+from thumbnails import GALLERY_SIZE, PREFETCH, VISIBLE, ThumbnailLoader
+
+
+class FaceGallery:
+    """
+    Scrollable thumbnail grid that only materialises the tiles currently on screen.
+    Thumbnails are prepared by a ThumbnailLoader thread and the next page is prefetched,
+    so scrolling cost does not depend on how many faces were extracted.
+    """
+
+    def __init__(self, parent, face_images, on_select=None, tile_size=GALLERY_SIZE, padding=10, poll_ms=30):
+        self.face_images = face_images
+        self.on_select = on_select
+        self.tile_size = tile_size
+        self.cell_size = tile_size + padding
+        self.padding = padding
+        self.poll_ms = poll_ms
+        self.columns = 1
+        self.tiles = {}
+        self.photos = {}
+        self.prefetched = {}  # thumbnails (None if unreadable) that arrived before their tile was on screen
+        self.loader = ThumbnailLoader(tile_size)
+
+        self.frame = tk.Frame(parent, bg="black")
+        self.canvas = tk.Canvas(self.frame, bg="black", highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(self.frame, orient="vertical", command=self.scroll)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.canvas.bind("<Configure>", lambda event: self.refresh())
+        self.canvas.bind("<MouseWheel>", lambda event: self.scroll("scroll", -event.delta // 120, "units"))
+        self.canvas.bind("<Button-4>", lambda event: self.scroll("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll("scroll", 1, "units"))
+        self.canvas.after(self.poll_ms, self.poll_thumbnails)
+
+    def place(self, **kwargs):
+        self.frame.place(**kwargs)
+
+    def scroll(self, *args):
+        self.canvas.yview(*args)
+        self.refresh()
+
+    def visible_range(self, extra_rows=0):
+        height = self.canvas.winfo_height()
+        first_row = max(0, int(self.canvas.canvasy(0)) // self.cell_size - extra_rows)
+        last_row = int(self.canvas.canvasy(height)) // self.cell_size + 1 + extra_rows
+        start = first_row * self.columns
+        stop = min(len(self.face_images), last_row * self.columns)
+        return range(start, max(start, stop))
+
+    def refresh(self):
+        width = max(self.canvas.winfo_width(), self.cell_size)
+        columns = max(1, width // self.cell_size)
+        if columns != self.columns:
+            self.columns = columns
+            self.clear_tiles()
+
+        rows = (len(self.face_images) + self.columns - 1) // self.columns
+        self.canvas.configure(
+            scrollregion=(0, 0, self.columns * self.cell_size, rows * self.cell_size + self.padding),
+            yscrollincrement=self.cell_size // 4,
+        )
+
+        visible = self.visible_range()
+        page_rows = max(1, self.canvas.winfo_height() // self.cell_size)
+        prefetch = range(visible.stop, min(len(self.face_images), visible.stop + page_rows * self.columns))
+        wanted = set(visible) | set(prefetch)
+        self.loader.set_wanted(wanted)
+        for index in list(self.prefetched):
+            if index not in wanted:
+                del self.prefetched[index]
+
+        for index in list(self.tiles):
+            if index not in visible:
+                self.canvas.delete(self.tiles.pop(index))
+                self.photos.pop(index, None)
+
+        for index in visible:
+            if index not in self.tiles:
+                self.tiles[index] = self.create_tile(index)
+                if index in self.prefetched:
+                    self.show_thumbnail(index, self.prefetched.pop(index))
+                else:
+                    self.loader.request(index, self.face_images[index], VISIBLE)
+        for index in prefetch:
+            if index not in self.prefetched:
+                self.loader.request(index, self.face_images[index], PREFETCH)
+
+    def append(self, face_paths):
+        """Add faces to the end of the grid while extraction is still running; only on-screen tiles are created."""
+        self.face_images.extend(face_paths)
+        self.refresh()
+
+    def tile_origin(self, index):
+        row, col = divmod(index, self.columns)
+        return col * self.cell_size + self.padding, row * self.cell_size + self.padding
+
+    def create_tile(self, index):
+        x, y = self.tile_origin(index)
+        tag = f"tile_{index}"
+        self.canvas.create_rectangle(
+            x, y, x + self.tile_size, y + self.tile_size, outline="red", fill="#1a1a1a", tags=(tag,)
+        )
+        self.canvas.tag_bind(tag, "<Button-1>", lambda event, i=index: self.select(i))
+        return tag
+
+    def select(self, index):
+        if self.on_select:
+            self.on_select(index)
+
+    def poll_thumbnails(self):
+        if not self.canvas.winfo_exists():
+            return
+        for index, image in self.loader.poll():
+            if index in self.tiles:
+                self.show_thumbnail(index, image)
+            else:
+                self.prefetched[index] = image
+        self.canvas.after(self.poll_ms, self.poll_thumbnails)
+
+    def show_thumbnail(self, index, image):
+        if image is None:
+            return
+        photo = ImageTk.PhotoImage(image)
+        self.photos[index] = photo
+        x, y = self.tile_origin(index)
+        self.canvas.create_image(x, y, image=photo, anchor="nw", tags=(self.tiles[index],))
+
+    def clear_tiles(self):
+        for tag in self.tiles.values():
+            self.canvas.delete(tag)
+        self.tiles.clear()
+        self.photos.clear()
+
+    def close(self):
+        self.loader.close()
@@ -0,0 +1,506 @@
+import io
+import json
+import os
+import re
+import shutil
+import socket
+import sqlite3
+import tarfile
+import tempfile
+import threading
+import time
+
+from case_db import CASE_DB_NAME, FACE_COLUMNS
+from crop_archive import ARCHIVE_NAME, archive_ref, split_ref
+from phash import MultiIndexHashTable
+
+QUEUE_NAME = "jobs.db"
+RESULTS_FOLDER = "chunks"
+CHUNK_DB_NAME = "faces.db"
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    video_path TEXT NOT NULL,
+    start_frame INTEGER NOT NULL,
+    end_frame INTEGER,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    result_path TEXT,
+    error TEXT,
+    merged INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (video_path, start_frame)
+);
+CREATE INDEX IF NOT EXISTS chunks_state ON chunks(state);
+"""
+
+
+class JobQueue:
+    """
+    Work queue of time-range chunks of videos, kept in a SQLite file next to the case database.
+    Workers lease a chunk for lease_s seconds (renewed by heartbeats while they work); a chunk whose
+    worker died is leased again once its lease expires, up to max_attempts times. Every operation is
+    idempotent: submitting a video twice adds no chunks, a second result for a finished chunk is
+    discarded, and a result is moved into results_folder under a name unique to the worker before
+    the chunk is marked done, so a retried or duplicated chunk never overwrites an accepted result.
+    Several processes can share the file; remote workers go through serve_queue and RemoteQueue.
+    """
+
+    def __init__(self, case_folder, lease_s=300, max_attempts=3):
+        self.case_folder = case_folder
+        self.results_folder = os.path.join(case_folder, RESULTS_FOLDER)
+        os.makedirs(self.results_folder, exist_ok=True)
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self.connection = sqlite3.connect(
+            os.path.join(case_folder, QUEUE_NAME), timeout=30, isolation_level=None, check_same_thread=False,
+        )
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def _transaction(self, work):
+        """Run work(connection) inside BEGIN IMMEDIATE, so competing processes take turns."""
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self.connection)
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+            return result
+
+    def submit(self, video_path, chunk_s=300):
+        """
+        Split a video into chunk_s-second frame ranges and queue the ones not queued yet. The frame count
+        in the container is only an estimate, so the last chunk has no end frame and is read to the end.
+        """
+        import cv2
+
+        video_path = os.path.abspath(video_path)
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if fps <= 0 or total_frames <= 0:
+            raise ValueError(f"Cannot read {video_path}: no frame rate or frame count")
+        step = max(1, int(round(fps * chunk_s)))
+        starts = range(0, total_frames, step)
+        ranges = [(start, start + step if start + step < total_frames else None) for start in starts]
+
+        def insert(connection):
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO chunks (video_path, start_frame, end_frame) VALUES (?, ?, ?)",
+                [(video_path, start, end) for start, end in ranges],
+            )
+            return connection.total_changes - before
+
+        return self._transaction(insert)
+
+    def lease(self, worker):
+        """The next chunk to work on, leased to worker, or None when nothing is ready."""
+
+        def take(connection):
+            now = time.time()
+            connection.execute(
+                "UPDATE chunks SET state = ?, error = COALESCE(error, 'lease expired') "
+                "WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, LEASED, now, self.max_attempts),
+            )
+            row = connection.execute(
+                "SELECT * FROM chunks WHERE state = ? OR (state = ? AND lease_expires < ?) ORDER BY id LIMIT 1",
+                (PENDING, LEASED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE chunks SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                (LEASED, worker, now + self.lease_s, row["id"]),
+            )
+            return dict(row, state=LEASED, worker=worker, attempts=row["attempts"] + 1)
+
+        return self._transaction(take)
+
+    def heartbeat(self, chunk_id, worker):
+        """Extend a lease; False if the chunk is no longer leased to this worker."""
+        return self._transaction(lambda connection: connection.execute(
+            "UPDATE chunks SET lease_expires = ? WHERE id = ? AND state = ? AND worker = ?",
+            (time.time() + self.lease_s, chunk_id, LEASED, worker),
+        ).rowcount == 1)
+
+    def complete(self, chunk_id, worker, result_folder):
+        """
+        Accept the result folder of a chunk; returns False (and discards it) if the chunk already has one.
+        The folder is moved into the results folder, or copied when it is on another file system.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT state FROM chunks WHERE id = ?", (chunk_id,)).fetchone()
+        if row is None or row["state"] == DONE:
+            shutil.rmtree(result_folder, ignore_errors=True)
+            return False
+        worker_name = re.sub(r"[^\w.-]+", "_", worker)
+        target = os.path.join(self.results_folder, f"chunk_{chunk_id}_{worker_name}")
+        if os.path.abspath(result_folder) != os.path.abspath(target):
+            if os.path.exists(target):
+                shutil.rmtree(target)
+            try:
+                os.replace(result_folder, target)
+            except OSError:
+                shutil.copytree(result_folder, target)
+
+        def finish(connection):
+            return connection.execute(
+                "UPDATE chunks SET state = ?, result_path = ?, lease_expires = NULL, error = NULL, merged = 0 "
+                "WHERE id = ? AND state != ?",
+                (DONE, target, chunk_id, DONE),
+            ).rowcount == 1
+
+        accepted = self._transaction(finish)
+        if not accepted:
+            shutil.rmtree(target, ignore_errors=True)
+        return accepted
+
+    def fail(self, chunk_id, worker, error):
+        """Give a chunk back after an error; it is retried until it has used max_attempts."""
+        return self._transaction(lambda connection: connection.execute(
+            "UPDATE chunks SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, lease_expires = NULL, error = ? "
+            "WHERE id = ? AND state = ? AND worker = ?",
+            (self.max_attempts, FAILED, PENDING, str(error), chunk_id, LEASED, worker),
+        ).rowcount == 1)
+
+    def retry_failed(self):
+        """Queue failed chunks again with fresh attempts."""
+        return self._transaction(lambda connection: connection.execute(
+            "UPDATE chunks SET state = ?, attempts = 0 WHERE state = ?", (PENDING, FAILED),
+        ).rowcount)
+
+    def status(self):
+        with self.lock:
+            rows = self.connection.execute("SELECT state, COUNT(*) AS chunks FROM chunks GROUP BY state").fetchall()
+        return {row["state"]: row["chunks"] for row in rows}
+
+    def idle(self):
+        """True when no chunk is waiting or being worked on."""
+        status = self.status()
+        return not status.get(PENDING) and not status.get(LEASED)
+
+    def chunks(self, video_path=None):
+        sql, parameters = "SELECT * FROM chunks", ()
+        if video_path is not None:
+            sql, parameters = sql + " WHERE video_path = ?", (video_path,)
+        with self.lock:
+            return [dict(row) for row in self.connection.execute(sql + " ORDER BY video_path, start_frame", parameters)]
+
+    def merge(self, case_db, partial=False, max_distance=6):
+        """
+        Fold finished chunks into the case database. A video is merged once all of its chunks are done
+        (or, with partial, once none is still pending or leased): the face rows of its chunks are read in
+        frame order, near-duplicate faces (chunks keep every crop, hashed) are dropped by perceptual hash
+        against the faces kept so far, as a single pass over the video would, and the video's faces are replaced in one transaction, so merging again
+        gives the same result. Returns the number of videos merged.
+        """
+        merged = 0
+        for video_path in sorted({chunk["video_path"] for chunk in self.chunks()}):
+            chunks = self.chunks(video_path)
+            states = {chunk["state"] for chunk in chunks}
+            ready = states == {DONE} or (partial and DONE in states and not states & {PENDING, LEASED})
+            if not ready or all(chunk["merged"] for chunk in chunks if chunk["state"] == DONE):
+                continue
+            video_id = None
+            seen = MultiIndexHashTable(max_distance)
+            rows = []
+            for chunk in chunks:
+                if chunk["state"] != DONE:
+                    continue
+                connection = sqlite3.connect(os.path.join(chunk["result_path"], CHUNK_DB_NAME))
+                connection.row_factory = sqlite3.Row
+                if video_id is None:
+                    video = connection.execute("SELECT * FROM videos").fetchone()
+                    video_id = case_db.add_video(
+                        video_path, video["width"], video["height"], video["fps"], video["total_frames"]
+                    )
+                for face in connection.execute("SELECT * FROM faces ORDER BY frame, id"):
+                    if face["phash"]:
+                        face_hash = int(face["phash"], 16)
+                        if seen.find(face_hash) is not None:
+                            continue
+                        seen.add(face_hash, face["id"])
+                    member = split_ref(face["face_path"])
+                    if member is not None:
+                        face_path = archive_ref(os.path.join(chunk["result_path"], ARCHIVE_NAME), member[1])
+                    else:
+                        face_path = os.path.join(chunk["result_path"], os.path.basename(face["face_path"]))
+                    rows.append(tuple(
+                        video_id if column == "video_id" else face_path if column == "face_path" else face[column]
+                        for column in FACE_COLUMNS
+                    ))
+                connection.close()
+            case_db.replace_faces(video_id, rows)
+            self._transaction(lambda connection: connection.execute(
+                "UPDATE chunks SET merged = 1 WHERE video_path = ? AND state = ?", (video_path, DONE),
+            ))
+            merged += 1
+        return merged
+
+    def close(self):
+        self.connection.close()
+
+
+def process_chunk(chunk, work_folder, detector, every=5):
+    """
+    Extract the faces of one chunk into a fresh folder holding its crop archive and a faces.db fragment.
+    Every crop is kept with its hash: near-duplicates are only dropped by JobQueue.merge, across the whole video.
+    """
+    import cv2
+
+    from case_db import CaseDatabase
+    from crop_archive import CropArchive
+    from pipeline import FaceSink, extract_faces
+
+    folder = os.path.join(work_folder, f"chunk_{chunk['id']}")
+    # A retry starts from scratch rather than appending to a half-written attempt
+    shutil.rmtree(folder, ignore_errors=True)
+    chunk_db = CaseDatabase(os.path.join(folder, CHUNK_DB_NAME))
+    cap = cv2.VideoCapture(chunk["video_path"])
+    video_id = chunk_db.add_video(
+        chunk["video_path"],
+        int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        cap.get(cv2.CAP_PROP_FPS),
+        int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+    )
+    cap.release()
+    crop_archive = CropArchive(os.path.join(folder, ARCHIVE_NAME))
+    try:
+        extract_faces(
+            chunk["video_path"], FaceSink(folder, chunk_db, video_id, crop_archive=crop_archive, hash_only=True),
+            detector, every=every, start_frame=chunk["start_frame"], end_frame=chunk["end_frame"],
+        )
+    finally:
+        crop_archive.close()
+        chunk_db.close()
+    return folder
+
+
+def run_worker(queue, work_folder, detector_name="haar", worker=None, every=5, poll_s=2.0, exit_when_idle=True):
+    """
+    Lease chunks from queue (a JobQueue or RemoteQueue) until it is idle, processing each with the
+    extraction pipeline and handing back its result folder. The lease is renewed from a background
+    thread while a chunk is processed; errors give the chunk back for a retry. Returns the chunks done.
+    """
+    from detectors import create_detector
+
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    detector = create_detector(detector_name)
+    done = 0
+    while True:
+        chunk = queue.lease(worker)
+        if chunk is None:
+            if exit_when_idle and queue.idle():
+                return done
+            time.sleep(poll_s)
+            continue
+        finished = threading.Event()
+
+        def renew(chunk_id=chunk["id"]):
+            while not finished.wait(queue.lease_s / 3):
+                queue.heartbeat(chunk_id, worker)
+
+        threading.Thread(target=renew, daemon=True).start()
+        try:
+            folder = process_chunk(chunk, work_folder, detector, every)
+            if queue.complete(chunk["id"], worker, folder):
+                done += 1
+            end_frame = chunk["end_frame"] if chunk["end_frame"] is not None else "end"
+            print(f"{worker}: chunk {chunk['id']} frames {chunk['start_frame']}-{end_frame} done")
+        except Exception as error:
+            queue.fail(chunk["id"], worker, error)
+            print(f"{worker}: chunk {chunk['id']} failed: {error}")
+        finally:
+            finished.set()
+
+
+def pack_folder(folder):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        archive.add(folder, arcname=".")
+    return buffer.getvalue()
+
+
+def unpack_folder(data, folder):
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as archive:
+        for member in archive.getmembers():
+            path = os.path.normpath(member.name)
+            if os.path.isabs(path) or path.startswith("..") or not (member.isfile() or member.isdir()):
+                raise ValueError(f"Refusing to unpack {member.name}")
+        if hasattr(tarfile, "data_filter"):
+            archive.extractall(folder, filter="data")
+        else:
+            archive.extractall(folder)
+    return folder
+
+
+def serve_queue(queue, port=8765, host="127.0.0.1"):
+    """
+    Expose a JobQueue over HTTP for workers on other machines (see RemoteQueue); returns the server,
+    running in a daemon thread. Results are uploaded as a gzipped tar of the chunk folder.
+    Bind to a non-local host only on a trusted network: there is no authentication.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    class QueueHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            url = urlparse(self.path)
+            query = {name: values[0] for name, values in parse_qs(url.query).items()}
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                if url.path == "/lease":
+                    result = queue.lease(query["worker"])
+                elif url.path == "/heartbeat":
+                    result = queue.heartbeat(int(query["chunk"]), query["worker"])
+                elif url.path == "/fail":
+                    result = queue.fail(int(query["chunk"]), query["worker"], body.decode("utf-8"))
+                elif url.path == "/complete":
+                    upload = tempfile.mkdtemp(prefix="upload_", dir=queue.results_folder)
+                    try:
+                        result = queue.complete(int(query["chunk"]), query["worker"], unpack_folder(body, upload))
+                    finally:
+                        shutil.rmtree(upload, ignore_errors=True)
+                elif url.path == "/status":
+                    result = {"status": queue.status(), "lease_s": queue.lease_s}
+                else:
+                    self.send_error(404)
+                    return
+            except (KeyError, ValueError) as error:
+                self.send_error(400, str(error))
+                return
+            payload = json.dumps(result).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), QueueHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class RemoteQueue:
+    """Client side of serve_queue, with the methods run_worker uses on a JobQueue."""
+
+    def __init__(self, url, timeout=600):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.lease_s = self._call("/status")["lease_s"]
+
+    def _call(self, path, body=b"", **query):
+        from urllib.parse import urlencode
+        from urllib.request import Request, urlopen
+
+        request = Request(f"{self.url}{path}?{urlencode(query)}", data=body, method="POST")
+        with urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def lease(self, worker):
+        return self._call("/lease", worker=worker)
+
+    def heartbeat(self, chunk_id, worker):
+        return self._call("/heartbeat", chunk=chunk_id, worker=worker)
+
+    def complete(self, chunk_id, worker, result_folder):
+        accepted = self._call("/complete", pack_folder(result_folder), chunk=chunk_id, worker=worker)
+        shutil.rmtree(result_folder, ignore_errors=True)
+        return accepted
+
+    def fail(self, chunk_id, worker, error):
+        return self._call("/fail", str(error).encode("utf-8"), chunk=chunk_id, worker=worker)
+
+    def idle(self):
+        status = self._call("/status")["status"]
+        return not status.get(PENDING) and not status.get(LEASED)
+
+
+def _local_worker(case_folder, detector_name, every):
+    queue = JobQueue(case_folder)
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    run_worker(queue, os.path.join(case_folder, "work", worker), detector_name, worker, every)
+    queue.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    from multiprocessing import Process
+
+    from case_db import CaseDatabase
+
+    parser = argparse.ArgumentParser(description="Split videos into chunks and triage them on several workers.")
+    parser.add_argument("command", choices=["submit", "work", "serve", "status", "merge", "retry"])
+    parser.add_argument("videos", nargs="*", help="Videos to submit")
+    parser.add_argument("--case", default="video_analysis_output", help="Case folder holding jobs.db and case.db")
+    parser.add_argument("--queue", help="URL of a served queue (http://host:port) for remote workers")
+    parser.add_argument("--chunk-minutes", type=float, default=5, help="Length of each chunk")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes to start on this machine")
+    parser.add_argument("--detector", default="haar", help="Detector backend")
+    parser.add_argument("--every", type=int, default=5, help="Analyse every n-th frame")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to serve the queue on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to serve the queue on")
+    parser.add_argument("--partial", action="store_true", help="Merge videos even if some chunks failed")
+    args = parser.parse_args()
+
+    if args.command == "work" and args.queue:
+        remote = RemoteQueue(args.queue)
+        worker_name = f"{socket.gethostname()}-{os.getpid()}"
+        with tempfile.TemporaryDirectory(prefix="triage_worker_") as work_folder:
+            print(f"{run_worker(remote, work_folder, args.detector, worker_name, args.every)} chunks done")
+        raise SystemExit
+
+    job_queue = JobQueue(args.case)
+    if args.command == "submit":
+        for video_path in args.videos:
+            try:
+                print(f"{video_path}: {job_queue.submit(video_path, args.chunk_minutes * 60)} chunks queued")
+            except ValueError as error:
+                print(error)
+    elif args.command == "work":
+        processes = [Process(target=_local_worker, args=(args.case, args.detector, args.every))
+                     for _ in range(args.workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        case_db = CaseDatabase(os.path.join(args.case, CASE_DB_NAME))
+        print(f"Merged {job_queue.merge(case_db, args.partial)} videos into {case_db.path}")
+        case_db.close()
+    elif args.command == "serve":
+        serve_queue(job_queue, args.port, args.host)
+        print(f"Queue served at http://{args.host}:{args.port}; merging finished videos every 10 s (Ctrl+C to stop)")
+        case_db = CaseDatabase(os.path.join(args.case, CASE_DB_NAME))
+        try:
+            while True:
+                time.sleep(10)
+                if job_queue.merge(case_db, args.partial):
+                    print(f"{job_queue.status()}")
+        except KeyboardInterrupt:
+            case_db.close()
+    elif args.command == "merge":
+        case_db = CaseDatabase(os.path.join(args.case, CASE_DB_NAME))
+        print(f"Merged {job_queue.merge(case_db, args.partial)} videos into {case_db.path}")
+        case_db.close()
+    elif args.command == "retry":
+        print(f"{job_queue.retry_failed()} failed chunks queued again")
+    print(job_queue.status())
@@ -0,0 +1,421 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from activity import IouTracker
+from crop_archive import ARCHIVE_NAME, CropArchive
+from metrics import Metrics
+from runs import COMPLETE, STOPPED, Run
+from thumbnails import encode_thumbnail
+
+EVENTS_NAME = "events.jsonl"
+SEGMENTS_FOLDER = "window"
+
+
+def is_live_source(source):
+    """Stream URLs (rtsp://, http://, ...) and capture devices (0, /dev/video0) as opposed to video files."""
+    return source.isdigit() or "://" in source or source.startswith("/dev/")
+
+
+class LoopingFileSource:
+    """Plays a video file at its own frame rate and starts over at the end, standing in for a camera."""
+
+    def __init__(self, video_path):
+        self.cap = cv2.VideoCapture(video_path)
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else 25.0
+        self.next_time = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def read(self):
+        now = time.perf_counter()
+        if self.next_time is None:
+            self.next_time = now
+        elif now < self.next_time:
+            time.sleep(self.next_time - now)
+        self.next_time += 1 / self.fps
+        ret, frame = self.cap.read()
+        if not ret:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+def open_live_source(source, loop=False):
+    """Open a stream URL, capture device or (with loop) a file replayed in real time."""
+    if loop:
+        return LoopingFileSource(source)
+    if source.startswith("rtsp://"):
+        # UDP drops packets under load and smears frames; TCP unless the caller chose otherwise
+        os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "rtsp_transport;tcp")
+    cap = cv2.VideoCapture(int(source)) if source.isdigit() else cv2.VideoCapture(source, cv2.CAP_FFMPEG)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class LatestFrame:
+    """
+    Capture thread that reads a source as fast as it delivers frames and keeps only the newest one.
+    When detection falls behind, frames it has not taken yet are replaced rather than queued, so analysis
+    always works on the present and dropped frames are counted. Each frame is stamped with its capture
+    time for latency reporting and passed to on_frame (the rolling recorder) from the capture thread.
+    With reconnect_s the source is reopened after that many seconds whenever it fails; without it the
+    capture ends with the source.
+    """
+
+    def __init__(self, open_source, on_frame=None, reconnect_s=None, metrics=None):
+        self.open_source = open_source
+        self.on_frame = on_frame
+        self.reconnect_s = reconnect_s
+        self.metrics = metrics or Metrics()
+        self.fps = 0.0
+        self.latest = None  # (frame number, capture time, frame)
+        self.captured = 0
+        self.taken = -1
+        self.dropped = 0
+        self.ended = False
+        self.condition = threading.Condition()
+        self.stop_requested = threading.Event()
+        self.opened = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="live-capture", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        cap = None
+        while not self.stop_requested.is_set():
+            if cap is None:
+                cap = self.open_source()
+                if not cap.isOpened():
+                    cap.release()
+                    cap = None
+                    if self.reconnect_s is None:
+                        break
+                    self.stop_requested.wait(self.reconnect_s)
+                    continue
+                self.fps = cap.get(cv2.CAP_PROP_FPS)
+                self.opened.set()
+            ret, frame = cap.read()
+            if not ret:
+                cap.release()
+                cap = None
+                self.metrics.count("source_failures")
+                if self.reconnect_s is None:
+                    break
+                continue
+            capture_time = time.time()
+            self.metrics.count("frames_decoded")
+            with self.condition:
+                self.latest = (self.captured, capture_time, frame)
+                self.captured += 1
+                self.condition.notify_all()
+            if self.on_frame:
+                self.on_frame(frame, capture_time)
+        if cap is not None:
+            cap.release()
+        with self.condition:
+            self.ended = True
+            self.condition.notify_all()
+        self.opened.set()
+
+    def get(self, timeout=1.0):
+        """The newest frame not returned before, waiting up to timeout; None if nothing new arrived."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.ended or (self.latest and self.latest[0] != self.taken), timeout)
+            if not self.latest or self.latest[0] == self.taken:
+                return None
+            self.dropped += self.latest[0] - self.taken - 1
+            self.taken = self.latest[0]
+            return self.latest
+
+    def stop(self):
+        self.stop_requested.set()
+        self.thread.join()
+
+
+class RollingRecorder:
+    """
+    Keeps the last window_s seconds of a stream on disk as segment_s-long video segments named by their
+    start time; segments that have left the window are deleted as new ones begin. A segment is written
+    under a .recording name and renamed when it is complete. Frames go through a bounded queue to a
+    writer thread; when the disk cannot keep up they are dropped and counted instead of stalling capture.
+    """
+
+    def __init__(self, folder, fps, window_s=600, segment_s=60, fourcc="mp4v", max_pending=64, metrics=None):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.fps = fps if fps and fps > 0 else 25.0
+        self.window_s = window_s
+        self.segment_s = segment_s
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.metrics = metrics or Metrics()
+        self.segments = deque()  # (start time, path) of completed segments, oldest first
+        self.writer = None
+        self.segment_start = None
+        self.recording_path = None
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self._run, name="live-recorder", daemon=True)
+        self.thread.start()
+
+    def add(self, frame, capture_time):
+        try:
+            self.pending.put_nowait((frame, capture_time))
+        except queue.Full:
+            self.metrics.count("recorder_frames_dropped")
+
+    def _run(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            frame, capture_time = item
+            if self.writer is None or capture_time >= self.segment_start + self.segment_s:
+                self._start_segment(capture_time, frame.shape)
+            self.writer.write(frame)
+        self._finish_segment()
+
+    def _start_segment(self, capture_time, shape):
+        self._finish_segment()
+        self.segment_start = capture_time
+        name = time.strftime("segment_%Y%m%d-%H%M%S", time.localtime(capture_time))
+        self.recording_path = os.path.join(self.folder, f"{name}.recording.mp4")
+        self.writer = cv2.VideoWriter(self.recording_path, self.fourcc, self.fps, (shape[1], shape[0]))
+        while self.segments and self.segments[0][0] + self.segment_s < capture_time - self.window_s:
+            _, expired_path = self.segments.popleft()
+            if os.path.exists(expired_path):
+                os.remove(expired_path)
+
+    def _finish_segment(self):
+        if self.writer is None:
+            return
+        self.writer.release()
+        path = self.recording_path.replace(".recording.mp4", ".mp4")
+        os.replace(self.recording_path, path)
+        self.segments.append((self.segment_start, path))
+        self.writer = None
+
+    def close(self):
+        self.pending.put(None)
+        self.thread.join()
+
+
+class LatencyStats:
+    """Capture-to-alert latencies of the most recent events, summarised as percentiles in milliseconds."""
+
+    def __init__(self, size=1000):
+        self.values = deque(maxlen=size)
+
+    def add(self, seconds):
+        self.values.append(seconds)
+
+    def summary(self):
+        if not self.values:
+            return {"count": 0}
+        values = np.asarray(self.values) * 1000
+        return {
+            "count": len(values),
+            "p50_ms": round(float(np.percentile(values, 50)), 1),
+            "p95_ms": round(float(np.percentile(values, 95)), 1),
+            "max_ms": round(float(values.max()), 1),
+        }
+
+
+class FaceAlerts:
+    """
+    Turns the detections of one live source into face events. Faces are tracked across frames and each
+    new track is saved once: the crop goes to the run's crop archive, the event is appended to
+    events.jsonl and passed to on_alert(event). Latency from capture to alert is recorded per event.
+    """
+
+    def __init__(self, run, fps, on_alert=None, metrics=None, source=None):
+        self.run = run
+        self.on_alert = on_alert
+        self.metrics = metrics or Metrics()
+        self.source = source
+        self.archive = CropArchive(run.path(ARCHIVE_NAME))
+        self.events = open(run.add_output("events", run.path(EVENTS_NAME)), "a")
+        self.tracker = IouTracker(max_gap=int((fps or 25.0) * 2))
+        self.alerted = set()
+        self.latency = LatencyStats()
+        self.count = 0
+
+    def process(self, number, capture_time, frame, faces):
+        """Record the faces found on one frame; returns the events raised for new tracks."""
+        track_ids = self.tracker.update(number, faces)
+        self.alerted &= set(self.tracker.tracks)
+        raised = []
+        for (x, y, w, h), track_id in zip(faces, track_ids):
+            if track_id in self.alerted:
+                continue
+            self.alerted.add(track_id)
+            face_image = frame[y:y + h, x:x + w]
+            with self.metrics.stage("encode"):
+                _, encoded = cv2.imencode(".jpg", face_image)
+                thumbnail = encode_thumbnail(face_image)
+            with self.metrics.stage("write"):
+                face_path = self.archive.append(encoded, thumbnail)
+            event = {
+                "captured": capture_time,
+                "frame": number,
+                "track": track_id,
+                "box": [int(x), int(y), int(w), int(h)],
+                "face_path": face_path,
+                "latency_ms": round((time.time() - capture_time) * 1000, 1),
+            }
+            if self.source is not None:
+                event["source"] = self.source
+            self.events.write(json.dumps(event) + "\n")
+            self.events.flush()
+            self.metrics.count("faces_saved")
+            self.count += 1
+            self.latency.add(event["latency_ms"] / 1000)
+            if self.on_alert:
+                self.on_alert(event)
+            raised.append(event)
+        return raised
+
+    def close(self):
+        self.events.close()
+        self.archive.close()
+
+
+def run_live(source, output_root, detector, loop=False, window_s=600, segment_s=60, max_fps=None,
+             duration_s=None, stop_event=None, on_alert=None, metrics=None, reconnect_s=2.0):
+    """
+    Monitor a live source in real time. A capture thread keeps the newest frame (dropping the rest when
+    detection is slower than the source) and records a rolling on-disk window of the stream; the calling
+    thread detects faces on the newest frame, at most max_fps times a second, and raises face events
+    through FaceAlerts. Runs until the source ends (files without loop), duration_s passes or stop_event
+    is set (Ctrl+C also stops it cleanly); returns the run, whose manifest holds the latency summary and counts.
+    """
+    metrics = metrics or Metrics()
+    live = is_live_source(source)
+    run = Run.create(output_root, source, parameters={
+        "loop": loop, "window_s": window_s, "segment_s": segment_s, "max_fps": max_fps,
+    })
+    recorder = None
+    alerts = None
+
+    def record(frame, capture_time):
+        # Created with the first frame, once the source is open and its frame rate known
+        nonlocal recorder
+        if recorder is None:
+            recorder = RollingRecorder(run.path(SEGMENTS_FOLDER), frames.fps, window_s, segment_s, metrics=metrics)
+            run.add_output("window", recorder.folder)
+        recorder.add(frame, capture_time)
+
+    frames = LatestFrame(
+        lambda: open_live_source(source, loop), on_frame=record, reconnect_s=reconnect_s if live else None,
+        metrics=metrics,
+    )
+    stop_event = stop_event or threading.Event()
+    started = time.perf_counter()
+    try:
+        # A camera that is down keeps being retried; waiting for it still honours duration_s and stop_event
+        while not frames.opened.wait(0.5):
+            if stop_event.is_set() or (duration_s is not None and time.perf_counter() - started >= duration_s):
+                break
+        if frames.opened.is_set():
+            alerts = FaceAlerts(run, frames.fps, on_alert, metrics)
+            remaining_s = None if duration_s is None else max(0.0, duration_s - (time.perf_counter() - started))
+            monitor_frames(frames, detector, alerts, max_fps, remaining_s, stop_event, metrics)
+    except KeyboardInterrupt:
+        stop_event.set()
+
+    frames.stop()
+    if recorder is not None:
+        recorder.close()
+    if alerts is not None:
+        alerts.close()
+    run.add_output("run_report", metrics.write_report(run.path("run_report.json")))
+    run.manifest["latency"] = alerts.latency.summary() if alerts else {"count": 0}
+    run.finish(STOPPED if stop_event.is_set() else COMPLETE, {
+        "frames_captured": frames.captured,
+        "frames_analysed": metrics.counters.get("frames_analysed", 0),
+        "frames_dropped": frames.dropped,
+        "face_events": alerts.count if alerts else 0,
+    })
+    return run
+
+
+def monitor_frames(frames, detector, alerts, max_fps, duration_s, stop_event, metrics):
+    """The analysis loop of run_live, on the calling thread."""
+    started = time.perf_counter()
+    next_analysis = started
+
+    while not stop_event.is_set():
+        if duration_s is not None and time.perf_counter() - started >= duration_s:
+            break
+        item = frames.get(timeout=0.5)
+        if item is None:
+            if frames.ended:
+                break
+            continue
+        number, capture_time, frame = item
+        metrics.count("frames_analysed")
+        with metrics.stage("grayscale"):
+            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        with metrics.stage("detect"):
+            faces = detector.detect(frame, gray_frame)
+        metrics.count("faces_detected", len(faces))
+        alerts.process(number, capture_time, frame, faces)
+        metrics.gauge("frames_dropped", frames.dropped)
+        metrics.gauge("lag_ms", round((time.time() - capture_time) * 1000, 1))
+        if max_fps:
+            next_analysis = max(next_analysis + 1 / max_fps, time.perf_counter() - 1 / max_fps)
+            time.sleep(max(0.0, next_analysis - time.perf_counter()))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from detectors import create_detector
+    from roi import with_roi
+
+    parser = argparse.ArgumentParser(description="Real-time face monitoring of a stream, device or looping file.")
+    parser.add_argument("source", help="rtsp:// or http:// URL, device number, or a video file with --loop")
+    parser.add_argument("--loop", action="store_true", help="Replay a video file in real time, looping")
+    parser.add_argument("--output", default="video_analysis_output", help="Output folder")
+    parser.add_argument("--detector", default="haar", help="Detector backend")
+    parser.add_argument("--camera", help="Camera profile in roi_profiles/ to restrict detection to")
+    parser.add_argument("--window-minutes", type=float, default=10, help="Minutes of footage kept on disk")
+    parser.add_argument("--segment-seconds", type=float, default=60, help="Length of each recorded segment")
+    parser.add_argument("--max-fps", type=float, help="Analyse at most this many frames per second")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    args = parser.parse_args()
+
+    metrics = Metrics()
+    status_done = threading.Event()
+
+    def report_status():
+        while not status_done.wait(5):
+            print(metrics.status_line())
+
+    def print_alert(event):
+        print(f"ALERT track {event['track']} frame {event['frame']} "
+              f"latency {event['latency_ms']:.0f} ms -> {event['face_path']}")
+
+    threading.Thread(target=report_status, daemon=True).start()
+    detector = with_roi(create_detector(args.detector), None if is_live_source(args.source) else args.source,
+                        args.camera)
+    run = run_live(
+        args.source, args.output, detector, loop=args.loop, window_s=args.window_minutes * 60,
+        segment_s=args.segment_seconds, max_fps=args.max_fps, duration_s=args.duration,
+        on_alert=print_alert, metrics=metrics,
+    )
+    status_done.set()
+    print(f"Latency: {run.manifest['latency']}")
+    print(f"Counts: {run.manifest['counts']} -> {run.folder}")
@@ -1,9 +1,44 @@
+import time
+
+START_TIME = time.perf_counter()
+
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
-import cv2
 import os
-from datetime import datetime
+from analysis import PENDING, RUNNING, LazyAnalysis
+from case_db import CASE_DB_PATH, CaseDatabase
+from events import FaceEventStream
+from gallery import FaceGallery
+from metrics import Metrics
+from thumbnails import VIEWER_SIZE, PhotoImageCache, ThumbnailLoader, load_thumbnail
+
+# cv2 and the analysis stages that depend on it are imported on first use so the window appears without them.
+UI_CACHE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ui_cache")
+_ui_photos = {}
+
+
+def load_ui_image(path, size):
+    """
+    Return a PhotoImage of a UI background resized to `size`.
+    Resized copies are cached on disk next to the script and PhotoImages are kept in memory,
+    so each background is only decoded and LANCZOS-resized once.
+    """
+    key = (path, size)
+    if key in _ui_photos:
+        return _ui_photos[key]
+
+    name, _ = os.path.splitext(os.path.basename(path))
+    cached_path = os.path.join(UI_CACHE_FOLDER, f"{name}_{size[0]}x{size[1]}.png")
+    if os.path.exists(cached_path) and os.path.getmtime(cached_path) >= os.path.getmtime(path):
+        image = Image.open(cached_path)
+    else:
+        image = Image.open(path).convert("RGB").resize(size, Image.Resampling.LANCZOS)
+        os.makedirs(UI_CACHE_FOLDER, exist_ok=True)
+        image.save(cached_path)
+
+    _ui_photos[key] = ImageTk.PhotoImage(image)
+    return _ui_photos[key]
 
 
 class NUCESVideoTriage:
@@ -15,15 +50,37 @@ class NUCESVideoTriage:
         self.video_path = None
         self.output_folder = "video_analysis_output"
         os.makedirs(self.output_folder, exist_ok=True)
+        self.case_db = CaseDatabase(CASE_DB_PATH)
+        self.video_id = None
+        self.detector_name = "haar"
+        self.detector = None
+        self.detector_video = None
+        self.analysis_budget_s = None  # optional compute budget per video for adaptive sampling
+        self.faces_per_window = 3  # best-quality crops kept per person per window; None keeps every crop
+        self.quality_window_s = 10.0
 
         self.video_running = False
         self.cap = None
         self.metadata = None
+        self.analysis = None
+        self.face_stream = None
+        self.activity = None
+        self.timeline = None
+        self.timeline_drawn = 0.0
         self.face_images = []
         self.face_index = 0
+        self.gallery = None
+        self.faces_label = None
+        self.stop_button = None
+        self.face_photos = PhotoImageCache(capacity=64)
+        self.face_loader = ThumbnailLoader(VIEWER_SIZE)
+        self.startup_time = None
+        self.metrics = Metrics()
+        self.status_bar = None
 
         self.init_menu()
         self.init_welcome_animation()
+        self.update_status_bar()
 
     def init_menu(self):
         menu_bar = tk.Menu(self.root, bg="black", fg="red")
@@ -40,19 +97,16 @@ class NUCESVideoTriage:
         self.welcome_frame = tk.Frame(self.root, bg="black")
         self.welcome_frame.pack(fill="both", expand=True)
 
-        # Background Images
-        image_paths = ["1.jpg", "2.jpg", "3.jpg", "4.jpg"]
-        images = [Image.open(path).resize((600, 400), Image.Resampling.LANCZOS) for path in image_paths]
-        image_photos = [ImageTk.PhotoImage(img) for img in images]
-
         # Top Background
-        top_label = tk.Label(self.welcome_frame, image=image_photos[0], bg="black")
-        top_label.image = image_photos[0]
+        top_photo = load_ui_image("1.jpg", (600, 400))
+        top_label = tk.Label(self.welcome_frame, image=top_photo, bg="black")
+        top_label.image = top_photo
         top_label.place(x=0, y=0, relwidth=1, height=400)
 
         # Bottom Background
-        bottom_label = tk.Label(self.welcome_frame, image=image_photos[1], bg="black")
-        bottom_label.image = image_photos[1]
+        bottom_photo = load_ui_image("2.jpg", (600, 400))
+        bottom_label = tk.Label(self.welcome_frame, image=bottom_photo, bg="black")
+        bottom_label.image = bottom_photo
         bottom_label.place(x=0, y=400, relwidth=1, height=400)
 
         # Animated Title
@@ -93,15 +147,13 @@ class NUCESVideoTriage:
         self.upload_frame.pack(fill="both", expand=True)
 
         # Left Image
-        left_image = Image.open("3.jpg").resize((400, 800), Image.Resampling.LANCZOS)
-        left_photo = ImageTk.PhotoImage(left_image)
+        left_photo = load_ui_image("3.jpg", (400, 800))
         left_label = tk.Label(self.upload_frame, image=left_photo, bg="black")
         left_label.image = left_photo
         left_label.place(x=0, y=0, width=400, height=800)
 
         # Right Image
-        right_image = Image.open("4.jpg").resize((400, 800), Image.Resampling.LANCZOS)
-        right_photo = ImageTk.PhotoImage(right_image)
+        right_photo = load_ui_image("4.jpg", (400, 800))
         right_label = tk.Label(self.upload_frame, image=right_photo, bg="black")
         right_label.image = right_photo
         right_label.place(x=800, y=0, width=400, height=800)
@@ -135,7 +187,7 @@ class NUCESVideoTriage:
         file_path = filedialog.askopenfilename(filetypes=[("Video Files", "*.mp4;*.avi;*.mov")])
         if file_path:
             self.video_path = file_path
-            self.extract_metadata_and_faces()
+            self.start_analysis()
             self.init_video_screen()
             self.play_video()
 
@@ -150,34 +202,102 @@ class NUCESVideoTriage:
         self.video_panel = tk.Label(video_border, bg="black")
         self.video_panel.place(x=10, y=10, width=800, height=450)
 
+        # Presence timeline: red where faces are on screen, grey for motion; click to jump there
+        self.timeline = tk.Canvas(
+            self.video_frame, bg="black", highlightthickness=1, highlightbackground="red", cursor="hand2"
+        )
+        self.timeline.place(relx=0.5, rely=0.74, anchor="center", width=820, height=40)
+        self.timeline.bind("<Button-1>", self.seek_timeline)
+        self.timeline_drawn = 0.0
+
     def play_video(self):
+        from decode import open_video
+
         if self.video_path:
-            self.cap = cv2.VideoCapture(self.video_path)
+            self.cap = open_video(self.video_path)
             self.video_running = True
             self.process_video()
 
     def process_video(self):
+        from pipeline import annotate_frame
+
         if self.cap and self.video_running:
-            ret, frame = self.cap.read()
+            with self.metrics.stage("player_decode"):
+                ret, frame = self.cap.read()
             if ret:
-                gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-                faces = face_cascade.detectMultiScale(gray_frame, scaleFactor=1.1, minNeighbors=5, minSize=(50, 50))
-                for (x, y, w, h) in faces:
-                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frame = cv2.resize(frame, (800, 450))
-                frame_image = ImageTk.PhotoImage(Image.fromarray(frame))
-
-                self.video_panel.configure(image=frame_image)
-                self.video_panel.image = frame_image
+                frame = annotate_frame(frame, self.get_detector(), (800, 450), self.metrics)
+                with self.metrics.stage("tk_redraw"):
+                    frame_image = ImageTk.PhotoImage(Image.fromarray(frame))
+                    self.video_panel.configure(image=frame_image)
+                    self.video_panel.image = frame_image
+                    self.update_timeline()
+                self.metrics.count("frames_displayed")
 
                 self.root.after(10, self.process_video)
             else:
                 self.cap.release()
                 self.display_congratulations()
 
+    def update_timeline(self):
+        """Move the playhead, and redraw the strip about once a second while the index is being built."""
+        import cv2
+
+        if self.timeline is None or not self.timeline.winfo_exists():
+            return
+        width, height = self.timeline.winfo_width(), self.timeline.winfo_height()
+        if self.activity is not None and time.perf_counter() - self.timeline_drawn > 1.0:
+            self.draw_timeline(width, height)
+            self.timeline_drawn = time.perf_counter()
+        total_frames = self.cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        x = self.cap.get(cv2.CAP_PROP_POS_FRAMES) / total_frames * width if total_frames else 0
+        if not self.timeline.find_withtag("playhead"):
+            self.timeline.create_line(0, 0, 0, height, fill="white", width=2, tags=("playhead",))
+        self.timeline.coords("playhead", x, 0, x, height)
+        self.timeline.tag_raise("playhead")
+
+    def draw_timeline(self, width, height):
+        import numpy as np
+
+        counts, motion = self.activity.face_counts, self.activity.motion
+        columns = max(1, min(width, len(counts)))
+        starts = np.linspace(0, len(counts), columns + 1).astype(int)[:-1]
+        face_peaks = np.maximum.reduceat(counts, starts)
+        motion_peaks = np.maximum.reduceat(motion, starts)
+        face_scale = max(1, int(face_peaks.max()))
+        motion_scale = max(1.0, float(motion_peaks.max()))
+        column_width = width / columns
+        self.timeline.delete("bars")
+        for column in range(columns):
+            x = column * column_width
+            if face_peaks[column]:
+                shade = 80 + int(175 * face_peaks[column] / face_scale)
+                self.timeline.create_rectangle(
+                    x, 0, x + column_width, height, fill=f"#{shade:02x}0000", width=0, tags=("bars",)
+                )
+            elif motion_peaks[column] > 0:
+                bar_height = height * motion_peaks[column] / motion_scale
+                self.timeline.create_rectangle(
+                    x, height - bar_height, x + column_width, height, fill="#444444", width=0, tags=("bars",)
+                )
+
+    def seek_timeline(self, event):
+        """Jump to the clicked second, at the frame of that second with the most faces when it is known."""
+        import cv2
+
+        if not self.cap or not self.video_running:
+            return
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+        seconds = self.activity.seconds if self.activity is not None else self.cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+        second = int(event.x / max(1, self.timeline.winfo_width()) * seconds)
+        frame = self.activity.seek_frame(second) if self.activity is not None else int(second * fps)
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame)
+
+    def display_timeline(self):
+        """Replay the video with the presence timeline; the index is built by the face extraction stage."""
+        self.start_face_extraction()
+        self.init_video_screen()
+        self.play_video()
+
     def display_congratulations(self):
         self.clear_screen()
         congrats_label = tk.Label(
@@ -219,6 +339,21 @@ class NUCESVideoTriage:
         )
         faces_button.place(relx=0.7, rely=0.5, anchor="center")
 
+        timeline_button = tk.Button(
+            self.root,
+            text="Replay with Timeline",
+            command=self.display_timeline,
+            font=("Courier", 16, "bold"),
+            bg="red",
+            fg="black",
+            activebackground="#8B0000",
+            relief="raised",
+            bd=5,
+            padx=30,
+            pady=10,
+        )
+        timeline_button.place(relx=0.5, rely=0.65, anchor="center")
+
     def display_metadata(self):
         self.clear_screen()
         metadata_text = tk.Text(self.root, font=("Courier", 16), bg="black", fg="red", wrap="word")
@@ -229,8 +364,160 @@ class NUCESVideoTriage:
             for key, value in self.metadata.items():
                 metadata_text.insert(tk.END, f"{key}: {value}\n")
 
+            report_button = tk.Button(
+                self.root,
+                text="Export Report",
+                command=self.export_report,
+                font=("Courier", 14, "bold"),
+                bg="red",
+                fg="black",
+                activebackground="#8B0000",
+            )
+            report_button.place(relx=0.35, rely=0.95, anchor="center")
+
+            export_faces_button = tk.Button(
+                self.root,
+                text="Export Faces to Folder",
+                command=self.export_faces,
+                font=("Courier", 14, "bold"),
+                bg="red",
+                fg="black",
+                activebackground="#8B0000",
+            )
+            export_faces_button.place(relx=0.65, rely=0.95, anchor="center")
+
+    def run_in_background(self, title, work, message):
+        """
+        Run work() on a worker thread. Tk is only touched from its own thread: the result (or the exception)
+        comes back through a queue polled with after, then message(result) or the error is shown in a dialog.
+        """
+        import queue
+        import threading
+
+        results = queue.SimpleQueue()
+
+        def run():
+            try:
+                results.put((True, work()))
+            except Exception as error:
+                results.put((False, error))
+
+        def poll():
+            try:
+                succeeded, value = results.get_nowait()
+            except queue.Empty:
+                self.root.after(100, poll)
+                return
+            if succeeded:
+                messagebox.showinfo(title, message(value))
+            else:
+                messagebox.showerror(title, f"{title} failed: {value}")
+
+        threading.Thread(target=run, name=f"{title.lower()}-worker", daemon=True).start()
+        self.root.after(100, poll)
+
+    def export_faces(self):
+        """Write this video's faces out of the crop archive as one JPEG file each."""
+        from crop_archive import export_crops
+
+        folder = filedialog.askdirectory(title="Export faces to")
+        if not folder:
+            return
+        rows = self.case_db.query(
+            "SELECT frame, face_path FROM faces WHERE video_id = ? ORDER BY frame, id", (self.video_id,)
+        )
+        faces = [(row["face_path"], f"face_{row['frame']}_{n}.jpg") for n, row in enumerate(rows)]
+
+        self.run_in_background(
+            "Export", lambda: export_crops(faces, folder), lambda written: f"{written} faces written to {folder}"
+        )
+
+    def export_report(self):
+        """Write the HTML/PDF report of this video in the background and say where it went."""
+        from report import build_case_report
+        from runs import video_folder
+
+        report_folder = os.path.join(video_folder(self.output_folder, self.video_path), "report")
+
+        video_id = self.video_id
+        self.run_in_background(
+            "Report",
+            lambda: build_case_report(self.case_db.path, report_folder, video_ids=[video_id], workers=1),
+            lambda index_path: f"Report written to {index_path}",
+        )
+
     def display_faces(self):
         self.clear_screen()
+        if self.analysis is None:
+            return
+
+        # Face extraction starts the first time the faces are asked for and fills the gallery as it runs
+        self.start_face_extraction()
+        self.faces_label = tk.Label(
+            self.root,
+            text=self.faces_title(),
+            font=("Courier", 28, "bold"),
+            fg="red",
+            bg="black",
+        )
+        self.faces_label.place(relx=0.5, rely=0.07, anchor="center")
+
+        if not self.face_stream.done and not self.face_stream.stopped:
+            self.stop_button = tk.Button(
+                self.root,
+                text="Stop Analysis",
+                command=self.stop_analysis,
+                font=("Courier", 12, "bold"),
+                bg="red",
+                fg="black",
+                activebackground="#8B0000",
+                relief="raised",
+                bd=3,
+            )
+            self.stop_button.place(relx=0.95, rely=0.07, anchor="e")
+
+        self.gallery = FaceGallery(self.root, list(self.face_images), on_select=self.display_face_viewer)
+        self.gallery.place(relx=0.05, rely=0.13, relwidth=0.9, relheight=0.84)
+
+    def start_face_extraction(self):
+        if self.analysis.state("faces") == PENDING:
+            self.analysis.request("faces")
+            self.root.after(200, self.collect_faces, self.face_stream)
+
+    def faces_title(self):
+        title = f"Detected Faces ({len(self.face_images)})"
+        if self.face_stream.stopped:
+            title += " - stopped"
+        elif self.analysis.state("faces") == RUNNING:
+            total_frames = self.metadata.get("Total Frames") or 0
+            progress = self.metrics.counters.get("frames_decoded", 0) / total_frames if total_frames else 0
+            title += f" - analysing {progress:.0%}"
+        return title
+
+    def collect_faces(self, face_stream):
+        """Move faces published by the extraction thread into the face list and the open gallery."""
+        if face_stream is not self.face_stream:
+            return
+        face_paths = [event.face_path for event in face_stream.drain()]
+        if face_paths:
+            self.face_images.extend(face_paths)
+            if self.gallery:
+                self.gallery.append(face_paths)
+        if self.faces_label is not None and self.faces_label.winfo_exists():
+            self.faces_label.config(text=self.faces_title())
+        if not face_stream.done:
+            self.root.after(200, self.collect_faces, face_stream)
+        elif self.stop_button is not None and self.stop_button.winfo_exists():
+            self.stop_button.destroy()
+
+    def stop_analysis(self):
+        """Stop extraction early, e.g. once the subject has been found; faces saved so far are kept."""
+        self.face_stream.stop()
+        self.stop_button.config(state="disabled")
+
+    def display_face_viewer(self, index):
+        self.clear_screen()
+        self.face_index = index
 
         if self.face_images:
             face_label = tk.Label(
@@ -274,6 +561,19 @@ class NUCESVideoTriage:
             )
             next_button.grid(row=0, column=1, padx=10)
 
+            gallery_button = tk.Button(
+                navigation_frame,
+                text="Back to Gallery",
+                command=self.display_faces,
+                font=("Courier", 12, "bold"),
+                bg="red",
+                fg="black",
+                activebackground="#8B0000",
+                relief="raised",
+                bd=5,
+            )
+            gallery_button.grid(row=0, column=2, padx=10)
+
             self.display_face_image()
 
     def prev_face(self):
@@ -289,58 +589,174 @@ class NUCESVideoTriage:
     def display_face_image(self):
         if self.face_images:
             face_image_path = self.face_images[self.face_index]
-            face_image = Image.open(face_image_path).resize((300, 300), Image.Resampling.LANCZOS)
-            face_photo = ImageTk.PhotoImage(face_image)
+            face_photo = self.face_photos.get(face_image_path)
+            if face_photo is None:
+                face_photo = ImageTk.PhotoImage(load_thumbnail(face_image_path, VIEWER_SIZE))
+                self.face_photos.put(face_image_path, face_photo)
             self.face_panel.config(image=face_photo)
             self.face_panel.image = face_photo
-
-    def extract_metadata_and_faces(self):
+            self.prefetch_adjacent_faces()
+
+    def prefetch_adjacent_faces(self, radius=2):
+        # Requests are keyed by face path, so a result always lands on the face it was loaded for
+        neighbours = [
+            self.face_images[index]
+            for index in range(self.face_index - radius, self.face_index + radius + 1)
+            if 0 <= index < len(self.face_images) and self.face_images[index] not in self.face_photos
+        ]
+        self.face_loader.set_wanted(neighbours)
+        for face_path in neighbours:
+            self.face_loader.request(face_path, face_path)
+        if neighbours:
+            self.root.after(30, self.collect_prefetched_faces)
+
+    def collect_prefetched_faces(self):
+        for face_path, image in self.face_loader.poll():
+            if image is not None:
+                self.face_photos.put(face_path, ImageTk.PhotoImage(image))
+        if self.face_loader.pending:
+            self.root.after(30, self.collect_prefetched_faces)
+
+    def get_detector(self):
+        if self.detector is None or self.detector_video != self.video_path:
+            from detectors import create_detector
+            from roi import with_roi
+
+            self.detector = with_roi(create_detector(self.detector_name), self.video_path)
+            self.detector_video = self.video_path
+        return self.detector
+
+    def start_analysis(self):
+        """Read the metadata now; face extraction is only scheduled and runs once the faces view is opened."""
+        if self.face_stream is not None:
+            # The previous video's extraction writes to the same case database; let it wind down first
+            self.face_stream.stop()
+            self.analysis.wait("faces", timeout=30)
+        self.metrics = Metrics()
         self.metadata = self.extract_metadata(self.video_path)
-        self.face_images = self.extract_faces(self.video_path)
+        self.face_images = []
+        self.face_photos.clear()
+        # Drop the previous video's queued prefetches along with its loader
+        self.face_loader.close()
+        self.face_loader = ThumbnailLoader(VIEWER_SIZE)
+        self.activity = self.load_activity(self.video_path)
+        self.analysis = LazyAnalysis()
+        self.face_stream = FaceEventStream()
+        video_path, video_id, face_stream = self.video_path, self.video_id, self.face_stream
+        self.analysis.add("faces", lambda: self.extract_faces(video_path, video_id, face_stream))
+
+    def load_activity(self, video_path):
+        """The activity index saved by the latest analysis of this video, if the video has not changed since."""
+        from activity import ActivityIndex
+        from runs import latest_run
+
+        run = latest_run(self.output_folder, video_path)
+        saved_path = run.output("activity") if run else None
+        if saved_path and os.path.exists(saved_path):
+            return ActivityIndex.load(saved_path)
+        return None
 
     def extract_metadata(self, video_path):
-        cap = cv2.VideoCapture(video_path)
-        file_stats = os.stat(video_path)
-        metadata = {
-            "Resolution": f"{int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))}",
-            "Frame Rate": f"{cap.get(cv2.CAP_PROP_FPS):.2f} fps",
-            "Total Frames": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
-            "Duration": f"{int(cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS)):.2f} seconds",
-            "Date Created": datetime.fromtimestamp(file_stats.st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
-            "Date Modified": datetime.fromtimestamp(file_stats.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
-            "Date Accessed": datetime.fromtimestamp(file_stats.st_atime).strftime('%Y-%m-%d %H:%M:%S'),
-        }
-        cap.release()
-        return metadata
+        import cv2
 
-    def extract_faces(self, video_path):
         cap = cv2.VideoCapture(video_path)
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        face_images = []
-        frame_count = 0
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            if frame_count % 5 == 0:
-                gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = face_cascade.detectMultiScale(gray_frame, scaleFactor=1.1, minNeighbors=5, minSize=(50, 50))
-                for (x, y, w, h) in faces:
-                    face_image = frame[y:y + h, x:x + w]
-                    face_path = os.path.join(self.output_folder, f"face_{frame_count}.jpg")
-                    cv2.imwrite(face_path, face_image)
-                    face_images.append(face_path)
-            frame_count += 1
+        self.video_id = self.case_db.add_video(
+            video_path,
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            cap.get(cv2.CAP_PROP_FPS),
+            int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        )
         cap.release()
-        return face_images
+        return self.case_db.video_metadata(self.video_id)
+
+    def extract_faces(self, video_path, video_id, face_stream):
+        """
+        Runs on the analysis thread, publishing each saved face on face_stream as it is written.
+        Every analysis writes to its own run folder (see runs.Run), so analysing another video,
+        or the same one again, never overwrites the faces of this one.
+        """
+        from activity import ActivityIndex, activity_path
+        from crop_archive import ARCHIVE_NAME, CropArchive
+        from detectors import create_detector
+        from pipeline import FaceSink, extract_faces
+        from roi import with_roi
+        from runs import COMPLETE, FAILED, STOPPED, Run
+        from sampling import AdaptiveSampler
+
+        video = self.case_db.query("SELECT fps, total_frames FROM videos WHERE id = ?", (video_id,))[0]
+        activity = ActivityIndex(video["fps"], video["total_frames"])
+        if face_stream is self.face_stream:
+            self.activity = activity
+        run = Run.create(self.output_folder, video_path, parameters={
+            "detector": self.detector_name,
+            "analysis_budget_s": self.analysis_budget_s,
+            "faces_per_window": self.faces_per_window,
+            "quality_window_s": self.quality_window_s,
+        })
+        crop_archive = CropArchive(run.path(ARCHIVE_NAME))
+        try:
+            face_paths = extract_faces(
+                video_path,
+                FaceSink(run.folder, self.case_db, video_id, run.run_id, crop_archive, on_face=face_stream.publish),
+                # The player keeps using its own detector on the Tk thread
+                with_roi(create_detector(self.detector_name), video_path),
+                snapshot_folder=run.path("snapshots"),
+                metrics=self.metrics,
+                # Every 5th frame, the rate before adaptive sampling, stays the densest the analysis goes
+                sampler=AdaptiveSampler(
+                    video["fps"], video["total_frames"], min_interval=5, budget_s=self.analysis_budget_s
+                ),
+                stop_event=face_stream.stop_requested,
+                activity=activity,
+                top_k=self.faces_per_window,
+                quality_window_s=self.quality_window_s,
+            )
+        except Exception:
+            self.case_db.flush()
+            self.case_db.clear_faces(video_id, run_id=run.run_id)
+            run.finish(FAILED)
+            raise
+        finally:
+            crop_archive.close()
+            face_stream.finish()
+        # Face rows are per run, so a concurrent or earlier analysis of this video keeps its rows until now;
+        # a stopped run covers only part of the video and must not replace a complete one
+        if not face_stream.stopped:
+            self.case_db.supersede_runs(video_id, run.run_id)
+        run.add_output("faces", crop_archive.path)
+        run.add_output("snapshots", run.path("snapshots"))
+        run.add_output("activity", activity.save(activity_path(run.folder, video_path)))
+        run.add_output("run_report", self.metrics.write_report(run.path("run_report.json")))
+        run.finish(STOPPED if face_stream.stopped else COMPLETE, {"faces": len(face_paths)})
+        return face_paths
+
+    def report_startup_time(self, event=None):
+        if self.startup_time is None:
+            self.startup_time = time.perf_counter() - START_TIME
+            print(f"Time to first window: {self.startup_time * 1000:.0f} ms")
+
+    def init_status_bar(self):
+        self.status_bar = tk.Label(self.root, text="", font=("Courier", 10), fg="red", bg="black", anchor="w")
+        self.status_bar.place(relx=0, rely=1.0, anchor="sw", relwidth=1, height=22)
+
+    def update_status_bar(self):
+        if self.status_bar is not None and self.status_bar.winfo_exists():
+            self.status_bar.config(text=self.metrics.status_line())
+            self.status_bar.lift()
+        self.root.after(500, self.update_status_bar)
 
     def clear_screen(self):
+        if self.gallery:
+            self.gallery.close()
+            self.gallery = None
         for widget in self.root.winfo_children():
             widget.destroy()
+        self.init_status_bar()
 
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = NUCESVideoTriage(root)
+    root.bind("<Map>", app.report_startup_time, add="+")
     root.mainloop()
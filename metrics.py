@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from runs import atomic_write
+
+
+class StageTimer:
+    """Accumulates wall time and call counts per pipeline stage (decode, detect, write, ...)."""
+
+    def __init__(self):
+        self.totals = {}
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        with self.lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def summary(self):
+        """Per-stage totals as plain dicts, suitable for JSON output."""
+        with self.lock:
+            return {
+                name: {
+                    "calls": self.calls[name],
+                    "total_s": total,
+                    "mean_ms": total / self.calls[name] * 1000,
+                }
+                for name, total in self.totals.items()
+            }
+
+
+class Metrics(StageTimer):
+    """
+    Stage timers plus monotonically increasing counters (frames decoded, faces, bytes written, ...)
+    and point-in-time gauges (queue depths). Updates are a dict write under a lock, cheap enough
+    to call for every frame; readers (GUI status bar, run report, HTTP endpoint) take snapshots.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.counters = {}
+        self.gauges = {}
+        self.started = time.perf_counter()
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        stages = self.summary()
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        return {
+            "elapsed_s": elapsed,
+            "stages": stages,
+            "counters": counters,
+            "rates_per_s": {name: value / elapsed for name, value in counters.items()} if elapsed > 0 else {},
+            "gauges": gauges,
+        }
+
+    def status_line(self):
+        """One-line summary for the GUI status bar."""
+        snapshot = self.snapshot()
+        counters = snapshot["counters"]
+        rates = snapshot["rates_per_s"]
+        parts = [
+            f"decoded {counters.get('frames_decoded', 0)} ({rates.get('frames_decoded', 0):.1f}/s)",
+            f"analysed {counters.get('frames_analysed', 0)}",
+            f"faces {counters.get('faces_saved', 0)}",
+            f"written {counters.get('bytes_written', 0) / 1e6:.1f} MB",
+        ]
+        slowest = sorted(snapshot["stages"].items(), key=lambda item: item[1]["total_s"], reverse=True)[:3]
+        parts.extend(f"{name} {values['mean_ms']:.1f} ms" for name, values in slowest)
+        parts.extend(f"{name} {value}" for name, value in snapshot["gauges"].items())
+        return " | ".join(parts)
+
+    def prometheus_text(self, prefix="triage"):
+        """Render the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [
+            f"# TYPE {prefix}_stage_seconds_total counter",
+            *(f'{prefix}_stage_seconds_total{{stage="{name}"}} {values["total_s"]:.6f}'
+              for name, values in snapshot["stages"].items()),
+            f"# TYPE {prefix}_stage_calls_total counter",
+            *(f'{prefix}_stage_calls_total{{stage="{name}"}} {values["calls"]}'
+              for name, values in snapshot["stages"].items()),
+        ]
+        for name, value in snapshot["counters"].items():
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+        for name, value in snapshot["gauges"].items():
+            lines += [f"# TYPE {prefix}_{name} gauge", f"{prefix}_{name} {value}"]
+        lines += [f"# TYPE {prefix}_elapsed_seconds gauge", f"{prefix}_elapsed_seconds {snapshot['elapsed_s']:.3f}"]
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path):
+        return atomic_write(path, json.dumps(self.snapshot(), indent=4).encode("utf-8"))
+
+
+def serve_metrics(metrics, port=9100, host="127.0.0.1"):
+    """Serve metrics.prometheus_text() at http://host:port/metrics from a daemon thread; returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,301 @@
+import json
+import queue
+import threading
+import time
+
+import cv2
+
+from live import (
+    SEGMENTS_FOLDER, FaceAlerts, LatencyStats, LatestFrame, RollingRecorder, is_live_source, open_live_source,
+)
+from metrics import Metrics
+from runs import COMPLETE, FAILED, STOPPED, Run, atomic_write
+
+
+class Stream:
+    """
+    One source of a MultiStreamScheduler: its decode thread, fps target, face events and statistics.
+    The recorder and alerts are created once the source delivers its first frame, so a source that is
+    still offline costs nothing and is simply never due.
+    """
+
+    def __init__(self, name, source, fps_target, frames, run):
+        self.name = name
+        self.source = source
+        self.fps_target = fps_target
+        self.frames = frames
+        self.run = run
+        self.alerts = None
+        self.recorder = None
+        self.next_due = 0.0
+        self.in_flight = False
+        self.analysed = 0
+        self.lag = LatencyStats()
+        self.started = time.perf_counter()
+
+    def due(self, now):
+        return not self.in_flight and now >= self.next_due
+
+    def scheduled(self, now):
+        self.in_flight = True
+        if self.fps_target:
+            # Catch up by at most one frame rather than bursting after a stall
+            self.next_due = max(self.next_due + 1 / self.fps_target, now)
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "name": self.name,
+            "source": self.source,
+            "fps_target": self.fps_target,
+            "fps_achieved": round(self.analysed / elapsed, 2) if elapsed > 0 else 0.0,
+            "frames_captured": self.frames.captured,
+            "frames_analysed": self.analysed,
+            "frames_dropped": self.frames.dropped,
+            "face_events": self.alerts.count if self.alerts else 0,
+            "lag": self.lag.summary(),
+        }
+
+
+class MultiStreamScheduler:
+    """
+    Many sources on one host. Each source has a LatestFrame decode thread that keeps only its newest
+    frame; a fixed pool of detection workers (one detector each, from detector_factory) is shared by all
+    of them. The dispatcher waits for an idle worker, then walks the streams round-robin from where it
+    stopped last time and hands over the newest frame of the first stream that is due under its fps target
+    and has no frame in flight, so no stream holds more than one worker and every stream gets its turn.
+    cpu_budget caps detector time across workers (in seconds per wall-clock second, e.g. 2.0 for two
+    cores) with a token bucket; above it dispatch pauses, lowering every stream's rate evenly. Lag is the
+    time from capture to the end of a frame's analysis, reported per stream with frames dropped and the
+    achieved frame rate.
+    """
+
+    def __init__(self, output_root, detector_factory, workers=4, cpu_budget=None, window_s=0, segment_s=60,
+                 on_alert=None, metrics=None, reconnect_s=2.0):
+        self.output_root = output_root
+        self.detector_factory = detector_factory
+        self.workers = workers
+        self.cpu_budget = cpu_budget
+        self.window_s = window_s
+        self.segment_s = segment_s
+        self.on_alert = on_alert
+        self.metrics = metrics or Metrics()
+        self.reconnect_s = reconnect_s
+        self.streams = []
+        self.cursor = 0
+        self.jobs = queue.SimpleQueue()
+        self.idle_workers = threading.Semaphore(workers)
+        self.lock = threading.Lock()
+        self.tokens = cpu_budget or 0.0
+        self.refilled = time.perf_counter()
+        self.detect_seconds = 0.0
+        self.started = None
+
+    def add_stream(self, source, fps_target=None, name=None, loop=False):
+        name = name or f"stream{len(self.streams)}"
+        run = Run.create(self.output_root, source, parameters={
+            "name": name, "fps_target": fps_target, "loop": loop, "window_s": self.window_s,
+        })
+        holder = []
+
+        def record(frame, capture_time):
+            if not holder:
+                return
+            stream = holder[0]
+            if self.window_s and stream.recorder is None:
+                # Created with the first frame, once the source is open and its frame rate known
+                stream.recorder = RollingRecorder(run.path(SEGMENTS_FOLDER), stream.frames.fps, self.window_s,
+                                                  self.segment_s, metrics=self.metrics)
+                run.add_output("window", stream.recorder.folder)
+            if stream.recorder is not None:
+                stream.recorder.add(frame, capture_time)
+
+        # Opening happens on the capture thread, so an offline source does not hold up the others
+        frames = LatestFrame(
+            lambda: open_live_source(source, loop), on_frame=record,
+            reconnect_s=self.reconnect_s if is_live_source(source) else None,
+        )
+        holder.append(Stream(name, source, fps_target, frames, run))
+        self.streams.append(holder[0])
+        return holder[0]
+
+    def _wait_for_budget(self):
+        if not self.cpu_budget:
+            return
+        while True:
+            with self.lock:
+                now = time.perf_counter()
+                self.tokens = min(self.cpu_budget, self.tokens + (now - self.refilled) * self.cpu_budget)
+                self.refilled = now
+                deficit = -self.tokens
+            if deficit <= 0:
+                return
+            time.sleep(deficit / self.cpu_budget)
+
+    def _next_stream(self):
+        """The next stream in round-robin order that is due and has a new frame, with that frame."""
+        now = time.perf_counter()
+        for _ in range(len(self.streams)):
+            stream = self.streams[self.cursor]
+            self.cursor = (self.cursor + 1) % len(self.streams)
+            if not stream.due(now):
+                continue
+            item = stream.frames.get(timeout=0)
+            if item is not None:
+                if stream.alerts is None:
+                    stream.alerts = FaceAlerts(stream.run, stream.frames.fps, self.on_alert, self.metrics,
+                                               source=stream.name)
+                stream.scheduled(now)
+                return stream, item
+        return None, None
+
+    def _work(self, detector):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            stream, (number, capture_time, frame) = job
+            try:
+                started = time.perf_counter()
+                gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                faces = detector.detect(frame, gray_frame)
+                cost = time.perf_counter() - started
+                self.metrics.count("frames_analysed")
+                self.metrics.count("faces_detected", len(faces))
+                with self.lock:
+                    self.tokens -= cost
+                    self.detect_seconds += cost
+                stream.alerts.process(number, capture_time, frame, faces)
+                stream.analysed += 1
+                lag = time.time() - capture_time
+                stream.lag.add(lag)
+                self.metrics.gauge(f"lag_ms_{stream.name}", round(lag * 1000, 1))
+            except Exception as error:
+                self.metrics.count("worker_errors")
+                print(f"{stream.name}: analysis failed: {error}")
+            finally:
+                stream.in_flight = False
+                self.idle_workers.release()
+
+    def run(self, duration_s=None, stop_event=None):
+        """Schedule until every source has ended, duration_s has passed or stop_event is set."""
+        stop_event = stop_event or threading.Event()
+        # Built here rather than in the workers, so a detector that cannot load fails the run instead of
+        # leaving a dead worker whose jobs are never taken
+        try:
+            detectors = [self.detector_factory() for _ in range(self.workers)]
+        except Exception:
+            self.close(FAILED)
+            raise
+        threads = [
+            threading.Thread(target=self._work, args=(detector,), name=f"detector-{i}", daemon=True)
+            for i, detector in enumerate(detectors)
+        ]
+        for thread in threads:
+            thread.start()
+        self.started = time.perf_counter()
+        try:
+            while not stop_event.is_set():
+                if duration_s is not None and time.perf_counter() - self.started >= duration_s:
+                    break
+                if all(stream.frames.ended and not stream.in_flight for stream in self.streams):
+                    break
+                if not self.idle_workers.acquire(timeout=0.5):
+                    continue
+                self._wait_for_budget()
+                stream, item = self._next_stream()
+                if stream is None:
+                    self.idle_workers.release()
+                    time.sleep(0.005)
+                    continue
+                self.jobs.put((stream, item))
+        except KeyboardInterrupt:
+            stop_event.set()
+        for _ in threads:
+            self.jobs.put(None)
+        for thread in threads:
+            thread.join()
+        self.close(STOPPED if stop_event.is_set() else COMPLETE)
+        return self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        return {
+            "workers": self.workers,
+            "cpu_budget": self.cpu_budget,
+            "cpu_used": round(self.detect_seconds / elapsed, 2) if elapsed > 0 else 0.0,
+            "elapsed_s": round(elapsed, 1),
+            "streams": [stream.report() for stream in self.streams],
+        }
+
+    def status_line(self):
+        return " | ".join(
+            f"{stream.name} {stream.analysed / max(time.perf_counter() - stream.started, 1e-9):.1f}/s "
+            f"lag {stream.lag.summary().get('p50_ms', 0):.0f} ms"
+            for stream in self.streams
+        )
+
+    def close(self, status=COMPLETE):
+        for stream in self.streams:
+            stream.frames.stop()
+            if stream.recorder is not None:
+                stream.recorder.close()
+            if stream.alerts is not None:
+                stream.alerts.close()
+            report = stream.report()
+            run = stream.run
+            run.manifest["latency"] = stream.alerts.latency.summary() if stream.alerts else {"count": 0}
+            run.manifest["lag"] = report["lag"]
+            run.finish(status, {
+                name: report[name] for name in ("frames_captured", "frames_analysed", "frames_dropped", "face_events")
+            })
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    from detectors import create_detector
+
+    parser = argparse.ArgumentParser(description="Monitor many streams with a shared pool of detection workers.")
+    parser.add_argument("sources", nargs="+", help="rtsp:// or http:// URLs, device numbers, or files with --loop")
+    parser.add_argument("--loop", action="store_true", help="Replay video files in real time, looping")
+    parser.add_argument("--output", default="video_analysis_output", help="Output folder")
+    parser.add_argument("--detector", default="haar", help="Detector backend")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Detection workers for all streams")
+    parser.add_argument("--fps", type=float, default=2.0, help="Analysed frames per second per stream")
+    parser.add_argument("--fps-targets", help="Comma-separated per-stream targets overriding --fps, in source order")
+    parser.add_argument("--cpu-budget", type=float, help="Detector CPU seconds per second across all workers")
+    parser.add_argument("--window-minutes", type=float, default=0, help="Minutes of footage kept per stream (0: none)")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    args = parser.parse_args()
+
+    fps_targets = [args.fps] * len(args.sources)
+    if args.fps_targets:
+        for i, value in enumerate(args.fps_targets.split(",")[:len(fps_targets)]):
+            fps_targets[i] = float(value) if float(value) > 0 else None
+
+    scheduler = MultiStreamScheduler(
+        args.output, lambda: create_detector(args.detector), workers=args.workers, cpu_budget=args.cpu_budget,
+        window_s=args.window_minutes * 60,
+    )
+    for source, fps_target in zip(args.sources, fps_targets):
+        scheduler.add_stream(source, fps_target, loop=args.loop)
+
+    status_done = threading.Event()
+
+    def report_status():
+        while not status_done.wait(5):
+            print(scheduler.status_line())
+
+    threading.Thread(target=report_status, daemon=True).start()
+    report = scheduler.run(duration_s=args.duration)
+    status_done.set()
+    report_path = atomic_write(os.path.join(args.output, "multistream_report.json"),
+                               json.dumps(report, indent=4).encode("utf-8"))
+    for stream in report["streams"]:
+        lag = stream["lag"]
+        print(f"{stream['name']:<10} target {stream['fps_target'] or 'max'} fps, "
+              f"achieved {stream['fps_achieved']} fps, dropped {stream['frames_dropped']}, faces {stream['face_events']}, "
+              f"lag p50 {lag.get('p50_ms', 0):.0f} ms p95 {lag.get('p95_ms', 0):.0f} ms")
+    print(f"CPU used {report['cpu_used']} of {args.cpu_budget or args.workers}; report saved to {report_path}")
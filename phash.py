@@ -0,0 +1,93 @@
+import cv2
+import numpy as np
+
+
+def dhash(image, hash_size=8):
+    """
+    Difference hash of an image: compare neighbouring pixels of a (hash_size + 1) x hash_size
+    grayscale thumbnail and pack the results into an int of hash_size * hash_size bits.
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    padding = -bits.size % 8
+    return int.from_bytes(np.packbits(bits).tobytes(), "big") >> padding
+
+
+def hamming_distance(hash1, hash2):
+    return (hash1 ^ hash2).bit_count()
+
+
+class MultiIndexHashTable:
+    """
+    Multi-index hashing for Hamming-radius lookups.
+    Hashes are split into max_distance + 1 disjoint bit ranges, each indexed in its own table.
+    Any hash within max_distance of a query must match it exactly on at least one range,
+    so a lookup only checks the few entries sharing a bucket instead of every stored hash.
+    """
+
+    def __init__(self, max_distance=6, bits=64):
+        self.max_distance = max_distance
+        chunks = max_distance + 1
+        bounds = [i * bits // chunks for i in range(chunks + 1)]
+        self.ranges = [(bounds[i], (1 << (bounds[i + 1] - bounds[i])) - 1) for i in range(chunks)]
+        self.tables = [{} for _ in range(chunks)]
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def keys(self, hash_value):
+        return [(hash_value >> shift) & mask for shift, mask in self.ranges]
+
+    def add(self, hash_value, item):
+        entry_id = len(self.entries)
+        self.entries.append((hash_value, item))
+        for table, key in zip(self.tables, self.keys(hash_value)):
+            table.setdefault(key, []).append(entry_id)
+
+    def search(self, hash_value, max_distance=None):
+        """
+        Return (distance, hash, item) for every stored hash within max_distance, nearest first.
+        max_distance may be lowered per query but not raised above the radius the table was built for.
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+        seen = set()
+        matches = []
+        for table, key in zip(self.tables, self.keys(hash_value)):
+            for entry_id in table.get(key, ()):
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                stored_hash, item = self.entries[entry_id]
+                distance = hamming_distance(hash_value, stored_hash)
+                if distance <= max_distance:
+                    matches.append((distance, stored_hash, item))
+        return sorted(matches, key=lambda match: match[0])
+
+    def find(self, hash_value, max_distance=None):
+        """Return the item of the nearest stored hash within max_distance, or None."""
+        matches = self.search(hash_value, max_distance)
+        return matches[0][2] if matches else None
+
+
+class NearDuplicateFilter:
+    """Drop face crops whose perceptual hash is within max_distance bits of one already kept."""
+
+    def __init__(self, max_distance=6, hash_size=8):
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self.index = MultiIndexHashTable(max_distance, bits=hash_size * hash_size)
+
+    def check(self, face_image, item):
+        """
+        Hash a crop and look it up.
+        Returns (hash, duplicate_of); a new crop is indexed under `item` and gets duplicate_of=None.
+        """
+        face_hash = dhash(face_image, self.hash_size)
+        duplicate_of = self.index.find(face_hash)
+        if duplicate_of is None:
+            self.index.add(face_hash, item)
+        return face_hash, duplicate_of
@@ -0,0 +1,295 @@
+import os
+
+import cv2
+
+from decode import open_video
+from detectors import non_max_suppression
+from metrics import Metrics, serve_metrics
+from phash import NearDuplicateFilter, dhash
+from quality import TopKSelector, quality_scores
+from runs import atomic_write
+from sampling import AdaptiveSampler, FixedSampler
+from snapshots import SnapshotWriter
+from thumbnails import encode_thumbnail, write_thumbnail
+
+
+class FaceSink:
+    """
+    Where extract_faces puts the crops it keeps. Each crop is hashed for near-duplicate removal, or with
+    hash_only hashed and always kept (jobqueue removes duplicates across chunks itself), then written as a
+    loose JPEG in output_folder, or appended to a crop_archive.CropArchive, with its thumbnails. Rows go to
+    case_db tagged with run_id (a runs.Run id), so a run only clears its own rows; the caller supersedes
+    older runs once it finishes. on_face(face_path, frame_count, timestamp, box) is called for each face.
+    """
+
+    def __init__(self, output_folder, case_db=None, video_id=None, run_id=None, crop_archive=None,
+                 on_face=None, hash_only=False, deduplicate=True):
+        self.output_folder = output_folder
+        self.case_db = case_db
+        self.video_id = video_id
+        self.run_id = run_id
+        self.crop_archive = crop_archive
+        self.on_face = on_face
+        self.hash_only = hash_only
+        self.duplicate_filter = NearDuplicateFilter() if deduplicate and not hash_only else None
+        self.face_paths = []
+
+    def start(self, start_frame=0, end_frame=None):
+        """Clear the faces a previous attempt left in the frame range before it is extracted again."""
+        os.makedirs(self.output_folder, exist_ok=True)
+        if self.case_db is not None:
+            self.case_db.clear_faces(self.video_id, start_frame, end_frame, self.run_id)
+
+    def save(self, frame_count, i, box, face_image, timestamp, metrics):
+        x, y, w, h = box
+        face_path = os.path.join(self.output_folder, f"face_{frame_count}_{i}.jpg")
+        face_hash = None
+        if self.hash_only:
+            with metrics.stage("hash"):
+                face_hash = dhash(face_image)
+        elif self.duplicate_filter:
+            with metrics.stage("hash"):
+                face_hash, duplicate_of = self.duplicate_filter.check(face_image, face_path)
+            if duplicate_of is not None:
+                metrics.count("duplicates_dropped")
+                return
+        with metrics.stage("encode"):
+            _, encoded = cv2.imencode(".jpg", face_image)
+        if self.crop_archive is not None:
+            with metrics.stage("thumbnail"):
+                thumbnail = encode_thumbnail(face_image)
+            with metrics.stage("write"):
+                face_path = self.crop_archive.append(encoded, thumbnail)
+            metrics.count("bytes_written", encoded.nbytes + len(thumbnail))
+        else:
+            with metrics.stage("write"):
+                atomic_write(face_path, encoded)
+            metrics.count("bytes_written", encoded.nbytes)
+            with metrics.stage("thumbnail"):
+                write_thumbnail(face_image, face_path)
+        if self.case_db is not None:
+            with metrics.stage("database"):
+                self.case_db.add_face(self.video_id, frame_count, timestamp, (x, y, w, h), face_path, face_hash,
+                                      run_id=self.run_id)
+        self.face_paths.append(face_path)
+        metrics.count("faces_saved")
+        if self.on_face:
+            self.on_face(face_path, frame_count, timestamp, (x, y, w, h))
+
+    def flush(self):
+        if self.case_db is not None:
+            self.case_db.flush()
+
+
+def extract_faces(video_path, sink, detector, every=5, snapshot_folder=None, nms_threshold=None, metrics=None,
+                  sampler=None, decoder="opencv", decode_options=None, stop_event=None, activity=None,
+                  top_k=None, quality_window_s=10.0, min_quality=0.0, start_frame=0, end_frame=None):
+    """
+    Decode a video once and hand the faces found on every `every`-th frame, or on the frames chosen by
+    `sampler` (see sampling.AdaptiveSampler), to `sink` (a FaceSink). Frames that are neither analysed nor
+    snapshotted are only grabbed, or seeked over when the sampler's budget asks for it; frames come from
+    decode.open_video(decoder, **decode_options) as reused buffers. Snapshots are taken from the same pass
+    when snapshot_folder is given, and each analysed frame's faces and motion are added to `activity`.
+    With top_k only the top_k best crops per quality_window_s seconds (per track, with an activity index)
+    are kept; crops scoring below min_quality are dropped. Setting stop_event (a threading.Event) ends the
+    extraction early, start_frame and end_frame restrict it to a range of frames. Returns sink.face_paths.
+    """
+    metrics = metrics or Metrics()
+    cap = open_video(video_path, decoder, **(decode_options or {}))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    snapshots = SnapshotWriter(snapshot_folder, fps) if snapshot_folder else None
+    sampler = sampler or FixedSampler(every)
+    sink.start(start_frame, end_frame)
+    selector = TopKSelector(top_k, quality_window_s) if top_k else None
+    frame_count = 0
+    if start_frame:
+        # Sources that cannot seek (the ffmpeg pipe) decode their way to the start instead
+        if not cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame):
+            while frame_count < start_frame and cap.grab():
+                frame_count += 1
+        frame_count = start_frame
+
+    def save_face(frame_count, i, box, face_image):
+        sink.save(frame_count, i, box, face_image, frame_count / fps if fps > 0 else 0, metrics)
+
+    can_seek = True
+    while (stop_event is None or not stop_event.is_set()) and (end_frame is None or frame_count < end_frame):
+        analyse = sampler.should_analyse(frame_count)
+        if not analyse and not (snapshots and snapshots.wants_frame(frame_count)):
+            target = sampler.seek_target(frame_count) if can_seek else None
+            if target is not None:
+                if snapshots:
+                    target = min(target, snapshots.next_frame(frame_count))
+                if end_frame is not None:
+                    target = min(target, end_frame)
+            if target is not None and target > frame_count + 1:
+                # Budget-forced strides are seeked over; the seek time is charged to the next analysed frame
+                with metrics.stage("seek"):
+                    can_seek = cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                if can_seek:
+                    metrics.count("frames_seeked", target - frame_count)
+                    frame_count = target
+                    continue
+            with metrics.stage("decode"):
+                ret = cap.grab()
+            if not ret:
+                break
+            metrics.count("frames_decoded")
+            sampler.record_skip()
+            frame_count += 1
+            continue
+        with metrics.stage("decode"):
+            ret, frame = cap.read()
+        if not ret:
+            break
+        metrics.count("frames_decoded")
+        if snapshots:
+            with metrics.stage("snapshot"):
+                snapshots.add_frame(frame, frame_count)
+            metrics.gauge("snapshot_queue_depth", snapshots.writer.pending.qsize())
+        if not analyse:
+            sampler.record_skip()
+        else:
+            metrics.count("frames_analysed")
+            with metrics.stage("grayscale"):
+                gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            with metrics.stage("detect"):
+                faces = detector.detect(frame, gray_frame)
+            if nms_threshold is not None:
+                with metrics.stage("nms"):
+                    faces = non_max_suppression(faces, nms_threshold)
+            metrics.count("faces_detected", len(faces))
+            track_ids = [None] * len(faces)
+            if activity is not None:
+                with metrics.stage("activity"):
+                    track_ids = activity.add(frame_count, faces, gray_frame)
+            with metrics.stage("crop"):
+                crops = [frame[y:y + h, x:x + w] for (x, y, w, h) in faces]
+            if selector is None:
+                for i, (box, face_image) in enumerate(zip(faces, crops)):
+                    save_face(frame_count, i, tuple(box), face_image)
+            else:
+                timestamp = frame_count / fps if fps > 0 else 0
+                with metrics.stage("quality"):
+                    scores = quality_scores(crops)
+                for i, (box, face_image, score, track_id) in enumerate(zip(faces, crops, scores, track_ids)):
+                    if score < min_quality:
+                        metrics.count("low_quality_dropped")
+                    elif selector.offer(timestamp, float(score), (frame_count, i, tuple(box), face_image.copy()),
+                                        track_id):
+                        metrics.count("quality_candidates")
+                for item in selector.ready(timestamp):
+                    save_face(*item)
+            with metrics.stage("sampling"):
+                sampler.record(frame_count, len(faces), gray_frame)
+            metrics.gauge("sampling_interval", sampler.interval)
+        frame_count += 1
+
+    cap.release()
+    metrics.gauge("sampling_over_budget_s", sampler.over_budget_s())
+    if selector is not None:
+        for item in selector.flush():
+            save_face(*item)
+    if snapshots:
+        with metrics.stage("snapshot"):
+            snapshots.close()
+    sink.flush()
+    return sink.face_paths
+
+
+def annotate_frame(frame, detector, size=(800, 450), metrics=None):
+    """Prepare one player frame: draw detected faces and convert to a resized RGB array for display."""
+    metrics = metrics or Metrics()
+    with metrics.stage("grayscale"):
+        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    with metrics.stage("detect"):
+        faces = detector.detect(frame, gray_frame)
+    with metrics.stage("draw"):
+        for (x, y, w, h) in faces:
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        frame = cv2.resize(frame, size)
+    return frame
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from case_db import CASE_DB_NAME, CaseDatabase
+    from crop_archive import ARCHIVE_NAME, CropArchive
+    from activity import ActivityIndex, activity_path
+    from decode import scaled_size
+    from detectors import create_detector
+    from roi import with_roi
+    from runs import COMPLETE, FAILED, Run
+
+    parser = argparse.ArgumentParser(description="Batch face extraction with per-stage metrics.")
+    parser.add_argument("videos", nargs="+", help="Video files to process")
+    parser.add_argument("--output", default="video_analysis_output", help="Output folder")
+    parser.add_argument("--detector", default="haar", help="Detector backend")
+    parser.add_argument("--every", type=int, default=5, help="Analyse every n-th frame")
+    parser.add_argument("--decoder", default="opencv", help="opencv (FFmpeg backend) or ffmpeg (subprocess pipe)")
+    parser.add_argument("--decode-threads", type=int, default=0, help="Decoder threads (0 = one per core)")
+    parser.add_argument("--decode-width", type=int, help="Scale frames to this width in the ffmpeg decoder")
+    parser.add_argument("--adaptive", action="store_true", help="Adapt the analysis rate to faces and motion")
+    parser.add_argument("--budget-minutes", type=float, help="Compute budget per video for --adaptive sampling")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus-style metrics on this local port")
+    parser.add_argument("--camera", help="Camera profile in roi_profiles/ used when a video has no .roi.json")
+    parser.add_argument("--top-k", type=int, help="Keep only the k best-quality crops per window and track")
+    parser.add_argument("--quality-window", type=float, default=10.0, help="Seconds per --top-k selection window")
+    parser.add_argument("--loose-files", action="store_true", help="Write one JPEG per face instead of faces.pack")
+    parser.add_argument("--min-quality", type=float, default=0.0, help="Drop crops scoring below this (0-1)")
+    args = parser.parse_args()
+
+    metrics = Metrics()
+    if args.metrics_port:
+        serve_metrics(metrics, args.metrics_port)
+        print(f"Metrics served at http://127.0.0.1:{args.metrics_port}/metrics")
+    case_db = CaseDatabase(os.path.join(args.output, CASE_DB_NAME))
+    detector = create_detector(args.detector)
+    for video_path in args.videos:
+        cap = cv2.VideoCapture(video_path)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        video_id = case_db.add_video(video_path, width, height, fps, total_frames)
+        cap.release()
+        decode_options = {"threads": args.decode_threads}
+        if args.decode_width and args.decoder == "ffmpeg":
+            decode_options["size"] = scaled_size(width, height, args.decode_width)
+        sampler = None
+        if args.adaptive:
+            budget_s = args.budget_minutes * 60 if args.budget_minutes else None
+            sampler = AdaptiveSampler(fps, total_frames, min_interval=args.every,
+                                      max_interval=max(args.every, int(fps * 2)), budget_s=budget_s)
+        activity = ActivityIndex(fps, total_frames)
+        run = Run.create(args.output, video_path, parameters={
+            name: value for name, value in vars(args).items() if name not in ("videos", "output", "metrics_port")
+        })
+        crop_archive = None if args.loose_files else CropArchive(run.path(ARCHIVE_NAME))
+        try:
+            sink = FaceSink(run.folder, case_db, video_id, run.run_id, crop_archive)
+            face_paths = extract_faces(
+                video_path, sink, with_roi(detector, video_path, args.camera), every=args.every,
+                snapshot_folder=run.path("snapshots"), metrics=metrics, sampler=sampler, decoder=args.decoder,
+                decode_options=decode_options, activity=activity, top_k=args.top_k,
+                quality_window_s=args.quality_window, min_quality=args.min_quality,
+            )
+        except BaseException:
+            case_db.flush()
+            case_db.clear_faces(video_id, run_id=run.run_id)
+            run.finish(FAILED)
+            raise
+        finally:
+            if crop_archive is not None:
+                crop_archive.close()
+        case_db.supersede_runs(video_id, run.run_id)
+        if crop_archive is not None:
+            run.add_output("faces", crop_archive.path)
+        run.add_output("snapshots", run.path("snapshots"))
+        run.add_output("activity", activity.save(activity_path(run.folder, video_path)))
+        run.finish(COMPLETE, {"faces": len(face_paths)})
+        print(f"{video_path}: {metrics.status_line()} -> {run.folder}")
+    case_db.close()
+    print(f"Run report saved to {metrics.write_report(os.path.join(args.output, 'run_report.json'))}")
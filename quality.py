@@ -0,0 +1,107 @@
+import heapq
+from itertools import count
+
+import cv2
+import numpy as np
+
+SCORE_SIZE = 96
+WEIGHTS = {"sharpness": 0.35, "size": 0.2, "brightness": 0.1, "contrast": 0.1, "frontalness": 0.25}
+
+_eye_cascade = None
+
+
+def eye_cascade():
+    global _eye_cascade
+    if _eye_cascade is None:
+        _eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_eye.xml")
+    return _eye_cascade
+
+
+def eye_scores(gray_crops):
+    """1.0 for two eyes on either side of the centre line at a similar height, less for fewer or skewed eyes."""
+    scores = np.zeros(len(gray_crops), dtype=np.float32)
+    for i, crop in enumerate(gray_crops):
+        upper = crop[: SCORE_SIZE * 3 // 5]
+        eyes = eye_cascade().detectMultiScale(upper, scaleFactor=1.1, minNeighbors=3, minSize=(12, 12))
+        if len(eyes) >= 2:
+            centres = sorted((x + w / 2, y + h / 2) for x, y, w, h in eyes[:2])
+            both_sides = centres[0][0] < SCORE_SIZE / 2 < centres[1][0]
+            level = abs(centres[0][1] - centres[1][1]) < SCORE_SIZE / 8
+            scores[i] = 1.0 if both_sides and level else 0.7
+        elif len(eyes) == 1:
+            scores[i] = 0.4
+    return scores
+
+
+def quality_scores(crops, detailed=False):
+    """
+    Score BGR face crops in [0, 1] from sharpness (variance of the Laplacian), size, brightness, contrast
+    and frontalness (left-right symmetry plus eye detection). Crops are resized to one size and stacked so
+    every measure except eye detection is computed for the whole batch at once.
+    """
+    if len(crops) == 0:
+        return (np.zeros(0, dtype=np.float32), {}) if detailed else np.zeros(0, dtype=np.float32)
+    gray = np.stack([
+        cv2.resize(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), (SCORE_SIZE, SCORE_SIZE), interpolation=cv2.INTER_AREA)
+        for crop in crops
+    ])
+    pixels = gray.astype(np.float32)
+    laplacian = (
+        pixels[:, 1:-1, :-2] + pixels[:, 1:-1, 2:] + pixels[:, :-2, 1:-1] + pixels[:, 2:, 1:-1]
+        - 4 * pixels[:, 1:-1, 1:-1]
+    )
+    sides = np.sqrt(np.array([crop.shape[0] * crop.shape[1] for crop in crops], dtype=np.float32))
+    mean = pixels.mean(axis=(1, 2))
+    symmetry = 1 - np.abs(pixels - pixels[:, :, ::-1]).mean(axis=(1, 2)) / 64
+
+    measures = {
+        "sharpness": np.clip(laplacian.var(axis=(1, 2)) / 500, 0, 1),
+        "size": np.clip(sides / 120, 0, 1),
+        "brightness": 1 - np.abs(mean - 128) / 128,
+        "contrast": np.clip(pixels.std(axis=(1, 2)) / 50, 0, 1),
+        "frontalness": 0.5 * np.clip(symmetry, 0, 1) + 0.5 * eye_scores(gray),
+    }
+    scores = sum(WEIGHTS[name] * values for name, values in measures.items()).astype(np.float32)
+    return (scores, measures) if detailed else scores
+
+
+class TopKSelector:
+    """
+    Keeps only the k best-scoring faces per time window (and per track when track ids are given).
+    Candidates are held until their window has passed, then released best-first for writing,
+    so at most k crops per open window and track are kept in memory.
+    """
+
+    def __init__(self, k=3, window_s=10.0):
+        self.k = k
+        self.window_s = window_s
+        self.heaps = {}
+        self.order = count()
+
+    def window(self, timestamp):
+        return int(timestamp // self.window_s)
+
+    def offer(self, timestamp, score, item, track_id=None):
+        heap = self.heaps.setdefault((self.window(timestamp), track_id), [])
+        entry = (score, next(self.order), item)
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+            return True
+        if score > heap[0][0]:
+            heapq.heapreplace(heap, entry)
+            return True
+        return False
+
+    def ready(self, timestamp):
+        """Release the kept items of every window that ended before timestamp."""
+        current = self.window(timestamp)
+        return self._release([key for key in self.heaps if key[0] < current])
+
+    def flush(self):
+        return self._release(list(self.heaps))
+
+    def _release(self, keys):
+        released = []
+        for key in sorted(keys, key=lambda key: (key[0], -1 if key[1] is None else key[1])):
+            released.extend(item for score, order, item in sorted(self.heaps.pop(key), key=lambda entry: entry[1]))
+        return released
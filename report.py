@@ -0,0 +1,286 @@
+import argparse
+import html
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from case_db import CaseDatabase
+from runs import atomic_open
+from thumbnails import load_thumbnail, thumbnail_path
+
+REPORT_THUMB_SIZE = 96
+FACES_PER_PAGE = 500
+MAX_PDF_FACES = 600
+TIMELINE_BINS = 120
+
+STYLE = """
+body { font-family: Arial, sans-serif; margin: 2em; }
+table { border-collapse: collapse; margin-bottom: 1.5em; }
+td, th { border: 1px solid #999; padding: 4px 8px; text-align: left; }
+.timeline { display: flex; align-items: flex-end; height: 120px; border-bottom: 1px solid #333; }
+.timeline div { flex: 1; background: #b22; margin-right: 1px; }
+.gallery figure { display: inline-block; margin: 4px; text-align: center; font-size: 11px; }
+.hit { color: #b22; font-weight: bold; }
+"""
+
+
+def format_time(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def report_thumbnail(face_path, size=REPORT_THUMB_SIZE):
+    """Path of a small cached thumbnail for the report, generated on first use."""
+    path = thumbnail_path(face_path, size)
+    if not os.path.exists(path):
+        thumbnail = load_thumbnail(face_path, size)
+        # Thumbnails of archived crops are not cached on disk by load_thumbnail, but the report needs files
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomic_open(path) as f:
+                thumbnail.save(f, "JPEG", quality=90)
+    return path
+
+
+def video_timeline(case_db, video_id, duration, bins=TIMELINE_BINS):
+    """Faces per time bin, counted in SQL; returns (bin length in seconds, list of counts)."""
+    bin_seconds = max(60.0, (duration or 0) / bins)
+    counts = [0] * max(1, int(math.ceil((duration or 0) / bin_seconds)))
+    rows = case_db.query(
+        "SELECT CAST(timestamp / ? AS INTEGER) AS bin, COUNT(*) AS faces FROM faces WHERE video_id = ? GROUP BY bin",
+        (bin_seconds, video_id),
+    )
+    for row in rows:
+        if row["bin"] >= len(counts):
+            counts.extend([0] * (row["bin"] + 1 - len(counts)))
+        counts[row["bin"]] = row["faces"]
+    return bin_seconds, counts
+
+
+def watchlist_hits(case_db, video_id):
+    return case_db.query(
+        "SELECT frame, timestamp, name, confidence, face_path FROM faces "
+        "WHERE video_id = ? AND name IS NOT NULL AND name != 'Unknown' ORDER BY frame, id",
+        (video_id,),
+    )
+
+
+def face_count(case_db, video_id):
+    return case_db.query("SELECT COUNT(*) AS faces FROM faces WHERE video_id = ?", (video_id,))[0]["faces"]
+
+
+class HtmlVideoReport:
+    """Static HTML pages for one video: a summary page plus gallery pages of FACES_PER_PAGE faces each."""
+
+    def __init__(self, output_dir, video_id):
+        self.output_dir = output_dir
+        self.video_id = video_id
+
+    def page_name(self, page):
+        return f"video_{self.video_id}.html" if page == 0 else f"video_{self.video_id}_faces_{page}.html"
+
+    def image_src(self, face_path):
+        return html.escape(os.path.relpath(report_thumbnail(face_path), self.output_dir).replace(os.sep, "/"))
+
+    def write(self, metadata, timeline, hits, faces, total_faces):
+        pages = max(1, int(math.ceil(total_faces / FACES_PER_PAGE)))
+        with open(os.path.join(self.output_dir, self.page_name(0)), "w", encoding="utf-8") as f:
+            f.write(f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Video {self.video_id}</title>"
+                    f"<style>{STYLE}</style></head><body><p><a href='index.html'>Case index</a></p>")
+            f.write(f"<h1>{html.escape(os.path.basename(metadata['Video Path']))}</h1><table>")
+            for key, value in metadata.items():
+                f.write(f"<tr><th>{html.escape(key)}</th><td>{html.escape(str(value))}</td></tr>")
+            f.write(f"<tr><th>Detected Faces</th><td>{total_faces}</td></tr></table>")
+
+            bin_seconds, counts = timeline
+            peak = max(counts) or 1
+            f.write(f"<h2>Timeline (faces per {bin_seconds / 60:.0f} min)</h2><div class='timeline'>")
+            for index, value in enumerate(counts):
+                f.write(f"<div style='height:{100 * value / peak:.0f}%' "
+                        f"title='{format_time(index * bin_seconds)}: {value} faces'></div>")
+            f.write("</div>")
+
+            f.write(f"<h2>Watchlist Hits ({len(hits)})</h2>")
+            if hits:
+                f.write("<table><tr><th>Time</th><th>Frame</th><th>Name</th><th>Confidence</th><th>Face</th></tr>")
+                for hit in hits:
+                    f.write(f"<tr class='hit'><td>{format_time(hit['timestamp'])}</td><td>{hit['frame']}</td>"
+                            f"<td>{html.escape(hit['name'])}</td><td>{hit['confidence'] or 0:.2f}</td>"
+                            f"<td><img src='{self.image_src(hit['face_path'])}' width='64'></td></tr>")
+                f.write("</table>")
+
+            f.write("<h2>Faces</h2><p>" + " ".join(
+                f"<a href='{self.page_name(page + 1)}'>{page * FACES_PER_PAGE + 1}-"
+                f"{min(total_faces, (page + 1) * FACES_PER_PAGE)}</a>" for page in range(pages) if total_faces
+            ) + "</p></body></html>")
+
+        page, gallery = 0, None
+        for index, face in enumerate(faces):
+            if index % FACES_PER_PAGE == 0:
+                if gallery:
+                    self._close_gallery(gallery, page, pages)
+                page += 1
+                gallery = open(os.path.join(self.output_dir, self.page_name(page)), "w", encoding="utf-8")
+                gallery.write(f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Video {self.video_id} "
+                              f"faces page {page}</title><style>{STYLE}</style></head><body>"
+                              f"<p><a href='{self.page_name(0)}'>Back to video</a></p><div class='gallery'>")
+            caption = f"{format_time(face['timestamp'])} #{face['frame']}"
+            if face["identity"] is not None:
+                caption += f" id {face['identity']}"
+            gallery.write(f"<figure><img src='{self.image_src(face['face_path'])}' loading='lazy'>"
+                          f"<figcaption>{caption}</figcaption></figure>")
+        if gallery:
+            self._close_gallery(gallery, page, pages)
+
+    def _close_gallery(self, gallery, page, pages):
+        links = []
+        if page > 1:
+            links.append(f"<a href='{self.page_name(page - 1)}'>Previous</a>")
+        if page < pages:
+            links.append(f"<a href='{self.page_name(page + 1)}'>Next</a>")
+        gallery.write(f"</div><p>{' '.join(links)}</p></body></html>")
+        gallery.close()
+
+
+def pdf_text(text):
+    """The core PDF fonts only cover Latin-1."""
+    return str(text).encode("latin-1", "replace").decode("latin-1")
+
+
+def write_video_pdf(path, metadata, timeline, hits, faces, total_faces, max_faces=MAX_PDF_FACES):
+    """
+    Paginated PDF for one video. The gallery holds at most max_faces evenly spaced thumbnails, since
+    FPDF keeps every embedded image in memory until the file is written; the HTML report has them all.
+    """
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 10, pdf_text(os.path.basename(metadata["Video Path"])), 0, 1)
+    pdf.set_font("Helvetica", "", 10)
+    for key, value in metadata.items():
+        pdf.cell(40, 6, pdf_text(key), 0, 0)
+        pdf.cell(0, 6, pdf_text(value)[:90], 0, 1)
+    pdf.cell(40, 6, "Detected Faces", 0, 0)
+    pdf.cell(0, 6, str(total_faces), 0, 1)
+
+    bin_seconds, counts = timeline
+    peak = max(counts) or 1
+    pdf.ln(4)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, f"Timeline (faces per {bin_seconds / 60:.0f} min)", 0, 1)
+    top, height, left, width = pdf.get_y(), 30, 10, 190
+    bar_width = width / len(counts)
+    pdf.set_fill_color(178, 34, 34)
+    for index, value in enumerate(counts):
+        if value:
+            bar_height = height * value / peak
+            pdf.rect(left + index * bar_width, top + height - bar_height, max(bar_width - 0.2, 0.2), bar_height, "F")
+    pdf.line(left, top + height, left + width, top + height)
+    pdf.set_y(top + height + 4)
+
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, f"Watchlist Hits ({len(hits)})", 0, 1)
+    pdf.set_font("Helvetica", "", 10)
+    for hit in hits:
+        pdf.cell(0, 6, pdf_text(f"{format_time(hit['timestamp'])}  frame {hit['frame']}  {hit['name']}  "
+                                f"confidence {hit['confidence'] or 0:.2f}"), 0, 1)
+
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 12)
+    shown = min(total_faces, max_faces)
+    pdf.cell(0, 8, f"Faces ({shown} of {total_faces})", 0, 1)
+    pdf.set_font("Helvetica", "", 7)
+    step = max(1, int(math.ceil(total_faces / max_faces))) if total_faces else 1
+    columns, cell_size, caption_height = 8, 23, 4
+    column = 0
+    for index, face in enumerate(faces):
+        if index % step:
+            continue
+        if column == 0 and pdf.get_y() + cell_size + caption_height > pdf.h - 15:
+            pdf.add_page()
+        x, y = 10 + column * cell_size, pdf.get_y()
+        pdf.image(report_thumbnail(face["face_path"]), x, y, cell_size - 2, cell_size - 2)
+        pdf.set_xy(x, y + cell_size - 2)
+        pdf.cell(cell_size - 2, caption_height, format_time(face["timestamp"]), 0, 0, "C")
+        column = (column + 1) % columns
+        pdf.set_xy(10, y if column else y + cell_size + caption_height)
+    pdf.output(path)
+    return path
+
+
+def write_video_report(db_path, video_id, output_dir, formats=("html", "pdf")):
+    """
+    Write the report files of one video from the case database. Opens its own database connection so
+    videos can be reported in parallel processes; faces are streamed from the database in batches.
+    """
+    case_db = CaseDatabase(db_path)
+    try:
+        metadata = case_db.video_metadata(video_id)
+        duration = case_db.query("SELECT duration FROM videos WHERE id = ?", (video_id,))[0]["duration"]
+        total_faces = face_count(case_db, video_id)
+        timeline = video_timeline(case_db, video_id, duration)
+        hits = watchlist_hits(case_db, video_id)
+        written = []
+        if "html" in formats:
+            report = HtmlVideoReport(output_dir, video_id)
+            report.write(metadata, timeline, hits, case_db.iter_faces(video_id), total_faces)
+            written.append(os.path.join(output_dir, report.page_name(0)))
+        if "pdf" in formats:
+            try:
+                written.append(write_video_pdf(
+                    os.path.join(output_dir, f"video_{video_id}.pdf"),
+                    metadata, timeline, hits, case_db.iter_faces(video_id), total_faces,
+                ))
+            except ImportError:
+                print("PDF report skipped: install fpdf2 (pip install fpdf2)")
+        return {"video_id": video_id, "path": metadata["Video Path"], "faces": total_faces, "hits": len(hits),
+                "files": written}
+    finally:
+        case_db.close()
+
+
+def write_index(output_dir, summaries):
+    with open(os.path.join(output_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Case Report</title><style>{STYLE}</style>"
+                "</head><body><h1>Case Report</h1><table><tr><th>Video</th><th>Faces</th><th>Watchlist Hits</th>"
+                "<th>PDF</th></tr>")
+        for summary in summaries:
+            pdf_name = f"video_{summary['video_id']}.pdf"
+            pdf_link = f"<a href='{pdf_name}'>PDF</a>" if os.path.exists(os.path.join(output_dir, pdf_name)) else ""
+            f.write(f"<tr><td><a href='video_{summary['video_id']}.html'>{html.escape(summary['path'])}</a></td>"
+                    f"<td>{summary['faces']}</td><td class='hit'>{summary['hits'] or ''}</td><td>{pdf_link}</td></tr>")
+        f.write("</table></body></html>")
+    return os.path.join(output_dir, "index.html")
+
+
+def build_case_report(db_path, output_dir, video_ids=None, workers=None, formats=("html", "pdf")):
+    """Report every video of the case (or only video_ids), one process per video, and link them from index.html."""
+    os.makedirs(output_dir, exist_ok=True)
+    case_db = CaseDatabase(db_path)
+    video_ids = video_ids or [video["id"] for video in case_db.videos()]
+    case_db.close()
+
+    workers = workers or min(len(video_ids), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            summaries = list(pool.map(
+                write_video_report, [db_path] * len(video_ids), video_ids,
+                [output_dir] * len(video_ids), [formats] * len(video_ids),
+            ))
+    else:
+        summaries = [write_video_report(db_path, video_id, output_dir, formats) for video_id in video_ids]
+    return write_index(output_dir, summaries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write HTML and PDF case reports from a case database.")
+    parser.add_argument("case_db", help="Path to case.db")
+    parser.add_argument("--output", default="report", help="Report folder")
+    parser.add_argument("--videos", type=int, nargs="+", help="Only report these video ids")
+    parser.add_argument("--workers", type=int, help="Parallel processes (default: one per video, up to the core count)")
+    parser.add_argument("--formats", nargs="+", default=["html", "pdf"], choices=["html", "pdf"])
+    args = parser.parse_args()
+    print(f"Report written to {build_case_report(args.case_db, args.output, args.videos, args.workers, args.formats)}")
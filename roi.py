@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+from detectors import FaceDetector, non_max_suppression
+
+ROI_PROFILES_FOLDER = "roi_profiles"
+
+
+class RoiMask:
+    """
+    Regions of interest for a fixed camera, as polygons in frame coordinates.
+    Polygons drawn on a frame of `frame_size` are rescaled to whatever frame size they are applied to.
+    """
+
+    def __init__(self, polygons, frame_size):
+        self.polygons = [np.asarray(polygon, dtype=np.float32).reshape(-1, 2) for polygon in polygons]
+        self.frame_size = tuple(frame_size)
+        self.prepared_size = None
+        self.mask = None
+        self.regions = []
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["polygons"], data["frame_size"])
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "frame_size": list(self.frame_size),
+                "polygons": [polygon.astype(int).tolist() for polygon in self.polygons],
+            }, f, indent=4)
+
+    def prepare(self, width, height):
+        """Rasterise the polygons for this frame size and compute the bounding rectangle of each region."""
+        if self.prepared_size == (width, height):
+            return
+        scale = np.array([width / self.frame_size[0], height / self.frame_size[1]], dtype=np.float32)
+        polygons = [np.round(polygon * scale).astype(np.int32) for polygon in self.polygons]
+        self.mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillPoly(self.mask, polygons, 255)
+        self.regions = []
+        for polygon in polygons:
+            x, y, w, h = cv2.boundingRect(polygon)
+            x, y = max(0, x), max(0, y)
+            w, h = min(w, width - x), min(h, height - y)
+            if w > 0 and h > 0:
+                self.regions.append((x, y, w, h))
+        self.prepared_size = (width, height)
+
+    def contains(self, box):
+        """True when the centre of a (x, y, w, h) box lies inside the mask."""
+        x, y, w, h = box
+        centre_x = min(max(x + w // 2, 0), self.mask.shape[1] - 1)
+        centre_y = min(max(y + h // 2, 0), self.mask.shape[0] - 1)
+        return self.mask[centre_y, centre_x] > 0
+
+    def area_fraction(self):
+        """Fraction of the frame that detection still has to scan."""
+        width, height = self.prepared_size
+        return sum(w * h for _, _, w, h in self.regions) / float(width * height)
+
+
+class RoiDetector(FaceDetector):
+    """
+    Wraps another detector so it only scans the bounding rectangles of the ROI polygons.
+    Crops are NumPy views (no copy), boxes are shifted back to frame coordinates and
+    anything whose centre falls outside the mask is discarded.
+    """
+
+    def __init__(self, detector, roi_mask):
+        self.detector = detector
+        self.roi_mask = roi_mask
+        self.name = f"{detector.name}+roi"
+
+    def detect(self, frame, gray=None):
+        height, width = frame.shape[:2]
+        self.roi_mask.prepare(width, height)
+        faces = []
+        for x, y, w, h in self.roi_mask.regions:
+            region_gray = gray[y:y + h, x:x + w] if gray is not None else None
+            for fx, fy, fw, fh in self.detector.detect(frame[y:y + h, x:x + w], region_gray):
+                box = (fx + x, fy + y, fw, fh)
+                if self.roi_mask.contains(box):
+                    faces.append(box)
+        if len(self.roi_mask.regions) > 1:
+            faces = non_max_suppression(faces)
+        return faces
+
+
+def roi_path_for_video(video_path):
+    return os.path.splitext(video_path)[0] + ".roi.json"
+
+
+def load_roi(video_path=None, camera=None, profiles_folder=ROI_PROFILES_FOLDER):
+    """
+    Find the ROI for a video: a <video>.roi.json next to the video wins, otherwise the
+    camera profile roi_profiles/<camera>.json. Returns None when neither exists.
+    """
+    candidates = []
+    if video_path:
+        candidates.append(roi_path_for_video(video_path))
+    if camera:
+        candidates.append(os.path.join(profiles_folder, f"{camera}.json"))
+    for path in candidates:
+        if os.path.exists(path):
+            return RoiMask.load(path)
+    return None
+
+
+def with_roi(detector, video_path=None, camera=None):
+    """Wrap a detector in a RoiDetector when an ROI is defined for the video or camera."""
+    roi_mask = load_roi(video_path, camera)
+    return RoiDetector(detector, roi_mask) if roi_mask else detector
+
+
+def draw_roi(video_path, output_path):
+    """
+    Draw ROI polygons on the first frame of a video.
+    Left click adds a point, 'n' closes the current polygon, 's' saves, 'q' quits without saving.
+    """
+    cap = cv2.VideoCapture(video_path)
+    ret, frame = cap.read()
+    cap.release()
+    if not ret:
+        print(f"Error: Could not read a frame from {video_path}")
+        return
+
+    polygons, current = [], []
+
+    def on_mouse(event, x, y, flags, param):
+        if event == cv2.EVENT_LBUTTONDOWN:
+            current.append((x, y))
+
+    window = f"ROI - {os.path.basename(video_path)}"
+    cv2.namedWindow(window, cv2.WINDOW_NORMAL)
+    cv2.setMouseCallback(window, on_mouse)
+    while True:
+        canvas = frame.copy()
+        for polygon in polygons:
+            cv2.polylines(canvas, [np.array(polygon, dtype=np.int32)], True, (0, 255, 0), 2)
+        if current:
+            cv2.polylines(canvas, [np.array(current, dtype=np.int32)], False, (0, 0, 255), 2)
+        cv2.imshow(window, canvas)
+        key = cv2.waitKey(20) & 0xFF
+        if key == ord('n') and len(current) >= 3:
+            polygons.append(list(current))
+            current.clear()
+        elif key == ord('s'):
+            if len(current) >= 3:
+                polygons.append(list(current))
+            RoiMask(polygons, (frame.shape[1], frame.shape[0])).save(output_path)
+            print(f"ROI saved to {output_path}")
+            break
+        elif key == ord('q'):
+            break
+    cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Draw region-of-interest polygons for a video or camera.")
+    parser.add_argument("video", help="Video whose first frame is used for drawing")
+    parser.add_argument("--camera", help="Save as a camera profile in roi_profiles/ instead of next to the video")
+    args = parser.parse_args()
+
+    if args.camera:
+        os.makedirs(ROI_PROFILES_FOLDER, exist_ok=True)
+        draw_roi(args.video, os.path.join(ROI_PROFILES_FOLDER, f"{args.camera}.json"))
+    else:
+        draw_roi(args.video, roi_path_for_video(args.video))
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+MANIFEST_NAME = "manifest.json"
+
+RUNNING = "running"
+COMPLETE = "complete"
+STOPPED = "stopped"
+FAILED = "failed"
+
+
+@contextmanager
+def atomic_open(path, mode="wb"):
+    """
+    Open a temporary file next to path and rename it over path once the block succeeds, so readers and
+    concurrent writers only ever see a missing or a complete file. The temporary name is unique per
+    process and thread; it is removed if the block fails.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write(path, data):
+    with atomic_open(path) as f:
+        f.write(data)
+    return path
+
+
+def source_id(video_path):
+    """Absolute path of a video file; stream URLs and device numbers are kept as given."""
+    return os.path.abspath(video_path) if os.path.isfile(video_path) else video_path
+
+
+def video_key(video_path):
+    """Folder name for one video's results: its file name plus a hash of its full path, so videos with
+    the same name from different folders do not share results."""
+    stem = re.sub(r"[^\w.-]+", "_", os.path.splitext(os.path.basename(video_path.rstrip("/")))[0]) or "stream"
+    digest = hashlib.sha1(source_id(video_path).encode("utf-8")).hexdigest()[:8]
+    return f"{stem}_{digest}"
+
+
+def video_folder(output_root, video_path):
+    return os.path.join(output_root, video_key(video_path))
+
+
+class Run:
+    """
+    One analysis of one video, written to its own folder, <output root>/<video key>/<run id>/, so analyses
+    of different videos, or of the same video at the same time, never write to the same files.
+    manifest.json records the video (path, size, modification time), the parameters, the outputs
+    and the final status and counts; it is rewritten atomically on every change.
+    """
+
+    def __init__(self, folder, manifest):
+        self.folder = folder
+        self.manifest = manifest
+        self.lock = threading.Lock()
+
+    @classmethod
+    def create(cls, output_root, video_path, parameters=None):
+        parent = video_folder(output_root, video_path)
+        os.makedirs(parent, exist_ok=True)
+        # UTC time to the nanosecond, zero-padded, so run ids sort by start time even within one second
+        started_ns = time.time_ns()
+        seconds, nanoseconds = divmod(started_ns, 1_000_000_000)
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime(seconds))}.{nanoseconds:09d}-{os.getpid()}"
+        suffix = 0
+        while True:
+            candidate = run_id if suffix == 0 else f"{run_id}-{suffix}"
+            try:
+                # exist_ok=False makes the directory the claim on the run id
+                os.makedirs(os.path.join(parent, candidate))
+                break
+            except FileExistsError:
+                suffix += 1
+        # Live sources have no size or modification time
+        stat = os.stat(video_path) if os.path.isfile(video_path) else None
+        run = cls(os.path.join(parent, candidate), {
+            "run_id": candidate,
+            "video_path": source_id(video_path),
+            "video_size": stat.st_size if stat else None,
+            "video_mtime": stat.st_mtime if stat else None,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "started": started_ns / 1e9,
+            "finished": None,
+            "status": RUNNING,
+            "parameters": parameters or {},
+            "outputs": {},
+            "counts": {},
+        })
+        run.write_manifest()
+        return run
+
+    @classmethod
+    def load(cls, folder):
+        with open(os.path.join(folder, MANIFEST_NAME)) as f:
+            return cls(folder, json.load(f))
+
+    @property
+    def run_id(self):
+        return self.manifest["run_id"]
+
+    @property
+    def status(self):
+        return self.manifest["status"]
+
+    def path(self, *parts):
+        return os.path.join(self.folder, *parts)
+
+    def add_output(self, name, path):
+        """Record an output of the run, stored relative to the run folder."""
+        with self.lock:
+            self.manifest["outputs"][name] = os.path.relpath(path, self.folder)
+        self.write_manifest()
+        return path
+
+    def output(self, name):
+        relative = self.manifest["outputs"].get(name)
+        return self.path(relative) if relative else None
+
+    def finish(self, status=COMPLETE, counts=None):
+        with self.lock:
+            self.manifest["status"] = status
+            self.manifest["finished"] = time.time()
+            self.manifest["counts"].update(counts or {})
+        self.write_manifest()
+
+    def write_manifest(self):
+        with self.lock:
+            data = json.dumps(self.manifest, indent=4).encode("utf-8")
+        atomic_write(self.path(MANIFEST_NAME), data)
+
+    def matches_video(self, video_path):
+        """True if the video is unchanged since this run analysed it."""
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return False
+        return stat.st_size == self.manifest["video_size"] and stat.st_mtime == self.manifest["video_mtime"]
+
+
+def list_runs(output_root, video_path):
+    """Runs of a video, oldest first; folders without a readable manifest are skipped."""
+    parent = video_folder(output_root, video_path)
+    if not os.path.isdir(parent):
+        return []
+    runs = []
+    for name in os.listdir(parent):
+        try:
+            runs.append(Run.load(os.path.join(parent, name)))
+        except (OSError, ValueError):
+            continue
+    return sorted(runs, key=lambda run: run.manifest["started"])
+
+
+def latest_run(output_root, video_path, statuses=(COMPLETE,)):
+    """
+    The newest run of the video that analysed its current contents, or None. Only complete runs count by
+    default: a stopped run covers part of the video, so its outputs must not be reused as the whole.
+    """
+    for run in reversed(list_runs(output_root, video_path)):
+        if run.status in statuses and run.matches_video(video_path):
+            return run
+    return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="List the analysis runs of a video.")
+    parser.add_argument("video", help="Video file")
+    parser.add_argument("--output", default="video_analysis_output", help="Output folder")
+    args = parser.parse_args()
+
+    for run in list_runs(args.output, args.video):
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run.manifest["started"]))
+        counts = ", ".join(f"{name} {value}" for name, value in run.manifest["counts"].items())
+        print(f"{run.run_id}  {started}  {run.status:<8}  {counts}  {run.folder}")
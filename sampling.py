@@ -0,0 +1,130 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class FixedSampler:
+    """Analyse every `every`-th frame, the original behaviour of the pipelines."""
+
+    def __init__(self, every=5):
+        self.interval = max(1, every)
+
+    def should_analyse(self, frame_count):
+        return frame_count % self.interval == 0
+
+    def record(self, frame_count, face_count, gray_frame=None):
+        pass
+
+    def record_skip(self):
+        pass
+
+    def seek_target(self, frame_count):
+        return None
+
+    def over_budget_s(self):
+        return 0.0
+
+
+class AdaptiveSampler:
+    """
+    Chooses which frames to analyse from scene activity.
+    After a frame with faces or motion the interval drops back to min_interval; after a quiet frame it
+    doubles, up to max_interval. With a compute budget (budget_s for the whole file) the interval is never
+    allowed below what the measured per-frame decode and analysis costs can afford in the remaining time,
+    even if that is beyond max_interval; such strides are seeked over rather than decoded (seek_target).
+    """
+
+    def __init__(self, fps, total_frames=0, min_interval=1, max_interval=None, budget_s=None,
+                 motion_threshold=4.0, motion_size=(64, 36)):
+        fps = fps if fps and fps > 0 else 25.0
+        self.total_frames = total_frames
+        self.min_interval = max(1, min_interval)
+        self.max_interval = max(self.min_interval, max_interval or int(round(fps * 2)))
+        self.budget_s = budget_s
+        self.motion_threshold = motion_threshold
+        self.motion_size = motion_size
+        self.interval = self.min_interval
+        self.next_frame = 0
+        self.previous_small = None
+        self.started = time.perf_counter()
+        self.last_mark = self.started
+        self.skip_cost = None
+        self.analyse_cost = None
+        self.analysed = 0
+        self.skipped = 0
+
+    def should_analyse(self, frame_count):
+        return frame_count >= self.next_frame
+
+    def motion_energy(self, gray_frame):
+        """Mean absolute difference between downscaled consecutive analysed frames."""
+        small = cv2.resize(gray_frame, self.motion_size, interpolation=cv2.INTER_AREA)
+        previous, self.previous_small = self.previous_small, small
+        if previous is None:
+            return 0.0
+        return float(cv2.absdiff(small, previous).mean())
+
+    def record(self, frame_count, face_count, gray_frame=None):
+        """Update the interval after analysing frame_count; returns the motion energy of the frame."""
+        self.analyse_cost = self._update_cost(self.analyse_cost)
+        self.analysed += 1
+        motion = self.motion_energy(gray_frame) if gray_frame is not None else 0.0
+        if face_count or motion > self.motion_threshold:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+        self.interval = max(self.interval, self.budget_interval(frame_count))
+        self.next_frame = frame_count + self.interval
+        return motion
+
+    def record_skip(self):
+        self.skip_cost = self._update_cost(self.skip_cost)
+        self.skipped += 1
+
+    def seek_target(self, frame_count):
+        """Frame to seek to instead of grabbing up to it, when the budget forces a stride past max_interval."""
+        if self.interval > self.max_interval and self.next_frame > frame_count + 1:
+            return self.next_frame
+        return None
+
+    def over_budget_s(self):
+        """Seconds spent beyond budget_s so far."""
+        if not self.budget_s:
+            return 0.0
+        return max(0.0, time.perf_counter() - self.started - self.budget_s)
+
+    def _update_cost(self, average, weight=0.05):
+        now = time.perf_counter()
+        cost, self.last_mark = now - self.last_mark, now
+        return cost if average is None else average + weight * (cost - average)
+
+    def budget_interval(self, frame_count):
+        """
+        Smallest interval that still finishes in budget: remaining frames all pay the skip cost and
+        every interval-th frame additionally pays the extra cost of analysis. When even grabbing every
+        remaining frame would overrun, frames are assumed to be seeked over, so only analysed frames cost.
+        Once the budget is spent the analysis continues at max_interval; see over_budget_s().
+        """
+        if not self.budget_s or not self.total_frames or self.analyse_cost is None:
+            return self.min_interval
+        remaining_frames = self.total_frames - frame_count
+        remaining_time = self.budget_s - (time.perf_counter() - self.started)
+        spare_time = remaining_time - remaining_frames * (self.skip_cost or 0.0)
+        if remaining_frames <= 0:
+            return self.min_interval
+        if remaining_time <= 0:
+            return self.max_interval
+        if spare_time <= 0:
+            return int(np.ceil(remaining_frames * self.analyse_cost / remaining_time))
+        extra_cost = max(self.analyse_cost - (self.skip_cost or 0.0), 0.0)
+        return int(np.ceil(remaining_frames * extra_cost / spare_time))
+
+    def stats(self):
+        return {
+            "analysed": self.analysed,
+            "skipped": self.skipped,
+            "interval": self.interval,
+            "elapsed_s": time.perf_counter() - self.started,
+            "over_budget_s": self.over_budget_s(),
+        }
@@ -0,0 +1,136 @@
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+from runs import atomic_write
+
+
+class AsyncImageWriter:
+    """Encode and write images on a background thread so the decode loop never waits on disk.
+    Files are written under a temporary name and renamed, so a half-written image is never visible.
+    The first write error is raised from the next write() or from close()."""
+
+    def __init__(self, max_pending=64):
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, path, image):
+        self._raise_error()
+        self.pending.put((path, image))
+
+    def _run(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            if self.error is not None:
+                # Keep draining so write() never blocks on a full queue after a failure
+                continue
+            path, image = item
+            try:
+                ok, encoded = cv2.imencode(os.path.splitext(path)[1], image)
+                if not ok:
+                    raise OSError(f"Could not encode {path}")
+                atomic_write(path, encoded)
+            except Exception as error:
+                self.error = error
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.pending.put(None)
+        self.thread.join()
+        self._raise_error()
+
+
+def format_timestamp(seconds):
+    """Format seconds as H:MM:SS for overlays and file names."""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def make_thumbnail(frame, width, label=None):
+    """Downscale a frame to the given width, keeping aspect ratio, with an optional text overlay."""
+    height = max(1, int(round(frame.shape[0] * width / frame.shape[1])))
+    thumb = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    if label:
+        cv2.putText(thumb, label, (5, height - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 3)
+        cv2.putText(thumb, label, (5, height - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 0), 1)
+    return thumb
+
+
+def tile_contact_sheet(thumbnails, columns):
+    """Tile equally sized thumbnails into a single mosaic image, row by row."""
+    thumb_h, thumb_w = thumbnails[0].shape[:2]
+    rows = (len(thumbnails) + columns - 1) // columns
+    sheet = np.zeros((rows * thumb_h, columns * thumb_w, 3), dtype=np.uint8)
+    for idx, thumb in enumerate(thumbnails):
+        row, col = divmod(idx, columns)
+        sheet[row * thumb_h:(row + 1) * thumb_h, col * thumb_w:(col + 1) * thumb_w] = thumb
+    return sheet
+
+
+class SnapshotWriter:
+    """
+    Snapshot stage fed from an existing decode loop.
+    Saves a downscaled thumbnail every `interval` seconds and a tiled contact sheet
+    for every `sheet_minutes` of video, all written asynchronously.
+    """
+
+    def __init__(self, output_folder, fps, interval=10, thumb_width=320, sheet_minutes=5, columns=6):
+        self.output_folder = output_folder
+        os.makedirs(output_folder, exist_ok=True)
+        self.fps = fps if fps and fps > 0 else 25.0
+        self.frame_step = max(1, int(round(self.fps * interval)))
+        self.sheet_frames = max(self.frame_step, int(round(self.fps * sheet_minutes * 60)))
+        self.thumb_width = thumb_width
+        self.columns = columns
+        self.sheet_thumbs = []
+        self.sheet_index = 0
+        self.snapshot_paths = []
+        self.sheet_paths = []
+        self.writer = AsyncImageWriter()
+
+    def wants_frame(self, frame_count):
+        return frame_count % self.frame_step == 0
+
+    def next_frame(self, frame_count):
+        """First frame at or after frame_count that gets a snapshot."""
+        return -(-frame_count // self.frame_step) * self.frame_step
+
+    def add_frame(self, frame, frame_count):
+        if not self.wants_frame(frame_count):
+            return
+        sheet_index = frame_count // self.sheet_frames
+        if sheet_index != self.sheet_index:
+            self._flush_sheet()
+            self.sheet_index = sheet_index
+
+        timestamp = format_timestamp(frame_count / self.fps)
+        thumb = make_thumbnail(frame, self.thumb_width, label=timestamp)
+        snapshot_path = os.path.join(self.output_folder, f"snapshot_{frame_count:07d}.jpg")
+        self.writer.write(snapshot_path, thumb)
+        self.snapshot_paths.append(snapshot_path)
+        self.sheet_thumbs.append(thumb)
+
+    def _flush_sheet(self):
+        if not self.sheet_thumbs:
+            return
+        sheet = tile_contact_sheet(self.sheet_thumbs, self.columns)
+        sheet_path = os.path.join(self.output_folder, f"contact_sheet_{self.sheet_index:04d}.jpg")
+        self.writer.write(sheet_path, sheet)
+        self.sheet_paths.append(sheet_path)
+        self.sheet_thumbs = []
+
+    def close(self):
+        try:
+            self._flush_sheet()
+        finally:
+            self.writer.close()
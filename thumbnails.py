@@ -0,0 +1,162 @@
+import io
+import os
+import queue
+import threading
+from collections import OrderedDict
+from itertools import count
+
+from PIL import Image
+
+from crop_archive import read_crop, read_thumbnail, split_ref
+from runs import atomic_open, atomic_write
+
+THUMBNAIL_FOLDER = "thumbs"
+VIEWER_SIZE = 300
+GALLERY_SIZE = 150
+# Sizes written next to every freshly extracted loose crop, so neither the viewer nor the gallery resizes full crops
+CACHED_SIZES = (VIEWER_SIZE, GALLERY_SIZE)
+
+# Loader priorities: tiles on screen first, then the prefetched next page.
+VISIBLE = 0
+PREFETCH = 1
+
+
+def thumbnail_path(face_path, size):
+    """Location of the cached size x size thumbnail for a face crop."""
+    member = split_ref(face_path)
+    if member is not None:
+        folder, name = os.path.split(member[0])
+        name = f"{os.path.splitext(name)[0]}_{member[1]}.jpg"
+    else:
+        folder, name = os.path.split(face_path)
+    return os.path.join(folder, THUMBNAIL_FOLDER, str(size), name)
+
+
+def load_thumbnail(face_path, size):
+    """Return a size x size RGB thumbnail, reading the on-disk cache or regenerating it when missing or stale."""
+    if split_ref(face_path) is not None:
+        # Archived crops carry their viewer thumbnail; other sizes are resized from it in memory
+        # rather than cached as one file per face.
+        stored = read_thumbnail(face_path) or read_crop(face_path)
+        with Image.open(io.BytesIO(stored)) as face:
+            # JPEG draft mode decodes straight at a reduced scale, e.g. the gallery size from the viewer thumbnail
+            face.draft("RGB", (size, size))
+            thumbnail = face.convert("RGB")
+        if thumbnail.size != (size, size):
+            thumbnail = thumbnail.resize((size, size), Image.Resampling.LANCZOS)
+        return thumbnail
+
+    cached_path = thumbnail_path(face_path, size)
+    if os.path.exists(cached_path) and os.path.getmtime(cached_path) >= os.path.getmtime(face_path):
+        with Image.open(cached_path) as cached:
+            return cached.convert("RGB")
+
+    with Image.open(face_path) as face:
+        thumbnail = face.convert("RGB").resize((size, size), Image.Resampling.LANCZOS)
+    os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+    with atomic_open(cached_path) as f:
+        thumbnail.save(f, "JPEG", quality=90)
+    return thumbnail
+
+
+def make_thumbnail(face_image, size=VIEWER_SIZE):
+    return Image.fromarray(face_image[:, :, ::-1]).resize((size, size), Image.Resampling.LANCZOS)
+
+
+def write_thumbnail(face_image, face_path, sizes=CACHED_SIZES):
+    """Write the cached thumbnails for a freshly extracted BGR crop, so the viewer and gallery never resize full crops."""
+    for size in sizes:
+        cached_path = thumbnail_path(face_path, size)
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        atomic_write(cached_path, encode_thumbnail(face_image, size))
+
+
+def encode_thumbnail(face_image, size=VIEWER_SIZE):
+    """JPEG bytes of the viewer thumbnail of a BGR crop, for storing alongside it in a crop archive."""
+    buffer = io.BytesIO()
+    make_thumbnail(face_image, size).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class PhotoImageCache:
+    """Least-recently-used cache of prepared PhotoImages, keyed by face path."""
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.items = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key):
+        photo = self.items.get(key)
+        if photo is not None:
+            self.items.move_to_end(key)
+        return photo
+
+    def put(self, key, photo):
+        self.items[key] = photo
+        self.items.move_to_end(key)
+        while len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+
+    def clear(self):
+        self.items.clear()
+
+
+class ThumbnailLoader:
+    """
+    Background thread that prepares thumbnails for the gallery.
+    Requests are served by priority and skipped once they are no longer wanted,
+    results are collected on the Tk thread with poll() and turned into PhotoImages there.
+    A thumbnail that cannot be read comes back as (index, None), so it is no longer pending.
+    The index is only used as a key: the gallery passes tile positions, the face viewer passes face paths.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.requests = queue.PriorityQueue()
+        self.results = queue.Queue()
+        self.wanted = set()
+        self.pending = set()
+        self.sequence = count()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def request(self, index, face_path, priority=VISIBLE):
+        if index in self.pending:
+            return
+        self.pending.add(index)
+        self.requests.put((priority, next(self.sequence), index, face_path))
+
+    def set_wanted(self, indices):
+        self.wanted = set(indices)
+        self.pending &= self.wanted
+
+    def poll(self):
+        ready = []
+        while True:
+            try:
+                index, image = self.results.get_nowait()
+            except queue.Empty:
+                return ready
+            self.pending.discard(index)
+            ready.append((index, image))
+
+    def _run(self):
+        while True:
+            _, _, index, face_path = self.requests.get()
+            if index is None:
+                break
+            if index not in self.wanted:
+                continue
+            try:
+                image = load_thumbnail(face_path, self.size)
+            except Exception as error:
+                # Any failure must still answer the request, or the tile would stay pending forever
+                print(f"Could not load thumbnail {face_path}: {error}")
+                image = None
+            self.results.put((index, image))
+
+    def close(self):
+        self.requests.put((-1, -1, None, None))